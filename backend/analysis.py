@@ -0,0 +1,92 @@
+import re
+from collections import Counter
+from typing import Iterable, List, Sequence
+
+from doc_store import iter_text, write_json_atomic
+from sentences import iter_sentence_blocks
+
+# Bump whenever sentence splitting, scoring or the artifact layout changes;
+# stored artifacts with another version are recomputed on next use.
+ANALYSIS_VERSION = 2
+
+TOP_TERMS = 200
+
+_WORD = re.compile(r"[a-z][a-z'\-]{2,}")
+STOPWORDS = frozenset(
+    """
+    the and for are but not you all any can had her was one our out has him his how its may new now
+    see two way who did get let say she too use that with have this will your from they been were
+    said each which their what there when them than then into more some would could these those
+    other also only over such very just about after before where while because through between
+    being both does doing down during each few here most must same should under until upon whom
+    why within without yet it's i'm can't don't
+    """.split()
+)
+
+
+def terms(text: str) -> List[str]:
+    """Lower-cased content words (3+ letters, stopwords removed)"""
+    return [w for w in _WORD.findall(text.lower()) if w not in STOPWORDS]
+
+
+def score_sentences(sents: Sequence[str]) -> List[float]:
+    """Position + length score used by the local extractive summaries"""
+    n = len(sents)
+    # Prefer sentences at beginning and end, and longer sentences (more information)
+    return [position_score(i, n) + min(len(s) / 100, 1.0) for i, s in enumerate(sents)]
+
+
+def position_score(i: int, n: int) -> float:
+    return 1.0 if i < 3 or i > n - 3 else 0.5
+
+
+def top_sentence_indices(scores: Sequence[float], n: int) -> List[int]:
+    """Indices of the n best-scored sentences, in document order"""
+    if len(scores) <= n:
+        return list(range(len(scores)))
+    return sorted(sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)[:n])
+
+
+def analyze_text(text: str) -> dict:
+    return analyze_stream([text])
+
+
+def analyze_stream(pieces: Iterable[str]) -> dict:
+    """Sentence byte spans, length scores and term statistics for one document, read in pieces.
+
+    Scores hold only the length term: the position bonus depends on which
+    documents are summarised together, so it is added at query time.
+    """
+    spans, scores = [], []
+    counts: Counter = Counter()
+    byte_pos = 0
+    for block, sentence_spans in iter_sentence_blocks(pieces):
+        char_pos = 0
+        for start, end in sentence_spans:
+            # Convert char offsets to UTF-8 byte offsets incrementally so reads can mmap the file
+            byte_pos += len(block[char_pos:start].encode("utf-8", errors="ignore"))
+            byte_start = byte_pos
+            byte_pos += len(block[start:end].encode("utf-8", errors="ignore"))
+            char_pos = end
+            spans.append([byte_start, byte_pos])
+            scores.append(round(min((end - start) / 100, 1.0), 4))
+        byte_pos += len(block[char_pos:].encode("utf-8", errors="ignore"))
+        # Blocks end on a sentence boundary, so no word is split between two of them
+        counts.update(terms(block))
+    return {
+        "version": ANALYSIS_VERSION,
+        "sentences": spans,
+        "scores": scores,
+        "terms": counts.most_common(TOP_TERMS),
+        "total_terms": sum(counts.values()),
+        "unique_terms": len(counts),
+    }
+
+
+# -----------------------
+# Worker function (runs in the extraction pool)
+# -----------------------
+def analyze_to(text_path: str, dest: str) -> dict:
+    analysis = analyze_stream(iter_text(text_path))
+    write_json_atomic(dest, analysis)
+    return analysis
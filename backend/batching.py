@@ -0,0 +1,59 @@
+import json
+from typing import Dict, List, Optional, Sequence
+
+from llm_json import ITEM_MODELS, loads_lenient, validate_items
+
+# Output format per batch kind: (what to generate, JSON shape of one document's items)
+BATCH_FORMATS = {
+    "quiz": ("multiple choice questions (4 options each)", '[{"question":"...", "options":["A","B","C","D"], "answer":"A"}]'),
+    "flashcards": ("flashcards", '[{"front":"Question/Term", "back":"Answer/Definition"}]'),
+}
+
+
+def pack_entries(entries: Sequence[dict], budget_tokens: int, max_docs: int) -> List[List[dict]]:
+    """Group entries (each with a "tokens" estimate) into packs that fit one prompt, first-fit in order"""
+    packs: List[List[dict]] = []
+    sizes: List[int] = []
+    for entry in entries:
+        for i, pack in enumerate(packs):
+            if len(pack) < max_docs and sizes[i] + entry["tokens"] <= budget_tokens:
+                pack.append(entry)
+                sizes[i] += entry["tokens"]
+                break
+        else:
+            packs.append([entry])
+            sizes.append(entry["tokens"])
+    return packs
+
+
+def batch_prompt(kind: str, pack: Sequence[dict]) -> str:
+    """One prompt covering every document of a pack; answers are keyed by document number"""
+    what, shape = BATCH_FORMATS[kind]
+    sections = "\n\n".join(
+        f"Document {i} ({entry['count']} {what.split(' (')[0]}):\n{entry['content']}"
+        for i, entry in enumerate(pack, 1)
+    )
+    return f"""
+Generate {what} for each document below, with the requested number for each.
+Return JSON strictly in this format, with one key per document number:
+{{"1": {shape}, "2": ...}}
+
+{sections}
+"""
+
+
+def parse_batch(kind: str, result: str, n_docs: int) -> List[Optional[list]]:
+    """Per-document valid items from a packed answer; None where a document is missing or has none"""
+    data = loads_lenient(result)
+    if not isinstance(data, dict):
+        data = {}
+    out: List[Optional[list]] = []
+    for i in range(1, n_docs + 1):
+        items = data.get(str(i))
+        items = validate_items(items, ITEM_MODELS[kind]) if isinstance(items, list) else []
+        out.append(items or None)
+    return out
+
+
+def ndjson(data: Dict) -> str:
+    return json.dumps(data, ensure_ascii=False) + "\n"
@@ -0,0 +1,67 @@
+"""
+Deck generation for many lectures: serial /api/quiz calls vs one /api/batch stream.
+
+1. uvicorn mock_gemini:app --port 8100                      (in benchmarks/)
+2. GEMINI_API_KEY=mock GEMINI_API_BASE=http://127.0.0.1:8100/v1 \\
+   CACHE_MAX_MB=0 uvicorn main:app --port 8000              (in backend/)
+3. python bench_batch.py [lectures] [kb_per_lecture]
+
+CACHE_MAX_MB=0 keeps the second run from being served out of the cache.
+Upstream calls are counted from the mock's /stats.
+"""
+import asyncio
+import json
+import sys
+import time
+
+import httpx
+
+from corpus import make_txt
+
+BACKEND = "http://127.0.0.1:8000"
+MOCK = "http://127.0.0.1:8100"
+
+
+async def upstream_calls(client: httpx.AsyncClient) -> int:
+    return (await client.get(f"{MOCK}/stats")).json()["generate"]
+
+
+async def main(lectures: int, kb: int):
+    texts = [make_txt(kb * 1024, seed=1000 + i) for i in range(lectures)]
+    async with httpx.AsyncClient(base_url=BACKEND, timeout=600) as client:
+        ids = []
+        for i, text in enumerate(texts):
+            r = await client.post("/api/upload", files={"file": (f"lecture_{i}.txt", text, "text/plain")})
+            r.raise_for_status()
+            ids.append(r.json()["id"])
+        print(f"corpus: {lectures} lectures x {kb} KB")
+
+        calls = await upstream_calls(client)
+        start = time.perf_counter()
+        for text in texts:
+            r = await client.post("/api/quiz", json={"text": text.decode(), "num_questions": 5})
+            r.raise_for_status()
+        serial = time.perf_counter() - start
+        serial_calls = await upstream_calls(client) - calls
+
+        calls = await upstream_calls(client)
+        start, first, lines = time.perf_counter(), None, 0
+        body = {"kind": "quiz", "items": [{"doc": doc_id} for doc_id in ids], "num_questions": 5}
+        async with client.stream("POST", "/api/batch", json=body) as r:
+            async for line in r.aiter_lines():
+                if line:
+                    json.loads(line)
+                    lines += 1
+                    first = first or time.perf_counter() - start
+        batch = time.perf_counter() - start
+        batch_calls = await upstream_calls(client) - calls
+
+    print(f"serial /api/quiz: {serial:6.2f}s  {serial_calls:3d} upstream calls")
+    print(f"/api/batch:       {batch:6.2f}s  {batch_calls:3d} upstream calls  "
+          f"(first line after {first:.2f}s, {lines} lines)")
+
+
+if __name__ == "__main__":
+    lectures = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    kb = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    asyncio.run(main(lectures, kb))
@@ -0,0 +1,118 @@
+"""
+Document text storage: memory held and read latency of the old dict of str versus
+the store's plain UTF-8 files and compressed block files (both read through mmap).
+
+    python bench_doc_storage.py [documents] [pages per document]
+
+Every page carries one emoji, as real lecture exports often do, which makes CPython
+store the whole str at 4 bytes per character. Latencies are medians over random reads:
+one page, a batch of sentence-sized ranges (what retrieval and summaries read), and a
+whole document; block files are measured cold and again with their block cache warm.
+"""
+import hashlib
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from corpus import lecture_sentences  # noqa: E402
+import textblocks  # noqa: E402
+from doc_store import create_document_store  # noqa: E402
+
+SENTENCES_PER_PAGE = 25
+RANGES_PER_READ = 20
+READS = 300
+
+
+def make_document(pages: int, seed: int):
+    """(text, page start byte offsets)"""
+    sents = lecture_sentences(10 ** 9, seed)
+    parts, offsets, pos = [], [], 0
+    for p in range(pages):
+        page = f"Lecture page {p + 1} \U0001F4D8\n" + "\n".join(next(sents) for _ in range(SENTENCES_PER_PAGE)) + "\n"
+        offsets.append(pos)
+        parts.append(page)
+        pos += len(page.encode("utf-8"))
+    return "".join(parts), offsets
+
+
+def median_us(fn, args_list) -> float:
+    samples = []
+    for args in args_list:
+        start = time.perf_counter()
+        fn(*args)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1e6
+
+
+def random_ranges(rng: random.Random, size: int):
+    starts = sorted(rng.randrange(0, max(size - 200, 1)) for _ in range(RANGES_PER_READ))
+    return [(s, s + rng.randint(60, 200)) for s in starts]
+
+
+def report(label: str, held_mb: float, disk_mb: float, page_us: float, ranges_us: float, whole_ms: float):
+    print(f"{label:22s} {held_mb:9.1f} {disk_mb:9.1f} {page_us:10.1f} {ranges_us:12.1f} {whole_ms:10.2f}")
+
+
+if __name__ == "__main__":
+    n_docs = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    n_pages = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+    corpus = [make_document(n_pages, seed) for seed in range(n_docs)]
+    utf8_mb = sum(len(text.encode("utf-8")) for text, _ in corpus) / 1e6
+    print(f"{n_docs} documents x {n_pages} pages, {utf8_mb:.1f} MB of UTF-8 text")
+    print(f"{'':22s} {'held MB':>9s} {'disk MB':>9s} {'page us':>10s} {'20 ranges us':>12s} {'whole ms':>10s}")
+
+    rng = random.Random(0)
+    page_reads = [(rng.randrange(n_docs), rng.randrange(n_pages)) for _ in range(READS)]
+    range_reads = [(d, random_ranges(rng, len(corpus[d][0]))) for d in (rng.randrange(n_docs) for _ in range(READS))]
+    whole_reads = [(rng.randrange(n_docs),) for _ in range(READS // 10)]
+
+    # The old layout: one str per document (slices by character offset, as that code did)
+    tracemalloc.start()
+    held = {f"doc{i}": text.encode("utf-8").decode("utf-8") for i, (text, _) in enumerate(corpus)}
+    held_mb = tracemalloc.get_traced_memory()[0] / 1e6
+    tracemalloc.stop()
+    char_pages = []
+    for text, offsets in corpus:
+        data = text.encode("utf-8")
+        char_pages.append([len(data[:o].decode("utf-8")) for o in offsets] + [len(text)])
+    report(
+        "dict of str", held_mb, 0.0,
+        median_us(lambda d, p: held[f"doc{d}"][char_pages[d][p]:char_pages[d][p + 1]], page_reads),
+        median_us(lambda d, spans: [held[f"doc{d}"][s:e] for s, e in spans], range_reads),
+        median_us(lambda d: held[f"doc{d}"], whole_reads) / 1000,
+    )
+    del held
+
+    for label, compress in (("plain + mmap", False), ("blocks + mmap", True)):
+        with tempfile.TemporaryDirectory() as root:
+            store = create_document_store("memory", root, compress=compress)
+            docs = []
+            for i, (text, offsets) in enumerate(corpus):
+                data = text.encode("utf-8")
+                staged = store.staging_path()
+                with open(staged, "wb") as f:
+                    f.write(data)
+                docs.append(store.add_file(f"doc{i}.txt", staged, hashlib.sha256(data).hexdigest(), len(data), offsets))
+            disk_mb = sum(os.path.getsize(d.path) for d in docs) / 1e6
+
+            def read_page(d: int, p: int) -> str:
+                if compress:
+                    return docs[d].read_page(p)
+                # Plain files have no page index; use the offsets extraction produced
+                end = corpus[d][1][p + 1] if p + 1 < n_pages else docs[d].size
+                return docs[d].read(corpus[d][1][p], end - corpus[d][1][p]).decode("utf-8")
+
+            # Second pass: the same reads again, served from the decompressed-block cache for block files
+            for suffix in ("", " (again)") if compress else ("",):
+                page_us = median_us(read_page, page_reads)
+                ranges_us = median_us(lambda d, spans: docs[d].read_ranges(spans), range_reads)
+                whole_ms = median_us(lambda d: docs[d].text, whole_reads) / 1000
+                # What the process keeps between reads: nothing, or the decompressed-block cache
+                held_mb = textblocks._cached_bytes / 1e6 if compress else 0.0
+                report(label + suffix, held_mb, disk_mb, page_us, ranges_us, whole_ms)
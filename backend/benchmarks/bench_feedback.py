@@ -0,0 +1,55 @@
+"""
+Feedback write throughput (group commit) and read latency of the summary and a page.
+
+1. uvicorn main:app --port 8000                              (in backend/)
+   (FEEDBACK_FLUSH_MS=0 commits whatever is queued right away, for comparison)
+2. python bench_feedback.py [entries] [concurrency]
+"""
+import asyncio
+import random
+import statistics
+import sys
+import time
+
+import httpx
+
+BACKEND = "http://127.0.0.1:8000"
+FEATURES = {"summarizer": ["simple", "detailed", "concept", "qa", "takeaways"], "quiz": ["mcq"], "flashcards": ["deck"]}
+
+
+def entry(rng: random.Random) -> dict:
+    feature = rng.choice(list(FEATURES))
+    return {"feature": feature, "item_name": rng.choice(FEATURES[feature]), "thumbs_up": rng.randint(0, 1),
+            "rating": rng.randint(0, 5), "note": "bench"}
+
+
+async def timed(client: httpx.AsyncClient, method: str, path: str, **kwargs) -> float:
+    start = time.perf_counter()
+    r = await client.request(method, path, **kwargs)
+    r.raise_for_status()
+    return time.perf_counter() - start
+
+
+async def main(entries: int, concurrency: int):
+    rng = random.Random(0)
+    sem = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(base_url=BACKEND, timeout=60) as client:
+        async def post():
+            async with sem:
+                return await timed(client, "POST", "/api/feedback", json=entry(rng))
+
+        start = time.perf_counter()
+        writes = sorted(await asyncio.gather(*(post() for _ in range(entries))))
+        elapsed = time.perf_counter() - start
+        print(f"POST /api/feedback x{entries} (concurrency {concurrency}): {entries / elapsed:7.0f}/s  "
+              f"p50 {statistics.median(writes) * 1000:.1f} ms  p95 {writes[int(len(writes) * 0.95)] * 1000:.1f} ms")
+
+        for path in ("/api/feedback/summary", "/api/feedback?limit=100", "/api/feedback?limit=100&cursor=1000000"):
+            reads = sorted([await timed(client, "GET", path) for _ in range(50)])
+            print(f"GET {path:40s} p50 {statistics.median(reads) * 1000:6.2f} ms")
+
+
+if __name__ == "__main__":
+    entries = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 64
+    asyncio.run(main(entries, concurrency))
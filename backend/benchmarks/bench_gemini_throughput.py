@@ -0,0 +1,49 @@
+"""
+Throughput benchmark for /api/query against the mock Gemini server.
+
+1. uvicorn mock_gemini:app --port 8100                       (in benchmarks/)
+2. GEMINI_API_KEY=mock GEMINI_API_BASE=http://127.0.0.1:8100/v1 \\
+   uvicorn main:app --port 8000                              (in backend/)
+3. python bench_gemini_throughput.py [requests] [concurrency]
+"""
+import asyncio
+import sys
+import time
+
+import httpx
+
+BACKEND = "http://127.0.0.1:8000"
+
+
+async def main(total: int, concurrency: int):
+    sem = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+    payload = {"prompt": "Create a 7-day study plan for: Linear Algebra", "docs": [], "mode": "planner"}
+
+    async with httpx.AsyncClient(base_url=BACKEND, timeout=120) as client:
+        async def one():
+            nonlocal errors
+            async with sem:
+                t0 = time.perf_counter()
+                r = await client.post("/api/query", json=payload)
+                latencies.append(time.perf_counter() - t0)
+                if r.status_code != 200:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    print(f"requests:    {total} (concurrency {concurrency}, errors {errors})")
+    print(f"elapsed:     {elapsed:.2f}s")
+    print(f"throughput:  {total / elapsed:.1f} req/s")
+    print(f"p50 latency: {latencies[len(latencies) // 2] * 1000:.0f} ms")
+    print(f"p95 latency: {latencies[int(len(latencies) * 0.95) - 1] * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    asyncio.run(main(total, concurrency))
@@ -0,0 +1,77 @@
+"""
+Peak server memory while ingesting large uploads (Linux only: reads /proc).
+
+    python bench_memory.py [size_mb ...]        e.g. python bench_memory.py 50 200 500
+
+For each size a fresh backend is started (DATA_DIR in a temp dir), one TXT
+upload of that size is posted, and the peak RSS (VmHWM) of the web process
+and of its extraction workers is reported. With streaming extraction the
+numbers should stay roughly flat as the upload grows.
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from corpus import make_txt
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PORT = 8011
+
+
+def peak_rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def children(pid: int):
+    kids = []
+    for tid in os.listdir(f"/proc/{pid}/task"):
+        with open(f"/proc/{pid}/task/{tid}/children") as f:
+            kids += [int(k) for k in f.read().split()]
+    return kids
+
+
+def write_corpus(path: str, size_mb: int):
+    block = make_txt(1024 * 1024)
+    with open(path, "wb") as f:
+        for _ in range(size_mb):
+            f.write(block + b"\n")
+
+
+def run(size_mb: int, workdir: str):
+    src = os.path.join(workdir, f"lecture_{size_mb}mb.txt")
+    write_corpus(src, size_mb)
+    env = dict(os.environ, DATA_DIR=os.path.join(workdir, f"data_{size_mb}"), MAX_UPLOAD_MB=str(size_mb + 10))
+    env.pop("GEMINI_API_KEY", None)
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(PORT), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env,
+    )
+    try:
+        time.sleep(3)
+        t0 = time.perf_counter()
+        with open(src, "rb") as f, httpx.Client(timeout=3600) as client:
+            r = client.post(f"http://127.0.0.1:{PORT}/api/upload", files={"file": (os.path.basename(src), f, "text/plain")})
+            r.raise_for_status()
+        elapsed = time.perf_counter() - t0
+        web = peak_rss_mb(server.pid)
+        workers = max([peak_rss_mb(k) for k in children(server.pid)] or [0.0])
+        print(f"{size_mb:>6} MB upload: {elapsed:6.1f}s   web peak RSS {web:7.1f} MB   worker peak RSS {workers:7.1f} MB")
+    finally:
+        server.terminate()
+        server.wait()
+        os.remove(src)
+
+
+if __name__ == "__main__":
+    sizes = [int(a) for a in sys.argv[1:]] or [50, 200, 500]
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in sizes:
+            run(size, workdir)
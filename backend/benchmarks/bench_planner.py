@@ -0,0 +1,46 @@
+"""
+Local study planner cost per request: parse + build + render, cold vs cached.
+
+    python bench_planner.py [requests] [distinct topics]
+
+Prompts cycle through `distinct topics` x a few durations, the way the planner page
+is mostly used (a handful of popular subjects and 7/14/30-day plans).
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from planner import PlanCache, build_plan, iter_plan_text, parse_request  # noqa: E402
+
+DURATIONS = (7, 14, 30)
+
+
+def prompts(n: int, topics: int):
+    for i in range(n):
+        yield f"Create a {DURATIONS[i % len(DURATIONS)]}-day study plan for learning: Topic {i % topics}\n"
+
+
+def timed(label: str, fn, items):
+    start = time.perf_counter()
+    for item in items:
+        fn(item)
+    elapsed = time.perf_counter() - start
+    print(f"{label:28s} {elapsed / len(items) * 1e6:8.1f} us/plan")
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    topics = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    items = list(prompts(n, topics))
+    cache = PlanCache()
+
+    def cold(prompt: str):
+        goal, days = parse_request(prompt)
+        "".join(iter_plan_text(build_plan(goal, days)))
+
+    timed("parse only", parse_request, items)
+    timed("parse + build + render", cold, items)
+    timed("parse + PlanCache.get", lambda p: cache.get(*parse_request(p)), items)
+    print(f"cache: {cache.hits} hits, {cache.misses} misses")
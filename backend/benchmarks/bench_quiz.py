@@ -0,0 +1,47 @@
+"""
+Offline quiz engine cost: keyphrase index build (upload time, in the pool), preparation
+(first use) and generating questions / flashcards from it.
+
+    python bench_quiz.py                        # synthetic ~300-page document (900KB of text)
+    python bench_quiz.py notes.txt [questions]
+
+Generation is timed over a few seeds and the median is reported.
+"""
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cloze import build_quiz_index, generate, prepare_quiz_index, text_reader  # noqa: E402
+from corpus import make_txt  # noqa: E402
+
+RUNS = 5
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], encoding="utf-8", errors="ignore") as f:
+            text = f.read()
+    else:
+        text = make_txt(900 * 1024).decode("utf-8")
+    n = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    read = text_reader(text)
+
+    index, build = timed(build_quiz_index, text)
+    prepared, prepare = timed(prepare_quiz_index, index)
+    print(f"{len(text.encode('utf-8')) / 1024:.0f}KB, {len(index['sentences'])} question sentences, "
+          f"{len(index['phrases'])} phrases")
+    print(f"build index   {build * 1000:8.1f} ms")
+    print(f"prepare       {prepare * 1000:8.1f} ms")
+    for kind in ("quiz", "flashcards"):
+        samples = [timed(generate, prepared, read, kind, n, seed) for seed in range(RUNS)]
+        elapsed = statistics.median(t for _, t in samples)
+        print(f"{n} {kind:10s} {elapsed * 1000:8.1f} ms  ({len(samples[0][0])} items)")
@@ -0,0 +1,83 @@
+"""
+One client hammering /api/query next to a well-behaved one: who gets Gemini answers?
+
+1. uvicorn mock_gemini:app --port 8100                      (in benchmarks/)
+2. GEMINI_API_KEY=mock GEMINI_API_BASE=http://127.0.0.1:8100/v1 CACHE_MAX_MB=0 \\
+   GEMINI_CLIENT_RPM=60 GEMINI_GLOBAL_RPM=150 ADMIN_TOKEN=bench uvicorn main:app --port 8000
+   (in backend/; run again with GEMINI_CLIENT_RPM=0 GEMINI_GLOBAL_RPM=0 for the unlimited baseline)
+3. python bench_quota.py [seconds] [spammer_concurrency]
+
+The two clients connect from 127.0.0.2 and 127.0.0.3 so the backend sees two hosts.
+"""
+import asyncio
+import itertools
+import statistics
+import sys
+import time
+
+import httpx
+
+BACKEND = "http://127.0.0.1:8000"
+MOCK = "http://127.0.0.1:8100"
+ADMIN_TOKEN = "bench"
+
+counter = itertools.count()
+
+
+def client_from(address: str) -> httpx.AsyncClient:
+    return httpx.AsyncClient(base_url=BACKEND, timeout=60, transport=httpx.AsyncHTTPTransport(local_address=address))
+
+
+async def planner(client: httpx.AsyncClient, results: list):
+    body = {"prompt": f"Create a 3-day study plan for learning: topic {next(counter)}", "mode": "planner"}
+    start = time.perf_counter()
+    r = await client.post("/api/query", json=body)
+    r.raise_for_status()
+    results.append((time.perf_counter() - start, "Mock answer" in r.json()["answer"]))
+
+
+async def spammer(client: httpx.AsyncClient, until: float, results: list):
+    while time.perf_counter() < until:
+        await planner(client, results)
+
+
+async def polite(client: httpx.AsyncClient, until: float, results: list, interval: float = 2.0):
+    while time.perf_counter() < until:
+        await planner(client, results)
+        await asyncio.sleep(interval)
+
+
+def report(name: str, results: list):
+    latencies = [t for t, _ in results]
+    gemini = sum(g for _, g in results)
+    print(f"{name:8s} {len(results):6d} requests  {gemini:5d} from Gemini ({gemini / len(results):4.0%})  "
+          f"p50 {statistics.median(latencies) * 1000:5.0f} ms")
+
+
+async def main(seconds: float, concurrency: int):
+    async with client_from("127.0.0.2") as noisy, client_from("127.0.0.3") as quiet, httpx.AsyncClient() as admin:
+        before = (await admin.get(f"{MOCK}/stats")).json()["generate"]
+        until = time.perf_counter() + seconds
+        noisy_results, quiet_results = [], []
+        await asyncio.gather(
+            *(spammer(noisy, until, noisy_results) for _ in range(concurrency)),
+            polite(quiet, until, quiet_results),
+        )
+        calls = (await admin.get(f"{MOCK}/stats")).json()["generate"] - before
+        usage = await admin.get(f"{BACKEND}/api/admin/usage", headers={"X-Admin-Token": ADMIN_TOKEN})
+
+    print(f"{seconds:.0f}s, spammer concurrency {concurrency}")
+    report("spammer", noisy_results)
+    report("polite", quiet_results)
+    print(f"upstream calls: {calls} ({calls / seconds * 60:.0f}/min)")
+    if usage.status_code == 200:
+        for host, entry in usage.json()["clients"].items():
+            for priority, counts in entry["priorities"].items():
+                print(f"  {host:10s} {priority:11s} requests {counts['requests']:5d}  rejected {counts['rejected']:5d}  "
+                      f"tokens {counts['prompt_tokens'] + counts['output_tokens']}")
+
+
+if __name__ == "__main__":
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 30
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    asyncio.run(main(seconds, concurrency))
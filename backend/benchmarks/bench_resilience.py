@@ -0,0 +1,80 @@
+"""
+Planner latency and Gemini/local share while the mock upstream misbehaves.
+
+1. uvicorn mock_gemini:app --port 8100                      (in benchmarks/)
+2. GEMINI_API_KEY=mock GEMINI_API_BASE=http://127.0.0.1:8100/v1 CACHE_MAX_MB=0 \\
+   GEMINI_CLIENT_RPM=0 GEMINI_BREAKER_COOLDOWN=3 GEMINI_HEDGE_SLO=2 uvicorn main:app --port 8000   (in backend/)
+3. python bench_resilience.py [requests_per_phase] [concurrency]
+
+Faults are switched through the mock's POST /faults between phases; upstream
+calls and injected faults are counted from its /stats.
+"""
+import asyncio
+import statistics
+import sys
+import time
+
+import httpx
+
+BACKEND = "http://127.0.0.1:8000"
+MOCK = "http://127.0.0.1:8100"
+
+PHASES = [
+    ("healthy", {}),
+    ("flaky 30% 503", {"error_rate": 0.3}),
+    ("429 storm", {"429_rate": 0.5}),
+    ("outage", {"error_rate": 1.0}),
+    ("recovered", {}),
+    ("slow tail 20% x8s", {"slow_rate": 0.2, "slow_ms": 8000}),
+]
+NO_FAULTS = {"error_rate": 0, "429_rate": 0, "slow_rate": 0}
+
+
+async def planner(client: httpx.AsyncClient, i: int):
+    body = {"prompt": f"Create a 3-day study plan for learning: topic number {i}", "mode": "planner"}
+    start = time.perf_counter()
+    r = await client.post(f"{BACKEND}/api/query", json=body)
+    r.raise_for_status()
+    # Mock answers are a single bullet; local plans start with a day header
+    return time.perf_counter() - start, "Mock answer" in r.json()["answer"]
+
+
+async def run_phase(client: httpx.AsyncClient, first: int, n: int, concurrency: int):
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with sem:
+            return await planner(client, i)
+
+    return await asyncio.gather(*(one(first + i) for i in range(n)))
+
+
+async def main(n: int, concurrency: int):
+    async with httpx.AsyncClient(timeout=120) as client:
+        print(f"{'phase':20s} {'p50':>7s} {'p95':>7s} {'max':>7s} {'gemini':>7s} "
+              f"{'calls':>6s} {'faults':>6s}  breaker")
+        for p, (name, faults) in enumerate(PHASES):
+            await client.post(f"{MOCK}/faults", json={**NO_FAULTS, **faults})
+            if name == "recovered":
+                # Let the breaker's cooldown pass so a probe can close it again
+                await asyncio.sleep(float((await client.get(f"{BACKEND}/api/gemini/health")).json().get("cooldown", 3)))
+            before = (await client.get(f"{MOCK}/stats")).json()
+            results = await run_phase(client, p * 10_000, n, concurrency)
+            after = (await client.get(f"{MOCK}/stats")).json()
+            health = (await client.get(f"{BACKEND}/api/gemini/health")).json()
+
+            latencies = sorted(t for t, _ in results)
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            share = sum(g for _, g in results) / len(results)
+            calls = sum(after[k] - before[k] for k in ("generate", "errors", "rate_limited"))
+            faults = sum(after[k] - before[k] for k in ("errors", "rate_limited", "slow"))
+            print(f"{name:20s} {statistics.median(latencies):6.2f}s {p95:6.2f}s {latencies[-1]:6.2f}s "
+                  f"{share:7.0%} {calls:6d} {faults:6d}  {health['breaker']} "
+                  f"(trips {health['trips']}, retried {health['retried']}, rejected {health['rejected']})")
+        await client.post(f"{MOCK}/faults", json=NO_FAULTS)
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    asyncio.run(main(n, concurrency))
@@ -0,0 +1,74 @@
+"""
+Microbenchmark: sentences.split_sentences vs the old char-by-char splitter.
+
+    python bench_sentences.py [--legacy-max-mb N]
+
+The legacy splitter is only timed up to --legacy-max-mb (default 5) because
+it gets slow; it also capped output at 1000 sentences, which is reported.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from corpus import make_txt  # noqa: E402
+from sentences import split_sentences  # noqa: E402
+
+SIZES = [10 * 1024, 100 * 1024, 1024 ** 2, 10 * 1024 ** 2, 50 * 1024 ** 2]
+# Terminator runs with no whitespace after them: must stay linear (a backtracking boundary is quadratic)
+PATHOLOGICAL = {"'.' * 40000 + 'x'": "." * 40000 + "x", "'?!' * 500000 + 'x'": "?!" * 500000 + "x"}
+
+
+def legacy_split_sentences(text):
+    """The pre-rewrite implementation, kept verbatim for comparison"""
+    sents, buf = [], ""
+    for ch in text:
+        buf += ch
+        if ch in ".!?":
+            if len(buf.strip()) > 20:
+                sents.append(buf.strip())
+            buf = ""
+    if buf.strip():
+        sents.append(buf.strip())
+    return sents[:1000]
+
+
+def best_of(fn, text, repeat):
+    best, out = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn(text)
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def human(n):
+    return f"{n / 1024 ** 2:.0f} MB" if n >= 1024 ** 2 else f"{n // 1024} KB"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--legacy-max-mb", type=float, default=5)
+    args = parser.parse_args()
+
+    print(f"{'input':>8} | {'new':>10} {'sents':>9} {'MB/s':>7} | {'legacy':>10} {'sents':>6} {'MB/s':>7}")
+    for size in SIZES:
+        text = make_txt(size).decode("utf-8")
+        repeat = 5 if size <= 1024 ** 2 else 1
+        t_new, new = best_of(split_sentences, text, repeat)
+        row = f"{human(size):>8} | {t_new * 1000:8.1f}ms {len(new):>9} {size / 1024 ** 2 / t_new:7.1f} |"
+        if size <= args.legacy_max_mb * 1024 ** 2:
+            t_old, old = best_of(legacy_split_sentences, text, repeat)
+            row += f" {t_old * 1000:8.1f}ms {len(old):>6} {size / 1024 ** 2 / t_old:7.1f}"
+        else:
+            row += f" {'skipped':>10}"
+        print(row)
+    for label, text in PATHOLOGICAL.items():
+        t_new, new = best_of(split_sentences, text, 1)
+        print(f"{label}: {t_new * 1000:.1f}ms, {len(new)} sentence(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Cold-start cost of the backend: import time, time to the first `/` response,
+idle RSS, and the latency of the first requests that load parsers / numpy.
+
+    python bench_startup.py                                 # WARMUP=0 and WARMUP=1, 5 runs each
+    python bench_startup.py --save baselines/startup.json   # record a baseline
+    python bench_startup.py --compare baselines/startup.json
+
+Each run starts a fresh process on an empty DATA_DIR with Gemini off; medians are reported.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from corpus import make_pdf
+from loadtest import BACKEND_DIR, children, git_revision, read_status_mb, stop
+
+PORT = 8041
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+
+
+def backend_env(data_dir: str, warmup: bool) -> dict:
+    env = dict(os.environ, DATA_DIR=data_dir, CACHE_DIR="", EXTRACT_WORKERS="1", LOG_LEVEL="warning",
+               WARMUP="1" if warmup else "0")
+    env.pop("GEMINI_API_KEY", None)
+    return env
+
+
+def import_ms(env: dict) -> float:
+    out = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], cwd=BACKEND_DIR, env=env,
+                         capture_output=True, text=True, check=True).stdout
+    return float(out.split()[-1]) * 1000
+
+
+def serve_once(env: dict) -> dict:
+    """Start uvicorn, time the first `/`, sample idle RSS, then time the first PDF upload and textrank summary"""
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--port", str(PORT), "--log-level", "warning"],
+                            cwd=BACKEND_DIR, env=env)
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{PORT}", timeout=120) as client:
+            while True:
+                try:
+                    client.get("/").raise_for_status()
+                    break
+                except httpx.TransportError:
+                    if time.perf_counter() - start > 60:
+                        raise RuntimeError("backend did not come up")
+                    time.sleep(0.01)
+            ready = time.perf_counter() - start
+            time.sleep(0.5)
+            rss = read_status_mb(proc.pid, "VmRSS")
+            rss_total = rss + sum(read_status_mb(k, "VmRSS") for k in children(proc.pid))
+
+            t = time.perf_counter()
+            r = client.post("/api/upload", files={"file": ("lecture.pdf", make_pdf(4), "application/pdf")})
+            r.raise_for_status()
+            first_pdf = time.perf_counter() - t
+
+            t = time.perf_counter()
+            body = {"prompt": "Summarize", "docs": [r.json()["id"]], "style": "detailed", "engine": "textrank"}
+            client.post("/api/query", json=body).raise_for_status()
+            first_textrank = time.perf_counter() - t
+    finally:
+        stop(proc)
+    return {"ready_ms": ready * 1000, "idle_rss_mb": rss, "idle_rss_total_mb": rss_total,
+            "first_pdf_upload_ms": first_pdf * 1000, "first_textrank_ms": first_textrank * 1000}
+
+
+def measure(warmup: bool, runs: int) -> dict:
+    samples = []
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as data_dir:
+            env = backend_env(data_dir, warmup)
+            samples.append({"import_ms": import_ms(env), **serve_once(env)})
+    return {key: round(statistics.median(s[key] for s in samples), 1) for key in samples[0]}
+
+
+def compare(baseline: dict, current: dict, tolerance: float) -> int:
+    """Print deltas per mode; returns the number of regressions"""
+    regressions = 0
+    print(f"\nvs {baseline['meta']['revision']} ({baseline['meta']['recorded']}), tolerance {tolerance:.0%}")
+    for mode, now in current["results"].items():
+        before = baseline["results"].get(mode, {})
+        for key, value in now.items():
+            if key not in before:
+                continue
+            # Ignore wobble below 20 ms / 5 MB
+            slack = 5 if key.endswith("_mb") else 20
+            regressed = value > before[key] * (1 + tolerance) and value - before[key] > slack
+            regressions += regressed
+            print(f"  {mode:10s} {key:20s} {before[key]:8.1f} -> {value:8.1f}  {'REGRESSION' if regressed else 'ok'}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--save", help="write results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown before flagging")
+    opts = parser.parse_args()
+
+    results = {}
+    for mode, warmup in (("lazy", False), ("warmup", True)):
+        results[mode] = measure(warmup, opts.runs)
+        print(f"{mode:8s} " + "  ".join(f"{k} {v:.1f}" for k, v in results[mode].items()))
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "recorded": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "machine": f"{platform.machine()} x{os.cpu_count()}",
+            "runs": opts.runs,
+        },
+        "results": results,
+    }
+    if opts.save:
+        os.makedirs(os.path.dirname(opts.save) or ".", exist_ok=True)
+        with open(opts.save, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"saved {opts.save}")
+    if opts.compare:
+        with open(opts.compare) as f:
+            baseline = json.load(f)
+        if compare(baseline, report, opts.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
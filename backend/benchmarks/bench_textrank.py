@@ -0,0 +1,40 @@
+"""
+Microbenchmark: TF-IDF + TextRank sentence ranking (summarizer.py).
+
+    python bench_textrank.py [--docs N]
+
+Sentences are split across --docs documents and ranked as one batch, the
+way /api/query ranks a multi-document selection.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from corpus import lecture_sentences  # noqa: E402
+from summarizer import textrank, tfidf_matrix  # noqa: E402
+
+SIZES = [1_000, 10_000, 50_000, 100_000]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'sentences':>10} | {'tfidf':>9} {'textrank':>9} {'total':>9} | {'nnz':>9}")
+    for n in SIZES:
+        docs = [list(lecture_sentences(n // args.docs, seed)) for seed in range(args.docs)]
+        sentences = [s for doc in docs for s in doc]
+        t0 = time.perf_counter()
+        X = tfidf_matrix(sentences)
+        t1 = time.perf_counter()
+        textrank(X)
+        t2 = time.perf_counter()
+        print(f"{len(sentences):>10} | {(t1 - t0) * 1000:7.1f}ms {(t2 - t1) * 1000:7.1f}ms {(t2 - t0) * 1000:7.1f}ms | {X.nnz:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Upload throughput and event-loop latency during a large PDF ingest.
+
+1. uvicorn main:app --port 8000                              (in backend/)
+2. python bench_upload.py [pages] [uploads] [concurrency]
+
+While the uploads run, GET / is probed every 10 ms; its latency is how long
+other requests wait on the event loop.
+"""
+import asyncio
+import sys
+import time
+
+import httpx
+
+from corpus import make_pdf
+
+BACKEND = "http://127.0.0.1:8000"
+
+
+def pct(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] * 1000 if values else 0.0
+
+
+async def main(pages: int, uploads: int, concurrency: int):
+    # Distinct seeds so content-hash dedup doesn't short-circuit the work
+    pdfs = [make_pdf(pages, seed=i) for i in range(uploads)]
+    print(f"corpus: {uploads} x {pages}-page PDF ({len(pdfs[0]) / 1e6:.1f} MB each)")
+
+    sem = asyncio.Semaphore(concurrency)
+    probe_latencies = []
+    done = asyncio.Event()
+
+    async with httpx.AsyncClient(base_url=BACKEND, timeout=600) as client:
+        async def probe():
+            while not done.is_set():
+                t0 = time.perf_counter()
+                await client.get("/")
+                probe_latencies.append(time.perf_counter() - t0)
+                await asyncio.sleep(0.01)
+
+        async def one(i):
+            async with sem:
+                r = await client.post("/api/upload", files={"file": (f"lecture_{i}.pdf", pdfs[i], "application/pdf")})
+                r.raise_for_status()
+
+        prober = asyncio.create_task(probe())
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(uploads)))
+        elapsed = time.perf_counter() - start
+        done.set()
+        await prober
+
+    print(f"elapsed:        {elapsed:.2f}s")
+    print(f"uploads/sec:    {uploads / elapsed:.2f}")
+    print(f"loop probe p50: {pct(probe_latencies, 0.5):.1f} ms")
+    print(f"loop probe p99: {pct(probe_latencies, 0.99):.1f} ms")
+    print(f"loop probe max: {max(probe_latencies) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    pages = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    uploads = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    concurrency = int(sys.argv[3]) if len(sys.argv) > 3 else 2
+    asyncio.run(main(pages, uploads, concurrency))
@@ -0,0 +1,99 @@
+"""
+Throughput vs uvicorn --workers with the shared SQLite state and job queue.
+
+    python bench_workers.py [workers ...]          e.g. python bench_workers.py 1 2 4
+
+For each worker count a fresh backend is started (temp DATA_DIR, one extraction
+process per worker, no Gemini) and two loads are run:
+
+- jobs: background uploads, submitted to whichever worker accepts the request
+  and run by whichever worker claims them; measured until all are done
+- local summaries: /api/query with engine=textrank (response cache off)
+
+Scaling is bounded by the cores available; the core count is printed first.
+"""
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from corpus import make_txt
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PORT = 8031
+UPLOADS = 24
+QUERIES = 48
+CONCURRENCY = 16
+
+
+async def run_load(client: httpx.AsyncClient):
+    sem = asyncio.Semaphore(CONCURRENCY)
+
+    async def submit(i: int) -> str:
+        async with sem:
+            files = {"file": (f"lecture_{i}.txt", make_txt(32 * 1024, seed=i), "text/plain")}
+            r = await client.post("/api/upload", params={"background": True}, files=files)
+            r.raise_for_status()
+            return r.json()["job_id"]
+
+    start = time.perf_counter()
+    pending = set(await asyncio.gather(*(submit(i) for i in range(UPLOADS))))
+    docs = []
+    while pending:
+        await asyncio.sleep(0.1)
+        for job_id in list(pending):
+            job = (await client.get(f"/api/jobs/{job_id}")).json()
+            if job["status"] in ("done", "failed"):
+                pending.discard(job_id)
+                if job["result"]:
+                    docs.append(job["result"]["id"])
+    jobs_rate = UPLOADS / (time.perf_counter() - start)
+
+    async def summarize(i: int):
+        async with sem:
+            body = {"prompt": "Summarize", "docs": [docs[i % len(docs)]], "style": "detailed", "engine": "textrank"}
+            r = await client.post("/api/query", json=body)
+            r.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(summarize(i) for i in range(QUERIES)))
+    return jobs_rate, QUERIES / (time.perf_counter() - start)
+
+
+def run(workers: int, workdir: str):
+    env = dict(os.environ, DATA_DIR=os.path.join(workdir, f"data_{workers}"), EXTRACT_WORKERS="1",
+               JOB_QUEUE="sqlite", CACHE_MAX_MB="0", CACHE_DIR="", LOG_LEVEL="warning")
+    env.pop("GEMINI_API_KEY", None)
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(PORT), "--workers", str(workers),
+         "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env,
+    )
+    try:
+        time.sleep(3 + workers)
+        jobs_rate, query_rate = asyncio.run(main(workers))
+        return jobs_rate, query_rate
+    finally:
+        server.terminate()
+        server.wait()
+
+
+async def main(workers: int):
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{PORT}", timeout=600) as client:
+        return await run_load(client)
+
+
+if __name__ == "__main__":
+    counts = [int(a) for a in sys.argv[1:]] or [1, 2, 4]
+    print(f"{os.cpu_count()} cores; {UPLOADS} background uploads, {QUERIES} textrank summaries (concurrency {CONCURRENCY})")
+    base = None
+    with tempfile.TemporaryDirectory() as workdir:
+        for n in counts:
+            jobs_rate, query_rate = run(n, workdir)
+            base = base or (jobs_rate, query_rate)
+            print(f"--workers {n}: {jobs_rate:6.1f} upload jobs/s ({jobs_rate / base[0]:.2f}x)   "
+                  f"{query_rate:6.1f} summaries/s ({query_rate / base[1]:.2f}x)")
@@ -0,0 +1,95 @@
+"""Synthetic lecture corpora (PDF, PPTX, TXT) for the benchmarks."""
+import io
+import random
+
+WORDS = (
+    "energy matrix cell theorem algorithm protein vector function derivative integral "
+    "market equilibrium photosynthesis enzyme gradient network entropy velocity force "
+    "memory process thread kernel polynomial probability variance sample hypothesis "
+    "evolution species ecosystem carbon oxygen electron momentum circuit voltage signal"
+).split()
+
+
+def lecture_sentences(n: int, seed: int = 0):
+    rng = random.Random(seed)
+    for i in range(n):
+        words = [rng.choice(WORDS) for _ in range(rng.randint(8, 22))]
+        words[0] = words[0].capitalize()
+        yield " ".join(words) + "."
+
+
+def make_txt(n_bytes: int, seed: int = 0) -> bytes:
+    out, size = [], 0
+    for sent in lecture_sentences(10 ** 9, seed):
+        out.append(sent)
+        size += len(sent) + 1
+        if size >= n_bytes:
+            break
+    return " ".join(out).encode("utf-8")
+
+
+COURSE = "BIO 201  |  Foundations of Life Science  |  Fall Term"
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(pages: int, sentences_per_page: int = 25, seed: int = 0, boilerplate: bool = False) -> bytes:
+    """Minimal hand-written PDF with one text stream per page (boilerplate: course header and page footer)"""
+    sents = lecture_sentences(pages * sentences_per_page, seed)
+    objects = []  # object bodies, numbered from 1
+    objects.append(b"<< /Type /Catalog /Pages 2 0 R >>")
+    objects.append(None)  # pages tree, filled in below
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    kids = []
+    for p in range(pages):
+        lines = [f"Lecture page {p + 1}"] + [next(sents) for _ in range(sentences_per_page)]
+        if boilerplate:
+            lines = [COURSE, "Lecture 4: Cells and Energy"] + lines + ["", f"Page {p + 1} of {pages}",
+                                                                        "(c) 2024 Department of Biology"]
+        ops = ["BT", "/F1 9 Tf", "40 800 Td", "11 TL"] + [f"({_pdf_escape(l)}) '" for l in lines] + ["ET"]
+        stream = "\n".join(ops).encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_num = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_num
+        )
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % k for k in kids),
+        pages,
+    )
+
+    buf = io.BytesIO()
+    buf.write(b"%PDF-1.4\n")
+    offsets = []
+    for i, body in enumerate(objects, start=1):
+        offsets.append(buf.tell())
+        buf.write(b"%d 0 obj\n" % i + body + b"\nendobj\n")
+    xref = buf.tell()
+    buf.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for off in offsets:
+        buf.write(b"%010d 00000 n \n" % off)
+    buf.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return buf.getvalue()
+
+
+def make_pptx(slides: int, bullets_per_slide: int = 6, seed: int = 0, boilerplate: bool = False) -> bytes:
+    """Deck with a title and bullets per slide (boilerplate: footer text boxes with course and slide number)"""
+    from pptx import Presentation
+    from pptx.util import Inches
+
+    prs = Presentation()
+    sents = lecture_sentences(slides * bullets_per_slide, seed)
+    for s in range(slides):
+        slide = prs.slides.add_slide(prs.slide_layouts[1])
+        slide.shapes.title.text = f"Lecture slide {s + 1}"
+        slide.placeholders[1].text = "\n".join(next(sents) for _ in range(bullets_per_slide))
+        if boilerplate:
+            for left, text in ((0.5, COURSE), (8.5, f"{s + 1}")):
+                slide.shapes.add_textbox(Inches(left), Inches(7), Inches(4), Inches(0.4)).text = text
+    buf = io.BytesIO()
+    prs.save(buf)
+    return buf.getvalue()
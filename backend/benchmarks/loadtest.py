@@ -0,0 +1,304 @@
+"""
+Reproducible load suite for the backend against the mock Gemini server.
+
+Starts mock_gemini and the backend itself (fresh DATA_DIR, response cache and
+quotas off), runs each scenario at a fixed concurrency and reports p50/p95/p99
+latency, throughput and the server's RSS (Linux: reads /proc).
+
+    python loadtest.py                                   # every scenario
+    python loadtest.py --scenarios query_ quiz           # name prefixes
+    python loadtest.py --latency-ms 800 --error-rate 0.05
+    python loadtest.py --save baselines/local.json       # record a baseline
+    python loadtest.py --compare baselines/local.json    # exit 1 on a regression
+
+Baselines are only comparable on the same machine with the same options;
+--compare refuses a baseline recorded with different ones.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+import httpx
+
+from corpus import make_pdf, make_pptx, make_txt
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+BACKEND_PORT = 8021
+MOCK_PORT = 8121
+STYLES = ["simple", "detailed", "concept", "qa", "takeaways"]
+CORPUS_DOCS = 8
+
+
+# -----------------------
+# Servers
+# -----------------------
+
+
+def read_status_mb(pid: int, field: str) -> float:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+def children(pid: int) -> List[int]:
+    kids = []
+    try:
+        for tid in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{tid}/children") as f:
+                kids += [int(k) for k in f.read().split()]
+    except OSError:
+        pass
+    return kids
+
+
+def start(args: List[str], cwd: str, env: dict, port: int) -> subprocess.Popen:
+    proc = subprocess.Popen([sys.executable, "-m", "uvicorn", *args, "--port", str(port), "--log-level", "warning"],
+                            cwd=cwd, env=env)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/", timeout=1)
+            return proc
+        except httpx.TransportError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError(f"uvicorn {args[0]} did not come up on port {port}")
+
+
+def stop(proc: subprocess.Popen):
+    proc.terminate()
+    try:
+        proc.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+
+# -----------------------
+# Scenarios
+# -----------------------
+
+
+def upload(kind: str, make: Callable[[int], bytes], mime: str):
+    def build(ctx: dict, n: int):
+        # Distinct content per request: the store is content-addressed and would dedupe repeats
+        files = [make(5000 + i) for i in range(n)]
+        return [("POST", "/api/upload", {"files": {"file": (f"load_{i}.{kind}", f, mime)}}) for i, f in enumerate(files)]
+    return build
+
+
+def query(style: str):
+    def build(ctx: dict, n: int):
+        return [("POST", "/api/query", {"json": {"prompt": "Summarize", "docs": [ctx["docs"][i % len(ctx["docs"])]],
+                                                  "style": style, "mode": "summarize"}}) for i in range(n)]
+    return build
+
+
+def planner(ctx: dict, n: int):
+    return [("POST", "/api/query", {"json": {"prompt": f"Create a 5-day study plan for learning: topic {i}",
+                                              "mode": "planner"}}) for i in range(n)]
+
+
+def items(path: str):
+    def build(ctx: dict, n: int):
+        return [("POST", path, {"json": {"text": ctx["texts"][i % len(ctx["texts"])], "num_questions": 5}})
+                for i in range(n)]
+    return build
+
+
+SCENARIOS: Dict[str, Callable] = {
+    "upload_txt": upload("txt", lambda seed: make_txt(64 * 1024, seed=seed), "text/plain"),
+    "upload_pdf": upload("pdf", lambda seed: make_pdf(20, seed=seed), "application/pdf"),
+    "upload_pptx": upload(
+        "pptx", lambda seed: make_pptx(20, seed=seed),
+        "application/vnd.openxmlformats-officedocument.presentationml.presentation",
+    ),
+    **{f"query_{style}": query(style) for style in STYLES},
+    "query_planner": planner,
+    "quiz": items("/api/quiz"),
+    "flashcards": items("/api/flashcards"),
+}
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(round(q / 100 * (len(sorted_values) - 1))))]
+
+
+async def run_scenario(client: httpx.AsyncClient, requests: list, concurrency: int, warmup: int) -> dict:
+    sem = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async def one(method: str, path: str, kwargs: dict, record: bool):
+        nonlocal errors
+        async with sem:
+            t0 = time.perf_counter()
+            try:
+                r = await client.request(method, path, **kwargs)
+                ok = r.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            if record:
+                latencies.append(time.perf_counter() - t0)
+                errors += not ok
+
+    await asyncio.gather(*(one(*req, record=False) for req in requests[:warmup]))
+    start = time.perf_counter()
+    await asyncio.gather(*(one(*req, record=True) for req in requests[warmup:]))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+    }
+
+
+async def setup_corpus(client: httpx.AsyncClient) -> dict:
+    """Documents for the query scenarios and texts for quiz/flashcards"""
+    docs = []
+    for i in range(CORPUS_DOCS):
+        r = await client.post("/api/upload", files={"file": (f"corpus_{i}.txt", make_txt(48 * 1024, seed=i), "text/plain")})
+        r.raise_for_status()
+        docs.append(r.json()["id"])
+    texts = [make_txt(6 * 1024, seed=100 + i).decode() for i in range(CORPUS_DOCS)]
+    return {"docs": docs, "texts": texts}
+
+
+async def run_suite(opts, backend: subprocess.Popen) -> dict:
+    names = [n for n in SCENARIOS if not opts.scenarios or any(n.startswith(p) for p in opts.scenarios)]
+    results = {}
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{BACKEND_PORT}", timeout=300) as client:
+        ctx = await setup_corpus(client)
+        print(f"{'scenario':16s} {'req':>5s} {'err':>4s} {'rps':>8s} {'p50 ms':>8s} {'p95 ms':>8s} {'p99 ms':>8s} "
+              f"{'rss MB':>7s} {'workers MB':>10s}")
+        for name in names:
+            requests = SCENARIOS[name](ctx, opts.requests + opts.warmup)
+            result = await run_scenario(client, requests, opts.concurrency, opts.warmup)
+            result["rss_mb"] = round(read_status_mb(backend.pid, "VmRSS"), 1)
+            result["workers_rss_mb"] = round(sum(read_status_mb(k, "VmRSS") for k in children(backend.pid)), 1)
+            results[name] = result
+            print(f"{name:16s} {result['requests']:5d} {result['errors']:4d} {result['throughput_rps']:8.1f} "
+                  f"{result['p50_ms']:8.1f} {result['p95_ms']:8.1f} {result['p99_ms']:8.1f} "
+                  f"{result['rss_mb']:7.1f} {result['workers_rss_mb']:10.1f}")
+    results["_server"] = {"peak_rss_mb": round(read_status_mb(backend.pid, "VmHWM"), 1)}
+    return results
+
+
+# -----------------------
+# Baselines
+# -----------------------
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], cwd=BACKEND_DIR,
+                              capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return "unknown"
+
+
+def options_key(opts) -> dict:
+    return {k: getattr(opts, k) for k in ("requests", "concurrency", "warmup", "latency_ms", "error_rate", "workers")}
+
+
+def compare(baseline: dict, current: dict, tolerance: float) -> int:
+    """Print per-scenario deltas; returns the number of regressions"""
+    regressions = 0
+    print(f"\nvs {baseline['meta']['revision']} ({baseline['meta']['recorded']}), tolerance {tolerance:.0%}")
+    for name, now in current["results"].items():
+        before = baseline["results"].get(name)
+        if name.startswith("_") or before is None:
+            continue
+        flags = []
+        for key in ("p95_ms", "p99_ms"):
+            # Ignore sub-5 ms wobble on fast endpoints
+            if now[key] > before[key] * (1 + tolerance) and now[key] - before[key] > 5:
+                flags.append(f"{key} {before[key]:.1f} -> {now[key]:.1f}")
+        if now["throughput_rps"] < before["throughput_rps"] * (1 - tolerance):
+            flags.append(f"rps {before['throughput_rps']:.1f} -> {now['throughput_rps']:.1f}")
+        if now["errors"] > before["errors"]:
+            flags.append(f"errors {before['errors']} -> {now['errors']}")
+        regressions += bool(flags)
+        change = (now["p95_ms"] / before["p95_ms"] - 1) if before["p95_ms"] else 0.0
+        print(f"  {name:16s} p95 {change:+6.1%}  {'REGRESSION: ' + ', '.join(flags) if flags else 'ok'}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--scenarios", nargs="*", help="scenario name prefixes (default: all)")
+    parser.add_argument("--requests", type=int, default=60, help="measured requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=4)
+    parser.add_argument("--latency-ms", type=float, default=300, help="mock Gemini latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of mock calls answered 503")
+    parser.add_argument("--workers", type=int, default=2, help="extraction pool size (EXTRACT_WORKERS)")
+    parser.add_argument("--save", help="write results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown before flagging")
+    opts = parser.parse_args()
+
+    baseline = None
+    if opts.compare:
+        with open(opts.compare) as f:
+            baseline = json.load(f)
+        if baseline["meta"]["options"] != options_key(opts):
+            sys.exit(f"Baseline was recorded with {baseline['meta']['options']}; rerun with the same options")
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        mock_env = dict(os.environ, MOCK_GEMINI_LATENCY_MS=str(opts.latency_ms),
+                        MOCK_GEMINI_ERROR_RATE=str(opts.error_rate))
+        backend_env = dict(
+            os.environ, DATA_DIR=data_dir, GEMINI_API_KEY="mock",
+            GEMINI_API_BASE=f"http://127.0.0.1:{MOCK_PORT}/v1", CACHE_MAX_MB="0", CACHE_DIR="",
+            GEMINI_CLIENT_RPM="0", GEMINI_CLIENT_TPM="0", EXTRACT_WORKERS=str(opts.workers), LOG_LEVEL="warning",
+        )
+        mock = start(["mock_gemini:app"], BENCH_DIR, mock_env, MOCK_PORT)
+        try:
+            backend = start(["main:app"], BACKEND_DIR, backend_env, BACKEND_PORT)
+            try:
+                results = asyncio.run(run_suite(opts, backend))
+            finally:
+                stop(backend)
+        finally:
+            stop(mock)
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "recorded": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "machine": f"{platform.machine()} x{os.cpu_count()}",
+            "options": options_key(opts),
+        },
+        "results": results,
+    }
+    print(f"peak server RSS {results['_server']['peak_rss_mb']:.1f} MB")
+    if opts.save:
+        os.makedirs(os.path.dirname(opts.save) or ".", exist_ok=True)
+        with open(opts.save, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"saved {opts.save}")
+    if baseline is not None and compare(baseline, report, opts.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Local stand-in for the Gemini generateContent / streamGenerateContent endpoints.
+
+Run:   uvicorn mock_gemini:app --port 8100
+Point the backend at it with:
+    GEMINI_API_KEY=mock GEMINI_API_BASE=http://127.0.0.1:8100/v1
+
+Fault injection (env at start-up, or POST /faults with the same keys in lower case):
+    MOCK_GEMINI_ERROR_RATE   share of calls answered 503
+    MOCK_GEMINI_429_RATE     share of calls answered 429 with Retry-After
+    MOCK_GEMINI_SLOW_RATE    share of calls that take MOCK_GEMINI_SLOW_MS instead
+"""
+import asyncio
+import json
+import os
+import random
+import re
+from typing import Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+LATENCY_MS = float(os.getenv("MOCK_GEMINI_LATENCY_MS", "500"))
+STREAM_CHUNKS = int(os.getenv("MOCK_GEMINI_STREAM_CHUNKS", "10"))
+
+FAULTS = {
+    "error_rate": float(os.getenv("MOCK_GEMINI_ERROR_RATE", "0")),
+    "429_rate": float(os.getenv("MOCK_GEMINI_429_RATE", "0")),
+    "slow_rate": float(os.getenv("MOCK_GEMINI_SLOW_RATE", "0")),
+    "slow_ms": float(os.getenv("MOCK_GEMINI_SLOW_MS", "10000")),
+    "retry_after": float(os.getenv("MOCK_GEMINI_RETRY_AFTER", "0.2")),
+}
+
+app = FastAPI(title="Mock Gemini")
+CALLS = {"generate": 0, "stream": 0, "errors": 0, "rate_limited": 0, "slow": 0}
+
+QUIZ_ITEM = {"question": "Mock question?", "options": ["A", "B", "C", "D"], "answer": "A"}
+CARD_ITEM = {"front": "Mock term", "back": "Mock definition"}
+
+
+def mock_items(prompt: str, count: int) -> list:
+    return [QUIZ_ITEM if '"question"' in prompt else CARD_ITEM] * count
+
+
+def mock_answer(prompt: str) -> str:
+    """JSON for quiz/flashcard prompts (single or batched), a bullet otherwise"""
+    if "one key per document number" in prompt:
+        docs = re.findall(r"^Document (\d+) \((\d+) ", prompt, re.M)
+        return json.dumps({n: mock_items(prompt, int(count)) for n, count in docs})
+    m = re.match(r"\s*Generate (\d+) (multiple choice questions|flashcards)", prompt)
+    if m:
+        return json.dumps(mock_items(prompt, int(m.group(1))))
+    return f"• 📘 Mock answer for a {len(prompt)}-char prompt."
+
+
+def candidate(text: str, usage: Optional[dict] = None) -> dict:
+    data = {"candidates": [{"content": {"parts": [{"text": text}]}}]}
+    if usage:
+        data["usageMetadata"] = usage
+    return data
+
+
+def usage_metadata(prompt: str, text: str) -> dict:
+    """Roughly Gemini's accounting: ~4 characters per token"""
+    prompt_tokens, output_tokens = len(prompt) // 4 + 1, len(text) // 4 + 1
+    return {"promptTokenCount": prompt_tokens, "candidatesTokenCount": output_tokens,
+            "totalTokenCount": prompt_tokens + output_tokens}
+
+
+@app.post("/v1/models/{model_action}")
+async def generate_content(model_action: str, request: Request):
+    body = await request.json()
+    prompt = body["contents"][0]["parts"][0]["text"]
+    text = mock_answer(prompt)
+
+    roll = random.random()
+    if roll < FAULTS["error_rate"]:
+        CALLS["errors"] += 1
+        await asyncio.sleep(LATENCY_MS / 1000 / 10)
+        return JSONResponse({"error": {"code": 503, "message": "mock overload"}}, status_code=503)
+    roll -= FAULTS["error_rate"]
+    if roll < FAULTS["429_rate"]:
+        CALLS["rate_limited"] += 1
+        return JSONResponse({"error": {"code": 429, "message": "mock quota"}}, status_code=429,
+                            headers={"Retry-After": str(FAULTS["retry_after"])})
+    latency_ms = LATENCY_MS
+    if random.random() < FAULTS["slow_rate"]:
+        CALLS["slow"] += 1
+        latency_ms = FAULTS["slow_ms"]
+
+    if model_action.endswith(":streamGenerateContent"):
+        CALLS["stream"] += 1
+
+        async def events():
+            # Spread the same total latency over the chunks, like a real token stream
+            step = max(1, len(text) // STREAM_CHUNKS)
+            for i in range(0, len(text), step):
+                await asyncio.sleep(latency_ms / 1000 / STREAM_CHUNKS)
+                # Like Gemini, the final chunk carries the usage for the whole response
+                usage = usage_metadata(prompt, text) if i + step >= len(text) else None
+                yield f"data: {json.dumps(candidate(text[i:i + step], usage))}\r\n\r\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    CALLS["generate"] += 1
+    await asyncio.sleep(latency_ms / 1000)
+    return candidate(text, usage_metadata(prompt, text))
+
+
+@app.get("/stats")
+def stats():
+    """Upstream calls served so far (benchmarks diff this before/after a run)"""
+    return CALLS
+
+
+@app.post("/faults")
+async def set_faults(request: Request):
+    """Change the injected faults at runtime, e.g. {"error_rate": 1.0} for an outage"""
+    FAULTS.update({k: float(v) for k, v in (await request.json()).items() if k in FAULTS})
+    return FAULTS
@@ -0,0 +1,164 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+
+log = logging.getLogger("studybuddy.cache")
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8", errors="ignore")).hexdigest()
+
+
+class ResponseCache:
+    """Two-tier (memory LRU + optional disk) cache for generated text with single-flight fills"""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, ttl: float = 6 * 3600, disk_dir: Optional[str] = None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.disk_dir = disk_dir
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+        self._entries = OrderedDict()  # key -> (expires_at, value, size in UTF-8 bytes)
+        self._bytes = 0
+        self._inflight = {}  # key -> [task, waiters]
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def make_key(endpoint: str, variant, context: str, model: str) -> str:
+        """Stable key over (endpoint, style/num_questions, context hash, model)"""
+        raw = json.dumps([endpoint, str(variant), content_hash(context), model])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    # ---- memory tier ----
+    def _drop(self, key: str):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def _store(self, key: str, value: str, expires_at: float):
+        if key in self._entries:
+            self._drop(key)
+        size = len(value.encode("utf-8", errors="ignore"))
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (expires_at, value, size)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self.evictions += 1
+
+    # ---- disk tier ----
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _disk_get(self, key: str):
+        try:
+            with open(self._disk_path(key), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry["expires_at"] < time.time():
+            self.expirations += 1
+            try:
+                os.remove(self._disk_path(key))
+            except OSError:
+                pass
+            return None
+        return entry
+
+    def _disk_set(self, key: str, value: str, expires_at: float):
+        path = self._disk_path(key)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"expires_at": expires_at, "value": value}, f)
+            os.replace(tmp, path)
+        except OSError as e:
+            log.warning("Cache disk write failed: %s", e)
+
+    # ---- public API ----
+    def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value, _ = entry
+            if expires_at >= time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            self._drop(key)
+            self.expirations += 1
+        if self.disk_dir:
+            disk_entry = self._disk_get(key)
+            if disk_entry is not None:
+                self._store(key, disk_entry["value"], disk_entry["expires_at"])
+                self.hits += 1
+                self.disk_hits += 1
+                return disk_entry["value"]
+        self.misses += 1
+        return None
+
+    def set(self, key: str, value: str):
+        expires_at = time.time() + self.ttl
+        self._store(key, value, expires_at)
+        if self.disk_dir:
+            self._disk_set(key, value, expires_at)
+
+    async def _fill(self, key: str, compute: Callable[[], Awaitable[str]]) -> str:
+        value = await compute()
+        self.set(key, value)
+        return value
+
+    def _release(self, key: str, task: asyncio.Future):
+        slot = self._inflight.get(key)
+        if slot is not None and slot[0] is task:
+            del self._inflight[key]
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[str]]) -> str:
+        """Return the cached value or run compute once, sharing it with identical in-flight callers"""
+        value = self.get(key)
+        if value is not None:
+            return value
+        slot = self._inflight.get(key)
+        if slot is None:
+            task = asyncio.ensure_future(self._fill(key, compute))
+            slot = self._inflight[key] = [task, 0]
+            task.add_done_callback(lambda t: self._release(key, t))
+        else:
+            self.coalesced += 1
+        task = slot[0]
+        slot[1] += 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            slot[1] -= 1
+            # Last interested caller gone (e.g. disconnected): stop the upstream call
+            if slot[1] == 0 and not task.done():
+                task.cancel()
+                # Callers arriving before the cancellation lands must start a fresh fill
+                self._release(key, task)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._inflight),
+        }
@@ -0,0 +1,434 @@
+from __future__ import annotations
+
+import re
+import zlib
+from array import array
+from collections import Counter
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from analysis import STOPWORDS
+from compaction import furniture_masks, is_furniture
+from doc_store import iter_text, write_json_atomic
+from sentences import iter_sentence_blocks
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# Bump whenever phrase extraction or the index layout changes; stale indexes are rebuilt on next use
+QUIZ_INDEX_VERSION = 2
+
+TERM, ENTITY, NUMBER = 0, 1, 2
+MAX_NGRAM = 3
+MAX_ENTITY_WORDS = 4
+# Sentences that make usable questions
+MIN_QUESTION_CHARS = 40
+MAX_QUESTION_CHARS = 400
+MAX_HEADING_WORDS = 12
+# Consecutive sentences sharing a topic window; distractors come from phrases used in similar windows
+WINDOW_SENTENCES = 8
+MAX_WINDOW_SHARE = 0.5  # phrases found in more windows than this are not asked about
+DISTRACTORS = 3
+CANDIDATES = 12  # best-scored distractor candidates checked per question
+BLANK = "_____"
+LETTERS = "ABCDEFGH"
+
+_TOKEN = re.compile(r"[A-Za-z][A-Za-z'\-]*[A-Za-z]|[A-Za-z]|\d+(?:[.,]\d+)*%?")
+_NUMBER_PARTS = re.compile(r"(\d+(?:[.,]\d+)*)(%?)")
+# Word shapes a distractor should share with the answer: acronym, or the last word's inflection
+SHAPES = ("", "upper", "ing", "ed", "ly", "s")
+
+
+# -----------------------
+# Index (built in the extraction pool, at upload or on first use)
+# -----------------------
+def sentence_phrases(sentence: str) -> List[Tuple[str, str, int]]:
+    """(key, surface, kind) for every term n-gram, capitalised entity and number in a sentence"""
+    tokens = [m.group() for m in _TOKEN.finditer(sentence)]
+    out = []
+    run: List[str] = []
+    entity: List[str] = []
+
+    def flush_run():
+        lower = [t.lower() for t in run]
+        cased = lower != run
+        for n in range(1, MAX_NGRAM + 1):
+            for i in range(len(run) - n + 1):
+                key = " ".join(lower[i:i + n])
+                out.append((key, " ".join(run[i:i + n]) if cased else key, TERM))
+        run.clear()
+
+    def flush_entity(first: bool):
+        # A lone capitalised first word is just the start of the sentence
+        if entity and not (first and len(entity) == 1):
+            surface = " ".join(entity[:MAX_ENTITY_WORDS])
+            out.append((surface.lower(), surface, ENTITY))
+        entity.clear()
+
+    entity_start = 0
+    for i, tok in enumerate(tokens):
+        if tok[0].isdigit():
+            flush_run()
+            flush_entity(entity_start == 0)
+            if len(tok) > 1:  # single digits are mostly list numbering
+                out.append((tok, tok, NUMBER))
+            continue
+        lower = tok.lower()
+        if tok[0].isupper() and lower not in STOPWORDS:
+            if not entity:
+                entity_start = i
+            entity.append(tok)
+        else:
+            flush_entity(entity_start == 0)
+        if len(lower) >= 3 and lower not in STOPWORDS:
+            run.append(tok)
+        else:
+            flush_run()
+    flush_run()
+    flush_entity(entity_start == 0)
+    return out
+
+
+def is_heading(line: str, rest: str) -> bool:
+    """True for a title/heading line that the splitter merged into the sentence after it (rest).
+
+    It has no terminal punctuation, is short, and the next line starts a sentence;
+    it is followed by a blank line or title-cased, which a wrapped sentence line rarely is.
+    """
+    words = line.split()
+    if not words or len(words) > MAX_HEADING_WORDS or line[-1] in ".!?:;,":
+        return False
+    after = rest.lstrip(" \t")
+    if after.startswith("\n"):
+        return True
+    after = after.lstrip()
+    if not after or not (after[0].isupper() or after[0].isdigit()):
+        return False
+    last = words[-1].lower()
+    if last in STOPWORDS or len(last) <= 2 and last.isalpha():
+        return False
+    return all(not w[0].isalpha() or w[0].isupper() or len(w) <= 3 or w.lower() in STOPWORDS for w in words)
+
+
+def build_quiz_index(text: str) -> dict:
+    return build_quiz_index_stream(lambda: [text])
+
+
+def build_quiz_index_stream(read: Callable[[], Iterable[str]]) -> dict:
+    """Keyphrases (term n-grams, entities, numbers) and the question-sized sentences they occur in.
+
+    read() returns the text in pieces; it is called twice (page furniture, then sentences).
+    Phrases seen once are dropped unless they are entities or numbers;
+    running headers and headings are trimmed off the sentences they got merged into;
+    sentence spans are UTF-8 byte offsets, like the analysis artifact.
+    """
+    furniture = furniture_masks(read())
+    # Phrase ids in order of first appearance; per-phrase tallies and the rows are flat arrays
+    pids: Dict[str, int] = {}
+    counts, entity_hits = array("l"), array("l")
+    numbers = set()
+    variants: Counter = Counter()  # (pid, surface) for surfaces other than the lower-cased key
+    row_ptr, row_ids = array("l", [0]), array("l")
+    spans, windows = [], []
+    n = byte_pos = 0
+    for block, sentence_spans in iter_sentence_blocks(read()):
+        char_pos = 0
+        for start, end in sentence_spans:
+            while True:
+                nl = block.find("\n", start, end)
+                if nl < 0:
+                    break
+                line = " ".join(block[start:nl].split())
+                if not is_furniture(line, furniture) and not is_heading(line, block[nl + 1:end]):
+                    break
+                start = nl + 1
+                while start < end and block[start].isspace():
+                    start += 1
+            byte_pos += len(block[char_pos:start].encode("utf-8", errors="ignore"))
+            byte_start = byte_pos
+            byte_pos += len(block[start:end].encode("utf-8", errors="ignore"))
+            char_pos = end
+            keys: Dict[int, int] = {}
+            special = {}
+            for key, surface, kind in sentence_phrases(block[start:end]):
+                pid = pids.get(key)
+                if pid is None:
+                    pid = pids[key] = len(counts)
+                    counts.append(0)
+                    entity_hits.append(0)
+                if pid not in keys:
+                    keys[pid] = kind
+                    if surface != key:
+                        variants[pid, surface] += 1
+                if kind != TERM:
+                    special[pid] = kind
+            for pid in keys:
+                counts[pid] += 1
+            for pid, kind in special.items():
+                if kind == NUMBER:
+                    numbers.add(pid)
+                else:
+                    entity_hits[pid] += 1
+            if MIN_QUESTION_CHARS <= end - start <= MAX_QUESTION_CHARS:
+                row_ids.extend(keys)
+                row_ptr.append(len(row_ids))
+                spans.append([byte_start, byte_pos])
+                windows.append(n // WINDOW_SENTENCES)
+            n += 1
+        byte_pos += len(block[char_pos:].encode("utf-8", errors="ignore"))
+    keys_by_pid = list(pids)
+    del pids
+
+    # Most common written form per phrase: its most frequent variant if that beats the lower-cased form
+    forms_by_pid: Dict[int, Tuple[int, str]] = {}
+    for (pid, surface), hits in variants.items():
+        if hits > forms_by_pid.get(pid, (0, ""))[0]:
+            forms_by_pid[pid] = (hits, surface)
+
+    def form_of(pid: int) -> str:
+        hits, surface = forms_by_pid.get(pid, (0, ""))
+        return surface if hits * 2 > counts[pid] else keys_by_pid[pid]
+
+    def kind_of(pid: int) -> int:
+        return NUMBER if pid in numbers else ENTITY if entity_hits[pid] * 2 >= counts[pid] else TERM
+
+    vocab: Dict[int, int] = {}
+    dropped = set()
+    kinds, phrase_counts, forms = [], [], []
+    indptr, indices = [0], []
+    for r in range(len(row_ptr) - 1):
+        for pid in row_ids[row_ptr[r]:row_ptr[r + 1]]:
+            final = vocab.get(pid)
+            if final is None:
+                if pid in dropped:
+                    continue
+                kind = kind_of(pid)
+                if counts[pid] < 2 and kind == TERM:
+                    dropped.add(pid)
+                    continue
+                final = vocab[pid] = len(forms)
+                forms.append(form_of(pid))
+                kinds.append(kind)
+                phrase_counts.append(counts[pid])
+            indices.append(final)
+        indptr.append(len(indices))
+    return {
+        "version": QUIZ_INDEX_VERSION,
+        "sentences": spans,
+        "windows": windows,
+        "phrases": forms,
+        "kinds": kinds,
+        "counts": phrase_counts,
+        "indptr": indptr,
+        "indices": indices,
+    }
+
+
+def prepare_quiz_index(index: dict) -> dict:
+    """Arrays for generation: sentence x phrase and window x phrase incidence, phrase importance"""
+    import numpy as np
+    from scipy import sparse
+
+    n_sent, n_phrases = len(index["sentences"]), len(index["phrases"])
+    indices = np.asarray(index["indices"], dtype=np.int64)
+    matrix = sparse.csr_matrix(
+        (np.ones(indices.size), indices, np.asarray(index["indptr"], dtype=np.int64)), shape=(n_sent, n_phrases)
+    )
+    windows = np.asarray(index["windows"], dtype=np.int64)
+    n_windows = int(windows.max()) + 1 if windows.size else 0
+    grouping = sparse.csr_matrix((np.ones(n_sent), (windows, np.arange(n_sent))), shape=(n_windows, n_sent))
+    by_window = (grouping @ matrix).tocsc()
+    by_window.data[:] = 1.0
+    kinds = np.asarray(index["kinds"], dtype=np.int8)
+    counts = np.asarray(index["counts"], dtype=np.float64)
+    words = np.asarray([p.count(" ") + 1 for p in index["phrases"]], dtype=np.int64)
+    # Frequent but not everywhere; longer phrases and names make better blanks than single words
+    df = np.maximum(np.asarray(matrix.sum(axis=0)).ravel(), 1.0)
+    importance = np.log1p(counts) * np.log1p(n_sent / df) * (1.0 + 0.3 * (words - 1))
+    importance *= np.where(kinds == ENTITY, 1.2, np.where(kinds == NUMBER, 0.8, 1.0))
+    # A blank needs enough same-kind phrases to draw distractors from (numbers can be varied instead)
+    per_kind = np.bincount(kinds, minlength=3) if kinds.size else np.zeros(3, dtype=np.int64)
+    importance[(per_kind[kinds] <= DISTRACTORS) & (kinds != NUMBER)] = 0.0
+    # Phrases in most windows of a long document are running headers ("Lecture page") or filler
+    window_df = np.maximum(np.asarray(by_window.sum(axis=0)).ravel(), 1.0)
+    if n_windows >= 4:
+        importance[window_df > n_windows * MAX_WINDOW_SHARE] = 0.0
+    return {
+        "version": index["version"],
+        "sentences": index["sentences"],
+        "phrases": index["phrases"],
+        "keys": [p.lower() for p in index["phrases"]],
+        "kinds": kinds,
+        "words": words,
+        "shapes": np.asarray([phrase_shape(p) for p in index["phrases"]], dtype=np.int8),
+        "matrix": matrix,
+        "by_window": by_window,
+        "window_df": window_df,
+        "importance": importance,
+    }
+
+
+def phrase_shape(phrase: str) -> int:
+    last = phrase.rsplit(" ", 1)[-1].lower()
+    if phrase.isupper():
+        return 1
+    for shape, suffix in enumerate(SHAPES[2:], 2):
+        if last.endswith(suffix) and not last.endswith("ss"):
+            return shape
+    return 0
+
+
+# -----------------------
+# Generation
+# -----------------------
+def pick_blanks(index: dict, n: int) -> List[Tuple[int, int]]:
+    """(sentence, phrase) pairs for up to n questions: each sentence's most important phrase,
+    best sentences first, every answer used once; returned in document order"""
+    import numpy as np
+
+    matrix = index["matrix"]
+    if matrix.shape[0] == 0 or matrix.nnz == 0 or n <= 0:
+        return []
+    weighted = matrix.multiply(index["importance"][None, :]).tocsr()
+    best = weighted.max(axis=1).toarray().ravel()
+    answer = np.asarray(weighted.argmax(axis=1)).ravel()
+    picks, used = [], set()
+    for s in (-best).argsort(kind="stable"):
+        if best[s] <= 0 or len(picks) == n:
+            break
+        if answer[s] not in used:
+            used.add(answer[s])
+            picks.append((int(s), int(answer[s])))
+    return sorted(picks)
+
+
+def rank_distractors(index: dict, picks: Sequence[Tuple[int, int]], seed: int) -> "np.ndarray":
+    """Candidate distractor ids per pick, best first (-1 where none).
+
+    Candidates are phrases of the answer's kind, scored by how similar the
+    windows they occur in are (cosine over window incidence), with a bonus
+    for the same word count, a penalty for another word shape ("using" for
+    "membrane") and a little seeded noise for variety; phrases of the
+    question sentence itself are excluded.
+    """
+    import numpy as np
+
+    if not picks:
+        return np.zeros((0, CANDIDATES), dtype=np.int64)
+    rows = np.asarray([s for s, _ in picks])
+    answers = np.asarray([a for _, a in picks])
+    by_window, df, kinds, words = index["by_window"], index["window_df"], index["kinds"], index["words"]
+    scores = (by_window[:, answers].T @ by_window).toarray()
+    scores /= np.sqrt(df[answers])[:, None] * np.sqrt(df)[None, :]
+    scores += 0.2 * (words[None, :] == words[answers][:, None])
+    scores -= 0.5 * (index["shapes"][None, :] != index["shapes"][answers][:, None])
+    scores += 0.05 * np.random.default_rng(seed).random(scores.shape)
+    scores[kinds[None, :] != kinds[answers][:, None]] = -np.inf
+    own = index["matrix"][rows].tocoo()
+    scores[own.row, own.col] = -np.inf
+    k = min(CANDIDATES, scores.shape[1])
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    top = np.take_along_axis(top, np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1), axis=1)
+    return np.where(np.isfinite(np.take_along_axis(scores, top, axis=1)), top, -1)
+
+
+def number_distractors(answer: str, rng) -> List[str]:
+    """Plausible wrong numbers: the answer varied by small steps, in the same format"""
+    digits, percent = _NUMBER_PARTS.fullmatch(answer).groups()
+    decimals = len(digits.split(".")[1]) if "." in digits and "," not in digits else 0
+    try:
+        value = float(digits.replace(",", ""))
+    except ValueError:
+        return []
+    step = max(10 ** -decimals, round(abs(value) * 0.1, decimals) or 1)
+    if 1000 <= value <= 2100 and digits.isdigit():  # probably a year
+        step = 1
+    out = []
+    for mult in rng.permutation([-3, -2, -1, 1, 2, 3, 4]):
+        candidate = value + mult * step
+        if candidate < 0:
+            continue
+        text = f"{candidate:,.{decimals}f}" if "," in digits else f"{candidate:.{decimals}f}"
+        text += percent
+        if text != answer and text not in out:
+            out.append(text)
+        if len(out) == DISTRACTORS:
+            break
+    return out
+
+
+def blank_out(sentence: str, phrase: str) -> Optional[Tuple[str, str]]:
+    """(sentence with the phrase blanked, the phrase as written there), or None if it isn't there"""
+    pattern = r"(?<![\w])" + r"\s+".join(re.escape(w) for w in phrase.split()) + r"(?![\w])"
+    match = re.search(pattern, sentence, re.IGNORECASE)
+    if match is None:
+        return None
+    return sentence[:match.start()] + BLANK + sentence[match.end():], match.group()
+
+
+def generate(index: dict, read: Callable[[List[List[int]]], List[str]], kind: str, n: int,
+             seed: int = 0) -> List[dict]:
+    """Up to n cloze quiz questions (4 options) or flashcards from a prepared index.
+
+    read(spans) returns the text of sentence byte spans (Document.read_ranges).
+    """
+    import numpy as np
+
+    # A few spare picks: some sentences end up without enough distractors
+    picks = pick_blanks(index, n + n // 4 + 2)
+    sentences = read([index["sentences"][s] for s, _ in picks])
+    ranked = rank_distractors(index, picks, seed) if kind == "quiz" else None
+    rng = np.random.default_rng(seed)
+    items = []
+    for i, ((s, a), sentence) in enumerate(zip(picks, sentences)):
+        blanked = blank_out(" ".join(sentence.split()), index["phrases"][a])
+        if blanked is None:
+            continue
+        question, answer = blanked
+        if kind != "quiz":
+            items.append({"front": question, "back": answer})
+            continue
+        if index["kinds"][a] == NUMBER:
+            options = number_distractors(answer, rng)
+        else:
+            taken = {w[:5] for w in index["keys"][a].split()}
+            options = []
+            for d in ranked[i]:
+                if d < 0 or len(options) == DISTRACTORS:
+                    break
+                words = {w[:5] for w in index["keys"][d].split()}
+                # "cell" is no distractor for "cell membrane", nor "mitochondrial" next to "mitochondria"
+                if words & taken:
+                    continue
+                taken |= words
+                options.append(index["phrases"][d])
+        if len(options) < DISTRACTORS:
+            continue
+        if question.startswith(BLANK):
+            options = [o[:1].upper() + o[1:] for o in options]
+        options.append(answer)
+        order = rng.permutation(len(options))
+        items.append({
+            "question": question,
+            "options": [options[j] for j in order],
+            "answer": LETTERS[int(np.flatnonzero(order == len(options) - 1)[0])],
+        })
+    return items[:n]
+
+
+def seed_for(key: str) -> int:
+    """Stable seed per document, so the same document always gets the same quiz"""
+    return zlib.crc32(key.encode("utf-8"))
+
+
+def text_reader(text: str) -> Callable[[List[List[int]]], List[str]]:
+    data = text.encode("utf-8", errors="ignore")
+    return lambda spans: [data[s:e].decode("utf-8", errors="ignore") for s, e in spans]
+
+
+# -----------------------
+# Worker function (runs in the extraction pool)
+# -----------------------
+def quiz_index_to(text_path: str, dest: str) -> dict:
+    index = build_quiz_index_stream(lambda: iter_text(text_path))
+    write_json_atomic(dest, index)
+    return index
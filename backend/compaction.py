@@ -0,0 +1,109 @@
+import re
+from collections import Counter
+from typing import Iterable, List, Optional, Set, Tuple
+
+from retrieval import BYTES_PER_TOKEN, estimate_tokens
+
+# A line whose digit-masked form repeats this often is a running header/footer ("CS101 - Lecture 3 - 12")
+BOILERPLATE_MIN_REPEATS = 3
+BOILERPLATE_MAX_CHARS = 80
+# Lines passed through untouched (retrieval's passage separator)
+KEEP_LINES = {"[...]"}
+
+_SPACES = re.compile(r"[ \t\f\v\u00a0\u2000-\u200b\u3000]+")
+_PAGE_MARK = re.compile(r"^(?:(?:page|slide|p\.)\s*)?\d+(?:\s*(?:of|/)\s*\d+)?$", re.IGNORECASE)
+_DECORATION = re.compile(r"^[\W_]+$")
+_DIGITS = re.compile(r"\d+")
+_NON_WORD = re.compile(r"[\W_]+")
+_NON_WORD_LINE = re.compile(r"[^\w\n]+")  # _NON_WORD within a line, once "_" is a space
+
+
+def line_key(line: str) -> str:
+    """Case, punctuation and spacing-insensitive form of a line, for duplicate detection"""
+    return _NON_WORD.sub(" ", line.casefold()).strip()
+
+
+def furniture_masks(pieces: Iterable[str]) -> Set[str]:
+    """Digit-masked forms of the short lines that recur often enough to be running headers/footers,
+    from text that may arrive in pieces (only the current line is held)"""
+    repeats: Counter = Counter()
+
+    def count(line: str):
+        line = _SPACES.sub(" ", line).strip()
+        if len(line) <= BOILERPLATE_MAX_CHARS:
+            repeats[_DIGITS.sub("0", line_key(line))] += 1
+
+    partial = ""
+    for piece in pieces:
+        lines = (partial + piece).splitlines(keepends=True)
+        partial = lines.pop() if lines and not lines[-1].endswith(("\n", "\r")) else ""
+        for line in lines:
+            count(line)
+    count(partial)
+    return {mask for mask, n in repeats.items() if mask and n >= BOILERPLATE_MIN_REPEATS}
+
+
+def is_furniture(line: str, masks: Set[str]) -> bool:
+    """Whether compact() would treat a (whitespace-normalised) line as page furniture: a page mark,
+    or a short line whose masked form is in masks (see furniture_masks)"""
+    if not line or line in KEEP_LINES:
+        return False
+    return bool(_PAGE_MARK.match(line)) or (
+        len(line) <= BOILERPLATE_MAX_CHARS and _DIGITS.sub("0", line_key(line)) in masks
+    )
+
+
+def compact(text: str) -> str:
+    """Normalise whitespace and drop boilerplate and repeated lines, keeping the first occurrence.
+
+    Dropped: page/slide number lines, lines of bullets or rules only, exact
+    repeats (ignoring case, punctuation and spacing), and short lines that
+    recur with only their numbers changed (running headers and footers).
+    """
+    # Each substitution runs once over the "\n"-joined lines rather than line by line (none crosses a newline)
+    lines = [line.strip() for line in _SPACES.sub(" ", "\n".join(text.splitlines())).split("\n")]
+    keys = [key.strip() for key in _NON_WORD_LINE.sub(" ", "\n".join(lines).casefold().replace("_", " ")).split("\n")]
+    masked = [mask if len(line) <= BOILERPLATE_MAX_CHARS else None
+              for line, mask in zip(lines, _DIGITS.sub("0", "\n".join(keys)).split("\n"))]
+    repeats = Counter(m for m in masked if m)
+    seen, seen_masked = set(), set()
+    out: List[str] = []
+    blank = False
+    for line, key, mask in zip(lines, keys, masked):
+        if not line:
+            blank = bool(out)
+            continue
+        if line not in KEEP_LINES:
+            if _PAGE_MARK.match(line) or _DECORATION.match(line):
+                continue
+            if key in seen:
+                continue
+            if mask and repeats[mask] >= BOILERPLATE_MIN_REPEATS:
+                if mask in seen_masked:
+                    continue
+                seen_masked.add(mask)
+            seen.add(key)
+        if blank:
+            out.append("")
+            blank = False
+        out.append(line)
+    return "\n".join(out)
+
+
+def fit_budget(text: str, budget_tokens: int) -> str:
+    """Cut text to budget_tokens (estimated), at a line break when there is one in the last half"""
+    limit = budget_tokens * BYTES_PER_TOKEN
+    data = text.encode("utf-8")
+    if len(data) <= limit:
+        return text
+    cut = data.rfind(b"\n", 0, limit)
+    return data[:cut if cut > limit // 2 else limit].decode("utf-8", errors="ignore")
+
+
+def compact_to_budget(text: str, budget_tokens: Optional[int] = None) -> Tuple[str, int, int]:
+    """compact() then fit_budget(); returns (text, estimated tokens before, estimated tokens after)"""
+    before = estimate_tokens(len(text.encode("utf-8", errors="ignore")))
+    text = compact(text)
+    if budget_tokens:
+        text = fit_budget(text, budget_tokens)
+    return text, before, estimate_tokens(len(text.encode("utf-8", errors="ignore")))
@@ -0,0 +1,345 @@
+import codecs
+import hashlib
+import json
+import mmap
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from textblocks import BLOCK_SUFFIX, BlockText, write_blocks
+
+# Whole-document passes (artifact builders) read the text in pieces of about this size
+TEXT_PIECE_BYTES = 64 * 1024
+
+
+def document_id(text: str) -> str:
+    """Content-hash ID, so identical uploads collapse to one document"""
+    return digest_to_id(hashlib.sha256(text.encode("utf-8", errors="ignore")).hexdigest())
+
+
+def digest_to_id(sha256_hex: str) -> str:
+    return "doc_" + sha256_hex[:16]
+
+
+def write_json_atomic(path: str, data) -> None:
+    """Write JSON beside path and rename it into place, so readers never see half a file"""
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def is_block_file(path: str) -> bool:
+    return path.endswith(BLOCK_SUFFIX)
+
+
+def read_ranges(path: str, ranges: Sequence[Sequence[int]]) -> List[str]:
+    """Decode several [start, end) byte ranges of a document's text (plain UTF-8 or block file) through one mmap"""
+    if not ranges:
+        return []
+    if is_block_file(path):
+        with BlockText(path) as blocks:
+            return blocks.read_ranges(ranges)
+    if os.path.getsize(path) == 0:
+        return ["" for _ in ranges]
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        return [mm[start:end].decode("utf-8", errors="ignore") for start, end in ranges]
+
+
+def read_bytes(path: str) -> bytes:
+    """A document's whole UTF-8 text as bytes"""
+    if is_block_file(path):
+        with BlockText(path) as blocks:
+            return blocks.read()
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def read_text(path: str) -> str:
+    return read_bytes(path).decode("utf-8", errors="ignore")
+
+
+def iter_bytes(path: str, piece_bytes: int = TEXT_PIECE_BYTES) -> Iterator[bytes]:
+    """A document's UTF-8 text in pieces (one block at a time for block files), never all of it at once"""
+    if is_block_file(path):
+        with BlockText(path) as blocks:
+            yield from blocks.iter_blocks()
+        return
+    with open(path, "rb") as f:
+        while True:
+            data = f.read(piece_bytes)
+            if not data:
+                break
+            yield data
+
+
+def iter_text(path: str, piece_bytes: int = TEXT_PIECE_BYTES) -> Iterator[str]:
+    """iter_bytes decoded; characters split between pieces are carried over"""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+    for data in iter_bytes(path, piece_bytes):
+        text = decoder.decode(data)
+        if text:
+            yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+class Document:
+    """Handle to a stored document; the extracted text is only read when asked for.
+
+    ``path`` is a block file (compressed, with a page index) or, for documents
+    stored before compression, a plain UTF-8 text file; offsets are into the
+    UTF-8 text either way.
+    """
+
+    def __init__(self, doc_id: str, name: str, size: int, path: str):
+        self.id = doc_id
+        self.name = name
+        self.size = size
+        self.path = path
+
+    @property
+    def text(self) -> str:
+        return read_text(self.path)
+
+    def read(self, offset: int = 0, length: int = -1) -> bytes:
+        """Read a byte range of the UTF-8 text via mmap, without loading the whole file"""
+        if self.size == 0:
+            return b""
+        if is_block_file(self.path):
+            with BlockText(self.path) as blocks:
+                return blocks.read(offset, None if length < 0 else offset + length)
+        with open(self.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return mm[offset:] if length < 0 else mm[offset:offset + length]
+
+    def read_ranges(self, ranges: Sequence[Sequence[int]]) -> List[str]:
+        """Decode several [start, end) byte ranges of the text through one mmap"""
+        return read_ranges(self.path, ranges)
+
+    def page_count(self) -> int:
+        """Pages (slides) in the page index; plain text files count as one page"""
+        if not is_block_file(self.path):
+            return 1
+        with BlockText(self.path) as blocks:
+            return len(blocks.pages)
+
+    def read_page(self, page: int) -> str:
+        """Text of one page (slide), decompressing only the blocks it spans; IndexError past the last"""
+        if not is_block_file(self.path):
+            if page != 0:
+                raise IndexError(page)
+            return self.text
+        with BlockText(self.path) as blocks:
+            return blocks.read(*blocks.page_span(page)).decode("utf-8", errors="ignore")
+
+
+class DocumentStore(ABC):
+    """Uploaded-document storage: one text file per document plus derived artifacts.
+
+    Texts are stored as block files (compressed, page-indexed) unless
+    compress is False. Subclasses provide the name/id index; files live under ``root``.
+    """
+
+    def __init__(self, root: str, compress: bool = True):
+        self.root = root
+        self.compress = compress
+        self.text_dir = os.path.join(root, "texts")
+        self.artifact_dir = os.path.join(root, "artifacts")
+        os.makedirs(self.text_dir, exist_ok=True)
+        os.makedirs(self.artifact_dir, exist_ok=True)
+
+    # ---- index (implemented by subclasses) ----
+    @abstractmethod
+    def _index(self, doc_id: str, name: str, size: int):
+        ...
+
+    @abstractmethod
+    def get(self, doc_id: str) -> Optional[Document]:
+        ...
+
+    @abstractmethod
+    def get_by_name(self, name: str) -> Optional[Document]:
+        ...
+
+    @abstractmethod
+    def list(self) -> List[dict]:
+        ...
+
+    # ---- text files ----
+    def _text_path(self, doc_id: str) -> str:
+        """The document's block file, or its plain text file if it was stored uncompressed"""
+        path = os.path.join(self.text_dir, doc_id + BLOCK_SUFFIX)
+        if os.path.exists(path):
+            return path
+        return os.path.join(self.text_dir, f"{doc_id}.txt")
+
+    def staging_path(self) -> str:
+        """Temp path that extraction can stream into before add_file"""
+        fd, path = tempfile.mkstemp(dir=self.text_dir, suffix=".tmp")
+        os.close(fd)
+        return path
+
+    def add_file(self, name: str, staged_path: str, sha256_hex: str, size: int,
+                 pages: Optional[Sequence[int]] = None) -> Document:
+        """Adopt an already-written UTF-8 text file (consumes staged_path); pages are its page start offsets"""
+        doc_id = digest_to_id(sha256_hex)
+        path = self._text_path(doc_id)
+        if os.path.exists(path):
+            os.remove(staged_path)
+        elif self.compress:
+            path = os.path.join(self.text_dir, doc_id + BLOCK_SUFFIX)
+            write_blocks(staged_path, path, pages)
+            os.remove(staged_path)
+        else:
+            os.replace(staged_path, path)
+        self._index(doc_id, name, size)
+        return Document(doc_id, name, size, path)
+
+    def add(self, name: str, text: str) -> Document:
+        data = text.encode("utf-8", errors="ignore")
+        staged = self.staging_path()
+        with open(staged, "wb") as f:
+            f.write(data)
+        return self.add_file(name, staged, hashlib.sha256(data).hexdigest(), len(data))
+
+    def find(self, keys: List[str]) -> List[Document]:
+        """Resolve a mix of document IDs and file names, skipping unknown keys"""
+        found, seen = [], set()
+        for key in keys:
+            doc = self.get(key) or self.get_by_name(key)
+            if doc is not None and doc.id not in seen:
+                seen.add(doc.id)
+                found.append(doc)
+        return found
+
+    # ---- derived artifacts (analysis, indexes) ----
+    def artifact_path(self, doc_id: str, kind: str) -> str:
+        return os.path.join(self.artifact_dir, f"{doc_id}.{kind}.json")
+
+    def has_artifact(self, doc_id: str, kind: str, version: int) -> bool:
+        """Whether the stored artifact is from this version; reads only its first bytes
+        (artifacts are dicts written with "version" as their first key)"""
+        try:
+            with open(self.artifact_path(doc_id, kind), "rb") as f:
+                head = f.read(32)
+        except OSError:
+            return False
+        return head.startswith(b'{"version":%d,' % version)
+
+    def load_artifact(self, doc_id: str, kind: str) -> Optional[dict]:
+        try:
+            with open(self.artifact_path(doc_id, kind), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+
+class MemoryDocumentStore(DocumentStore):
+    """Process-local index (the old DOCUMENTS dict behaviour) over a throwaway directory"""
+
+    def __init__(self, root: Optional[str] = None, compress: bool = True):
+        super().__init__(root or tempfile.mkdtemp(prefix="study_buddy_docs_"), compress)
+        self._docs: Dict[str, Tuple[str, int]] = {}
+        self._names: Dict[str, str] = {}
+
+    def _index(self, doc_id: str, name: str, size: int):
+        self._docs.setdefault(doc_id, (name, size))
+        self._names.pop(name, None)  # re-insert so list() keeps upload order
+        self._names[name] = doc_id
+
+    def get(self, doc_id: str) -> Optional[Document]:
+        entry = self._docs.get(doc_id)
+        if entry is None:
+            return None
+        return Document(doc_id, entry[0], entry[1], self._text_path(doc_id))
+
+    def get_by_name(self, name: str) -> Optional[Document]:
+        doc_id = self._names.get(name)
+        if doc_id is None:
+            return None
+        return Document(doc_id, name, self._docs[doc_id][1], self._text_path(doc_id))
+
+    def list(self) -> List[dict]:
+        return [{"id": doc_id, "name": name} for name, doc_id in self._names.items()]
+
+
+class SQLiteDocumentStore(DocumentStore):
+    """SQLite index + one text file per document; safe to share between uvicorn workers"""
+
+    def __init__(self, root: str, compress: bool = True):
+        super().__init__(root, compress)
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS documents (
+                    id TEXT PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS document_names (
+                    name TEXT PRIMARY KEY,
+                    id TEXT NOT NULL REFERENCES documents(id),
+                    updated_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_document_names_id ON document_names(id);
+                """
+            )
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread; WAL lets readers in other workers run alongside a writer
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(os.path.join(self.root, "documents.db"), timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _row_to_doc(self, row) -> Optional[Document]:
+        if row is None:
+            return None
+        doc_id, name, size = row
+        return Document(doc_id, name, size, self._text_path(doc_id))
+
+    def _index(self, doc_id: str, name: str, size: int):
+        now = time.time()
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO documents (id, name, size, created_at) VALUES (?, ?, ?, ?)",
+                (doc_id, name, size, now),
+            )
+            conn.execute(
+                "INSERT INTO document_names (name, id, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET id = excluded.id, updated_at = excluded.updated_at",
+                (name, doc_id, now),
+            )
+
+    def get(self, doc_id: str) -> Optional[Document]:
+        row = self._conn().execute("SELECT id, name, size FROM documents WHERE id = ?", (doc_id,)).fetchone()
+        return self._row_to_doc(row)
+
+    def get_by_name(self, name: str) -> Optional[Document]:
+        row = self._conn().execute(
+            "SELECT d.id, n.name, d.size FROM document_names n JOIN documents d ON d.id = n.id WHERE n.name = ?",
+            (name,),
+        ).fetchone()
+        return self._row_to_doc(row)
+
+    def list(self) -> List[dict]:
+        rows = self._conn().execute("SELECT id, name FROM document_names ORDER BY updated_at").fetchall()
+        return [{"id": doc_id, "name": name} for doc_id, name in rows]
+
+
+def create_document_store(kind: str, root: str, compress: bool = True) -> DocumentStore:
+    if kind == "memory":
+        return MemoryDocumentStore(compress=compress)
+    if kind == "sqlite":
+        return SQLiteDocumentStore(root, compress)
+    raise ValueError(f"Unknown document store: {kind}")
@@ -0,0 +1,274 @@
+import asyncio
+import codecs
+import hashlib
+import importlib
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+READ_CHUNK_SIZE = 1024 * 1024
+# Imported on first use (in the pool workers), not when the web process starts
+PARSER_MODULES = ("PyPDF2", "pptx")
+
+
+class ExtractionError(Exception):
+    """Raised when a document cannot be parsed or exceeds the configured limits"""
+
+
+class TextSink:
+    """Streams text chunks to a file, hashing and counting bytes as it goes.
+
+    With strip=True the leading/trailing whitespace of the whole document is
+    dropped, matching the old ``"".join(...).strip()`` without holding the text.
+    Page (slide) start offsets are recorded for the document store's page index.
+    """
+
+    def __init__(self, path: str, strip: bool = True):
+        self._f = open(path, "wb")
+        self._sha = hashlib.sha256()
+        self._strip = strip
+        self._started = not strip
+        self._pending = ""
+        self.size = 0
+        self.skipped = 0  # leading whitespace bytes dropped by strip
+        self.pages: List[int] = []
+
+    def _emit(self, text: str):
+        data = text.encode("utf-8", errors="ignore")
+        self._sha.update(data)
+        self._f.write(data)
+        self.size += len(data)
+
+    def write(self, chunk: str):
+        if not self._strip:
+            self._emit(chunk)
+            return
+        if not self._started:
+            body = chunk.lstrip()
+            self.skipped += len(chunk[:len(chunk) - len(body)].encode("utf-8", errors="ignore"))
+            chunk = body
+            if not chunk:
+                return
+            self._started = True
+        body = chunk.rstrip()
+        if not body:
+            self._pending += chunk
+            return
+        self._emit(self._pending + body)
+        self._pending = chunk[len(body):]
+
+    def mark_page(self):
+        """Record that a page starts here (where the next non-whitespace text will land)"""
+        self.pages.append(self.size + len(self._pending.encode("utf-8", errors="ignore")))
+
+    def write_all(self, chunks: Iterable[Optional[str]], sep: str = "", pages: bool = False):
+        """Write chunks joined by sep; pages=True marks each chunk as a page (None: an empty one, no sep)"""
+        first = True
+        for chunk in chunks:
+            if chunk is not None:
+                if not first and sep:
+                    self.write(sep)
+                first = False
+            if pages:
+                self.mark_page()
+            if chunk is not None:
+                self.write(chunk)
+
+    def close(self) -> Tuple[int, str, List[int]]:
+        self._f.close()
+        return self.size, self._sha.hexdigest(), self.pages
+
+
+# -----------------------
+# Chunk generators
+# -----------------------
+def iter_pdf_pages(reader, start: int, end: int) -> Iterator[str]:
+    for i in range(start, end):
+        yield reader.pages[i].extract_text() or ""
+
+
+def iter_pptx_slides(prs) -> Iterator[Optional[str]]:
+    """Text per slide; None for slides without any, so page numbers still match slide numbers"""
+    for slide in prs.slides:
+        texts = [shape.text for shape in slide.shapes if hasattr(shape, "text")]
+        yield "\n".join(texts) if texts else None
+
+
+def iter_text_file(path: str) -> Iterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+    with open(path, "rb") as f:
+        while True:
+            data = f.read(READ_CHUNK_SIZE)
+            if not data:
+                break
+            yield decoder.decode(data)
+    yield decoder.decode(b"", final=True)
+
+
+# -----------------------
+# Worker functions (run inside the process pool, so they take paths, not file objects)
+# -----------------------
+def preload_modules(names: Sequence[str]) -> int:
+    """Import modules ahead of their first use; returns the worker's pid"""
+    for name in names:
+        importlib.import_module(name)
+    return os.getpid()
+
+
+def run_discarding_result(fn, *args) -> None:
+    """Call fn for its side effects (say, an artifact file) without pickling its result back"""
+    fn(*args)
+
+
+def pdf_page_count(path: str) -> int:
+    from PyPDF2 import PdfReader
+    return len(PdfReader(path).pages)
+
+
+def extract_pdf_to(path: str, dest: str, start: int = 0, end: Optional[int] = None,
+                   max_pages: Optional[int] = None, strip: bool = True) -> Tuple[int, str, List[int]]:
+    from PyPDF2 import PdfReader
+    reader = PdfReader(path)
+    if max_pages is not None and len(reader.pages) > max_pages:
+        raise ExtractionError(f"Document has {len(reader.pages)} pages; the limit is {max_pages}")
+    end = len(reader.pages) if end is None else end
+    sink = TextSink(dest, strip=strip)
+    sink.write_all(iter_pdf_pages(reader, start, end), sep="\n", pages=True)
+    return sink.close()
+
+
+def join_parts_to(parts: List[str], dest: str, part_pages: Sequence[Sequence[int]]) -> Tuple[int, str, List[int]]:
+    """Concatenate page-range part files with newlines, streaming through one sink.
+
+    part_pages are each part's page offsets; they are shifted to the joined text.
+    """
+    sink = TextSink(dest)
+    offset, pages = 0, []
+    for i, part in enumerate(parts):
+        if i:
+            sink.write("\n")
+            offset += 1
+        pages.extend(offset + p for p in part_pages[i])
+        for chunk in iter_text_file(part):
+            sink.write(chunk)
+        offset += os.path.getsize(part)
+    size, digest, _ = sink.close()
+    # Only the document's leading whitespace is dropped before a page start
+    return size, digest, [max(p - sink.skipped, 0) for p in pages]
+
+
+def extract_pptx_to(path: str, dest: str, max_slides: Optional[int] = None) -> Tuple[int, str, List[int]]:
+    from pptx import Presentation
+    prs = Presentation(path)
+    if max_slides is not None and len(prs.slides) > max_slides:
+        raise ExtractionError(f"Document has {len(prs.slides)} slides; the limit is {max_slides}")
+    sink = TextSink(dest)
+    sink.write_all(iter_pptx_slides(prs), sep="\n", pages=True)
+    return sink.close()
+
+
+def extract_txt_to(path: str, dest: str) -> Tuple[int, str, List[int]]:
+    sink = TextSink(dest)
+    sink.write_all(iter_text_file(path))
+    return sink.close()
+
+
+# -----------------------
+# Pool front-end
+# -----------------------
+class Extractor:
+    """Runs document parsing in a process pool so it never blocks the event loop.
+
+    Text is streamed page by page (slide by slide) straight to ``dest``, so
+    neither the workers nor the web process hold the whole document.
+    """
+
+    def __init__(self, workers: Optional[int] = None, max_pages: int = 1000, pages_per_task: int = 25):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pages = max_pages
+        self.pages_per_task = pages_per_task
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self.pending = 0  # tasks submitted to the pool and not finished yet
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn, not fork: the web process has live threads (anyio pool, asyncio.to_thread)
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    async def run(self, fn, *args):
+        """Run a picklable worker function in the pool"""
+        self.pending += 1
+        pool = self.pool
+        try:
+            return await asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+        except BrokenProcessPool:
+            # A worker died (OOM, a parser crash on a hostile file): this task and the ones queued
+            # with it fail, and the next task gets a fresh pool instead of failing forever
+            if self._pool is pool:
+                self._pool = None
+                pool.shutdown(wait=False, cancel_futures=True)
+            raise
+        finally:
+            self.pending -= 1
+
+    async def warm_up(self, modules: Sequence[str] = PARSER_MODULES) -> int:
+        """Start every worker process and import modules in it; returns how many workers answered"""
+        # Workers are spawned on demand, one per task that finds none idle
+        pids = await asyncio.gather(*(self.run(preload_modules, modules) for _ in range(self.workers)))
+        return len(set(pids))
+
+    async def extract_pdf(self, path: str, dest: str) -> Tuple[int, str, List[int]]:
+        if self.workers == 1:
+            # Nothing to parallelise; skip the extra page-count parse
+            return await self.run(extract_pdf_to, path, dest, 0, None, self.max_pages)
+        pages = await self.run(pdf_page_count, path)
+        if pages > self.max_pages:
+            raise ExtractionError(f"Document has {pages} pages; the limit is {self.max_pages}")
+        # Large PDFs are split into page ranges parsed in parallel; every range re-opens
+        # the file, so never cut more ranges than there are workers to run them
+        step = max(self.pages_per_task, -(-pages // self.workers))
+        ranges = [(s, min(s + step, pages)) for s in range(0, pages, step)]
+        if len(ranges) == 1:
+            return await self.run(extract_pdf_to, path, dest)
+        parts = [f"{dest}.part{i}" for i in range(len(ranges))]
+        try:
+            done = await asyncio.gather(*(
+                self.run(extract_pdf_to, path, part, s, e, None, False) for part, (s, e) in zip(parts, ranges)
+            ))
+            return await self.run(join_parts_to, parts, dest, [offsets for _, _, offsets in done])
+        finally:
+            for part in parts:
+                if os.path.exists(part):
+                    os.remove(part)
+
+    async def extract_to(self, path: str, name: str, dest: str) -> Tuple[int, str, List[int]]:
+        """Extract text from PDF, PPTX, or TXT into dest; returns (bytes written, sha256, page start offsets)"""
+        name = name.lower()
+        if name.endswith(".pdf"):
+            try:
+                return await self.extract_pdf(path, dest)
+            except ExtractionError:
+                raise
+            except Exception as e:
+                raise ExtractionError(f"PDF parsing error: {e}")
+        elif name.endswith(".pptx") or name.endswith(".ppt"):
+            try:
+                return await self.run(extract_pptx_to, path, dest, self.max_pages)
+            except ExtractionError:
+                raise
+            except Exception as e:
+                raise ExtractionError(f"PPTX parsing error: {e}")
+        else:
+            try:
+                return await self.run(extract_txt_to, path, dest)
+            except Exception as e:
+                raise ExtractionError(f"Text read error: {e}")
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
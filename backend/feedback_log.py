@@ -0,0 +1,144 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Optional, Tuple
+
+FIELDS = ("feature", "item_name", "thumbs_up", "rating", "note")
+
+
+class FeedbackLog:
+    """Append-only feedback in SQLite (WAL) with group commit and incrementally maintained aggregates.
+
+    append() queues an entry and resolves once its batch is committed: entries arriving within
+    max_delay share one transaction, so one fsync covers the whole batch. The per-(feature, item)
+    counters are updated in the same transaction, so the summary never has to scan the log.
+    """
+
+    def __init__(self, path: str, max_batch: int = 512, max_delay: float = 0.02):
+        self.path = path
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._local = threading.local()
+        self._pending: List[Tuple[dict, asyncio.Future]] = []
+        self._writer: Optional[asyncio.Task] = None
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._conn() as conn:
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS feedback (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    created_at REAL NOT NULL,
+                    feature TEXT NOT NULL,
+                    item_name TEXT NOT NULL,
+                    thumbs_up INTEGER NOT NULL,
+                    rating INTEGER NOT NULL,
+                    note TEXT
+                );
+                CREATE TABLE IF NOT EXISTS feedback_stats (
+                    feature TEXT NOT NULL,
+                    item_name TEXT NOT NULL,
+                    count INTEGER NOT NULL,
+                    thumbs_up INTEGER NOT NULL,
+                    rated INTEGER NOT NULL,
+                    rating_sum INTEGER NOT NULL,
+                    PRIMARY KEY (feature, item_name)
+                );
+                """
+            )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # Feedback is acknowledged only after its batch is on disk
+            conn.execute("PRAGMA synchronous=FULL")
+            self._local.conn = conn
+        return conn
+
+    async def append(self, entry: dict) -> int:
+        """Durably store one entry; returns its id (usable as a pagination cursor)"""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((entry, future))
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.create_task(self._drain())
+        return await future
+
+    async def _drain(self):
+        await asyncio.sleep(self.max_delay)
+        while self._pending:
+            batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+            try:
+                ids = await asyncio.to_thread(self._write, [entry for entry, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), entry_id in zip(batch, ids):
+                if not future.done():
+                    future.set_result(entry_id)
+
+    def _write(self, entries: List[dict]) -> List[int]:
+        now = time.time()
+        ids = []
+        with self._conn() as conn:
+            for e in entries:
+                cur = conn.execute(
+                    "INSERT INTO feedback (created_at, feature, item_name, thumbs_up, rating, note) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (now, *(e.get(f) for f in FIELDS)),
+                )
+                ids.append(cur.lastrowid)
+                rated = int(e["rating"] > 0)  # 0 means "not rated"
+                conn.execute(
+                    "INSERT INTO feedback_stats (feature, item_name, count, thumbs_up, rated, rating_sum) "
+                    "VALUES (?, ?, 1, ?, ?, ?) ON CONFLICT(feature, item_name) DO UPDATE SET "
+                    "count = count + 1, thumbs_up = thumbs_up + excluded.thumbs_up, "
+                    "rated = rated + excluded.rated, rating_sum = rating_sum + excluded.rating_sum",
+                    (e["feature"], e["item_name"], int(e["thumbs_up"] > 0), rated, e["rating"] if rated else 0),
+                )
+        return ids
+
+    def count(self) -> int:
+        return self._conn().execute("SELECT COALESCE(SUM(count), 0) FROM feedback_stats").fetchone()[0]
+
+    def page(self, cursor: int = 0, limit: int = 100) -> Tuple[List[dict], Optional[int]]:
+        """Entries with id > cursor in log order, and the cursor for the next page (None at the end)"""
+        rows = self._conn().execute(
+            "SELECT id, created_at, feature, item_name, thumbs_up, rating, note FROM feedback "
+            "WHERE id > ? ORDER BY id LIMIT ?",
+            (cursor, limit),
+        ).fetchall()
+        items = [dict(zip(("id", "created_at", *FIELDS), row)) for row in rows]
+        return items, (rows[-1][0] if len(rows) == limit else None)
+
+    def summary(self, feature: Optional[str] = None) -> dict:
+        """Count, mean rating and thumbs-up ratio per feature and per item"""
+        query = "SELECT feature, item_name, count, thumbs_up, rated, rating_sum FROM feedback_stats"
+        rows = self._conn().execute(
+            query + (" WHERE feature = ?" if feature else "") + " ORDER BY feature, item_name",
+            (feature,) if feature else (),
+        ).fetchall()
+        features = {}
+        for name, item, count, thumbs_up, rated, rating_sum in rows:
+            agg = features.setdefault(name, {"count": 0, "thumbs_up": 0, "rated": 0, "rating_sum": 0, "items": {}})
+            agg["items"][item] = _stats(count, thumbs_up, rated, rating_sum)
+            agg["count"] += count
+            agg["thumbs_up"] += thumbs_up
+            agg["rated"] += rated
+            agg["rating_sum"] += rating_sum
+        return {
+            name: {**_stats(agg["count"], agg["thumbs_up"], agg["rated"], agg["rating_sum"]), "items": agg["items"]}
+            for name, agg in features.items()
+        }
+
+
+def _stats(count: int, thumbs_up: int, rated: int, rating_sum: int) -> dict:
+    return {
+        "count": count,
+        "mean_rating": round(rating_sum / rated, 2) if rated else None,
+        "thumbs_up_ratio": round(thumbs_up / count, 3) if count else None,
+    }
@@ -0,0 +1,119 @@
+import asyncio
+import json
+import time
+from typing import AsyncIterator, Optional
+
+import httpx
+from fastapi import Request
+
+
+class ClientDisconnected(Exception):
+    """Raised when the HTTP client goes away while we wait on Gemini"""
+
+
+class GeminiClient:
+    """Async Gemini client with pooled keep-alive connections and bounded concurrency"""
+
+    def __init__(
+        self,
+        url: Optional[str],
+        stream_url: Optional[str] = None,
+        max_concurrency: int = 64,
+        max_keepalive: int = 64,
+        timeout: float = 40.0,
+        connect_timeout: float = 10.0,
+    ):
+        self.url = url
+        self.stream_url = stream_url
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.limits = httpx.Limits(
+            max_connections=max_concurrency,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=60.0,
+        )
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.in_flight = 0
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Created lazily so the pool binds to the running event loop
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                limits=self.limits,
+                timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout),
+                headers={"Content-Type": "application/json"},
+            )
+        return self._client
+
+    async def _post(self, body: dict) -> dict:
+        async with self.semaphore:
+            self.in_flight += 1
+            try:
+                r = await self.client.post(self.url, json=body)
+                r.raise_for_status()
+                return r.json()
+            finally:
+                self.in_flight -= 1
+
+    async def generate(self, prompt: str, deadline: Optional[float] = None) -> dict:
+        """POST a generateContent request; the deadline covers queueing and transfer"""
+        if not self.url:
+            raise RuntimeError("Gemini not configured")
+        body = {"contents": [{"parts": [{"text": prompt}]}]}
+        return await asyncio.wait_for(self._post(body), deadline or self.timeout)
+
+    async def stream(self, prompt: str, deadline: Optional[float] = None,
+                     usage: Optional[dict] = None) -> AsyncIterator[str]:
+        """Yield text deltas from streamGenerateContent (SSE) as they arrive; usageMetadata goes into usage"""
+        if not self.stream_url:
+            raise RuntimeError("Gemini streaming not configured")
+        body = {"contents": [{"parts": [{"text": prompt}]}]}
+        expires = time.monotonic() + (deadline or self.timeout)
+        async with self.semaphore:
+            self.in_flight += 1
+            try:
+                async with self.client.stream("POST", self.stream_url, json=body) as r:
+                    r.raise_for_status()
+                    lines = r.aiter_lines()
+                    while True:
+                        # Bound each read by the time left, so a stalled stream can't outlive the deadline
+                        try:
+                            async with asyncio.timeout(expires - time.monotonic()):
+                                line = await anext(lines)
+                        except StopAsyncIteration:
+                            break
+                        if not line.startswith("data:"):
+                            continue
+                        data = json.loads(line[5:])
+                        if usage is not None and "usageMetadata" in data:
+                            usage.update(data["usageMetadata"])
+                        for part in (data.get("candidates") or [{}])[0].get("content", {}).get("parts", []):
+                            if part.get("text"):
+                                yield part["text"]
+            finally:
+                self.in_flight -= 1
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+async def cancel_on_disconnect(request: Optional[Request], coro, poll_interval: float = 0.5):
+    """Await coro, cancelling it if the client disconnects first"""
+    if request is None:
+        return await coro
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                task.cancel()
+                raise ClientDisconnected("Client disconnected")
+    finally:
+        if not task.done():
+            task.cancel()
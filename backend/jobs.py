@@ -0,0 +1,349 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional
+
+log = logging.getLogger("studybuddy.jobs")
+
+Handler = Callable[[dict], Awaitable[object]]
+
+
+class JobFailed(Exception):
+    """Raised by a handler to fail its job with this message (no traceback logged)"""
+
+
+class JobQueue(ABC):
+    """Background jobs by kind: submit() returns an id, worker tasks run the registered handler.
+
+    Handlers take the JSON payload and return a JSON-serialisable result; get() reports
+    status (queued, running, done, failed), result and error.
+    """
+
+    def __init__(self, concurrency: int = 4):
+        self.concurrency = concurrency
+        self.handlers: Dict[str, Handler] = {}
+        self._workers: List[asyncio.Task] = []
+
+    def handler(self, kind: str):
+        def register(fn: Handler) -> Handler:
+            self.handlers[kind] = fn
+            return fn
+        return register
+
+    @abstractmethod
+    async def submit(self, kind: str, payload: dict) -> str:
+        ...
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    def depth(self) -> Dict[str, int]:
+        """Number of queued and running jobs"""
+
+    @abstractmethod
+    async def _claim(self) -> dict:
+        """Wait for the next job to run (kind, id, payload)"""
+
+    @abstractmethod
+    async def _finish(self, job: dict, status: str, result=None, error: Optional[str] = None):
+        ...
+
+    async def _run(self, job: dict):
+        try:
+            result = await self.handlers[job["kind"]](job["payload"])
+        except JobFailed as e:
+            await self._finish(job, "failed", error=str(e))
+        except Exception as e:
+            log.exception("%s job %s failed", job["kind"], job["id"])
+            await self._finish(job, "failed", error=f"{job['kind']} job failed: {e}")
+        else:
+            await self._finish(job, "done", result=result)
+
+    async def _work(self):
+        while True:
+            job = await self._claim()
+            await self._run(job)
+
+    async def start(self):
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.concurrency)]
+
+    async def stop(self):
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+
+class LocalJobQueue(JobQueue):
+    """Jobs in this process only (the most recent max_jobs are remembered)"""
+
+    def __init__(self, concurrency: int = 4, max_jobs: int = 1000):
+        super().__init__(concurrency)
+        self.max_jobs = max_jobs
+        self._jobs: "OrderedDict[str, dict]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+
+    @property
+    def queue(self) -> asyncio.Queue:
+        # Created lazily so it binds to the running event loop
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        return self._queue
+
+    async def submit(self, kind: str, payload: dict) -> str:
+        job = {"id": uuid.uuid4().hex, "kind": kind, "payload": payload, "status": "queued", "result": None,
+               "error": None, "created_at": time.time(), "started_at": None, "finished_at": None}
+        self._jobs[job["id"]] = job
+        while len(self._jobs) > self.max_jobs:
+            self._jobs.popitem(last=False)
+        await self.queue.put(job)
+        return job["id"]
+
+    def get(self, job_id: str) -> Optional[dict]:
+        return self._jobs.get(job_id)
+
+    def depth(self) -> Dict[str, int]:
+        counts = {"queued": 0, "running": 0}
+        for job in self._jobs.values():
+            if job["status"] in counts:
+                counts[job["status"]] += 1
+        return counts
+
+    async def _claim(self) -> dict:
+        job = await self.queue.get()
+        job["status"], job["started_at"] = "running", time.time()
+        return job
+
+    async def _finish(self, job: dict, status: str, result=None, error: Optional[str] = None):
+        job.update(status=status, result=result, error=error, finished_at=time.time())
+
+
+class SQLiteJobQueue(JobQueue):
+    """Jobs in a SQLite file shared by every process (uvicorn workers, hosts on a shared volume).
+
+    One poller per process claims the oldest queued job with a single UPDATE ... RETURNING whenever
+    a worker task is free, and only after a read-only check found something to claim; while idle it
+    polls every poll_interval, backing off to max_poll_interval. A claimed job holds a lease its
+    worker keeps renewing; a job whose lease runs out (its process died) is handed out again, up to
+    max_attempts times. Finished jobs are pruned after `retention` seconds.
+    """
+
+    def __init__(self, path: str, concurrency: int = 4, poll_interval: float = 0.2, lease: float = 60.0,
+                 max_attempts: int = 3, retention: float = 86400.0, max_poll_interval: float = 2.0):
+        super().__init__(concurrency)
+        self.path = path
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.retention = retention
+        self.worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self._local = threading.local()
+        self._wake: Optional[asyncio.Event] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._ready: Optional[asyncio.Queue] = None
+        self._last_prune = 0.0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._conn() as conn:
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    worker TEXT,
+                    lease_until REAL,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL
+                );
+                CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, created_at);
+                """
+            )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @property
+    def wake(self) -> asyncio.Event:
+        if self._wake is None:
+            self._wake = asyncio.Event()
+        return self._wake
+
+    @property
+    def slots(self) -> asyncio.Semaphore:
+        """Worker tasks not running a job"""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.concurrency)
+        return self._slots
+
+    @property
+    def ready(self) -> asyncio.Queue:
+        """Jobs the poller claimed, waiting for a worker task"""
+        if self._ready is None:
+            self._ready = asyncio.Queue()
+        return self._ready
+
+    async def submit(self, kind: str, payload: dict) -> str:
+        job_id = uuid.uuid4().hex
+        await asyncio.to_thread(self._insert, job_id, kind, json.dumps(payload))
+        # Workers in this process start right away; the others find it on their next poll
+        self.wake.set()
+        return job_id
+
+    def _insert(self, job_id: str, kind: str, payload: str):
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, payload, status, created_at) VALUES (?, ?, ?, 'queued', ?)",
+                (job_id, kind, payload, time.time()),
+            )
+
+    def get(self, job_id: str) -> Optional[dict]:
+        row = self._conn().execute(
+            "SELECT id, kind, payload, status, result, error, created_at, started_at, finished_at "
+            "FROM jobs WHERE id = ?",
+            (job_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        job = dict(zip(("id", "kind", "payload", "status", "result", "error", "created_at", "started_at",
+                        "finished_at"), row))
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        return job
+
+    def depth(self) -> Dict[str, int]:
+        rows = self._conn().execute(
+            "SELECT status, COUNT(*) FROM jobs WHERE status IN ('queued', 'running') GROUP BY status"
+        ).fetchall()
+        return {"queued": 0, "running": 0, **dict(rows)}
+
+    def _claimable(self) -> bool:
+        """Read-only check for a queued job or an expired lease, so idle polls never take the write lock"""
+        row = self._conn().execute(
+            "SELECT 1 FROM jobs WHERE status = 'queued' "
+            "UNION ALL SELECT 1 FROM jobs WHERE status = 'running' AND lease_until < ? LIMIT 1",
+            (time.time(),),
+        ).fetchone()
+        return row is not None
+
+    def _claim_one(self) -> Optional[dict]:
+        now = time.time()
+        with self._conn() as conn:
+            # Jobs whose worker died mid-run get their lease revoked: retried, or failed for good
+            conn.execute(
+                "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END, "
+                "error = CASE WHEN attempts >= ? THEN 'Worker lost too many times' ELSE error END, "
+                "finished_at = CASE WHEN attempts >= ? THEN ? ELSE NULL END "
+                "WHERE status = 'running' AND lease_until < ?",
+                (self.max_attempts, self.max_attempts, self.max_attempts, now, now),
+            )
+            row = conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, worker = ?, lease_until = ?, "
+                "started_at = ? WHERE id = (SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1) "
+                "RETURNING id, kind, payload",
+                (self.worker_id, now + self.lease, now),
+            ).fetchone()
+        if row is None:
+            return None
+        return {"id": row[0], "kind": row[1], "payload": json.loads(row[2])}
+
+    def _prune(self):
+        with self._conn() as conn:
+            conn.execute("DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?",
+                         (time.time() - self.retention,))
+
+    async def _next_job(self) -> dict:
+        """Poll until a job is claimed; submit() in this process cuts the wait short"""
+        interval = self.poll_interval
+        while True:
+            self.wake.clear()
+            if time.time() - self._last_prune > 600:
+                self._last_prune = time.time()
+                await asyncio.to_thread(self._prune)
+            if await asyncio.to_thread(self._claimable):
+                job = await asyncio.to_thread(self._claim_one)
+                if job is not None:
+                    return job
+            try:
+                await asyncio.wait_for(self.wake.wait(), interval)
+                interval = self.poll_interval
+            except asyncio.TimeoutError:
+                interval = min(interval * 2, self.max_poll_interval)
+
+    async def _poll(self):
+        while True:
+            await self.slots.acquire()
+            try:
+                job = await self._next_job()
+            except Exception:
+                # One poller serves every worker task, so a database hiccup must not end it
+                log.exception("Polling for jobs failed")
+                self.slots.release()
+                await asyncio.sleep(self.max_poll_interval)
+                continue
+            self.ready.put_nowait(job)
+
+    async def _claim(self) -> dict:
+        return await self.ready.get()
+
+    async def start(self):
+        await super().start()
+        self._workers.append(asyncio.create_task(self._poll()))
+
+    def _renew(self, job_id: str):
+        with self._conn() as conn:
+            conn.execute("UPDATE jobs SET lease_until = ? WHERE id = ? AND worker = ?",
+                         (time.time() + self.lease, job_id, self.worker_id))
+
+    async def _run(self, job: dict):
+        async def heartbeat():
+            while True:
+                await asyncio.sleep(self.lease / 3)
+                await asyncio.to_thread(self._renew, job["id"])
+
+        beat = asyncio.create_task(heartbeat())
+        try:
+            await super()._run(job)
+        finally:
+            beat.cancel()
+            self.slots.release()
+
+    def _complete(self, job_id: str, status: str, result: Optional[str], error: Optional[str]):
+        with self._conn() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, lease_until = NULL "
+                "WHERE id = ? AND worker = ?",
+                (status, result, error, time.time(), job_id, self.worker_id),
+            )
+
+    async def _finish(self, job: dict, status: str, result=None, error: Optional[str] = None):
+        encoded = json.dumps(result) if result is not None else None
+        await asyncio.to_thread(self._complete, job["id"], status, encoded, error)
+
+
+def create_job_queue(kind: str, path: str, concurrency: int = 4) -> JobQueue:
+    if kind == "local":
+        return LocalJobQueue(concurrency)
+    if kind == "sqlite":
+        return SQLiteJobQueue(path, concurrency)
+    raise ValueError(f"Unknown job queue: {kind}")
@@ -0,0 +1,164 @@
+import json
+import re
+from typing import Any, Iterable, List, Optional, Type
+
+from pydantic import BaseModel, ValidationError, field_validator
+
+_FENCE = re.compile(r"```[a-zA-Z]*\s*")
+
+
+class QuizItem(BaseModel):
+    question: str
+    options: List[str]
+    answer: str
+
+    @field_validator("question", "answer", mode="before")
+    @classmethod
+    def _text(cls, v):
+        v = str(v).strip() if isinstance(v, (str, int, float)) else v
+        if not v:
+            raise ValueError("must not be empty")
+        return v
+
+    @field_validator("options", mode="before")
+    @classmethod
+    def _options(cls, v):
+        if not isinstance(v, list) or not 2 <= len(v) <= 6:
+            raise ValueError("expected 2-6 options")
+        return [str(o).strip() for o in v]
+
+
+class Flashcard(BaseModel):
+    front: str
+    back: str
+
+    @field_validator("front", "back", mode="before")
+    @classmethod
+    def _text(cls, v):
+        v = str(v).strip() if isinstance(v, (str, int, float)) else v
+        if not v:
+            raise ValueError("must not be empty")
+        return v
+
+
+ITEM_MODELS = {"quiz": QuizItem, "flashcards": Flashcard}
+
+
+def strip_code_fences(text: str) -> str:
+    return _FENCE.sub("", text)
+
+
+def remove_trailing_commas(text: str) -> str:
+    """Drop commas that directly precede } or ] (outside strings)"""
+    out, in_string, escape, pending = [], False, False, None
+    for ch in text:
+        if in_string:
+            out.append(ch)
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if pending is not None:
+            if ch.isspace():
+                pending.append(ch)
+                continue
+            if ch not in "}]":
+                out.append(",")
+            out.extend(pending[1:])
+            pending = None
+        if ch == ",":
+            pending = [ch]
+            continue
+        if ch == '"':
+            in_string = True
+        out.append(ch)
+    return "".join(out)
+
+
+def loads_lenient(text: str) -> Optional[Any]:
+    """json.loads, retried without code fences and trailing commas; None if still invalid"""
+    for candidate in (text, remove_trailing_commas(strip_code_fences(text).strip())):
+        try:
+            return json.loads(candidate, strict=False)
+        except ValueError:
+            continue
+    return None
+
+
+class JSONArrayStream:
+    """Incrementally pulls complete objects out of an LLM's JSON array of objects.
+
+    Anything before the array (prose, code fences) is skipped, the array may
+    be nested in a wrapper object, and a truncated tail is simply never
+    emitted: every object that was closed is recovered.
+    """
+
+    def __init__(self):
+        self._state = "search"  # search -> opened ("[" seen) -> array -> done
+        self._depth = 0  # nesting depth inside the array's current item
+        self._buf: List[str] = []
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, chunk: str) -> List[Any]:
+        out = []
+        for ch in chunk:
+            if self._state == "search":
+                if ch == "[":
+                    self._state = "opened"
+                continue
+            if self._state == "opened":
+                # Only "[" followed by "{" starts the array; "[see notes]" in prose does not
+                if ch.isspace():
+                    continue
+                self._state = "array" if ch == "{" else "search"
+                if self._state == "search":
+                    continue
+            if self._state != "array":
+                break
+            if self._depth == 0:
+                if ch == "{":
+                    self._depth = 1
+                    self._buf = [ch]
+                elif ch == "]":
+                    self._state = "done"
+                continue
+            self._buf.append(ch)
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    obj = loads_lenient("".join(self._buf))
+                    self._buf = []
+                    if isinstance(obj, dict):
+                        out.append(obj)
+        return out
+
+
+def validate_items(objs: Iterable[Any], model: Type[BaseModel]) -> List[dict]:
+    """Keep the entries that match model, dropping the rest"""
+    items = []
+    for obj in objs:
+        try:
+            items.append(model.model_validate(obj).model_dump())
+        except ValidationError:
+            continue
+    return items
+
+
+def parse_items(text: str, model: Type[BaseModel]) -> List[dict]:
+    """Every valid item of the (first) array of objects in text, however it was wrapped or cut off"""
+    return validate_items(JSONArrayStream().feed(text), model)
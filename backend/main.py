@@ -1,20 +1,59 @@
 import os
 import json
-import requests
-import re
+import asyncio
+import inspect
+import logging
+import secrets
+import tempfile
+import time
+import uuid
+from collections import OrderedDict
+from contextvars import ContextVar
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
-from datetime import datetime
-from typing import List, Optional
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from bisect import bisect_right
+from itertools import islice
+from typing import AsyncIterator, Iterable, Iterator, List, Optional
+from fastapi import FastAPI, File, UploadFile, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from PyPDF2 import PdfReader
-from pptx import Presentation
+
+from llm_json import ITEM_MODELS, Flashcard, JSONArrayStream, QuizItem, parse_items, validate_items
+from gemini_client import GeminiClient, ClientDisconnected, cancel_on_disconnect
+from observability import REGISTRY, REQUEST_ID, TRACE, configure_logging, server_timing, span
+from quota import QuotaLimiter
+from resilience import CircuitBreaker, CircuitOpen, LatencyTracker, Resilience, hedge, is_retryable
+from batching import BATCH_FORMATS, batch_prompt, ndjson, pack_entries, parse_batch
+from cache import ResponseCache
+from cloze import QUIZ_INDEX_VERSION, build_quiz_index, generate, prepare_quiz_index, quiz_index_to, seed_for, text_reader
+from compaction import compact, compact_to_budget
+from analysis import ANALYSIS_VERSION, analyze_to, position_score, terms, top_sentence_indices
+from doc_store import Document, create_document_store, document_id
+from extraction import PARSER_MODULES, Extractor, ExtractionError, preload_modules, run_discarding_result
+from feedback_log import FeedbackLog
+from jobs import JobFailed, create_job_queue
+from sentences import iter_sentence_spans, iter_sentences
+from mapreduce import SECTION_PROMPT_VERSION, condense, group_spans, section_prompt, section_size
+from planner import PlanCache, parse_plan_text, parse_request
+from retrieval import CHUNK_INDEX_VERSION, estimate_tokens, index_chunks_to, prepare_chunk_index, retrieve_context
 
 # -----------------------
 # Configuration & Setup
 # -----------------------
-app = FastAPI(title="AI Study Buddy Backend (Optimized Build)")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if WARMUP:
+        await warm_up()
+    await JOBS.start()
+    yield
+    await JOBS.stop()
+    await GEMINI.aclose()
+    EXTRACTOR.shutdown()
+    LOG_LISTENER.stop()
+
+
+app = FastAPI(title="AI Study Buddy Backend (Optimized Build)", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -24,94 +63,578 @@ app.add_middleware(
     allow_headers=["*"],
 )
 load_dotenv()
+
+# Level-gated logging with the request ID on every line; written from a background thread
+LOG = logging.getLogger("studybuddy")
+LOG_LISTENER = configure_logging("studybuddy", os.getenv("LOG_LEVEL", "INFO"), os.getenv("LOG_FORMAT", "text"))
+# Per-request stage timings come back in a Server-Timing header for requests sent with X-Trace: 1
+# (or for every request with TRACE_REQUESTS=1)
+TRACE_ALL = os.getenv("TRACE_REQUESTS", "0") == "1"
+
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+GEMINI_API_BASE = os.getenv("GEMINI_API_BASE", "https://generativelanguage.googleapis.com/v1")
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
 GEMINI_TEXT_URL = (
-    f"https://generativelanguage.googleapis.com/v1/models/gemini-2.5-flash:generateContent?key={GEMINI_API_KEY}"
+    f"{GEMINI_API_BASE}/models/{GEMINI_MODEL}:generateContent?key={GEMINI_API_KEY}"
     if GEMINI_API_KEY
     else None
 )
+GEMINI_STREAM_URL = (
+    f"{GEMINI_API_BASE}/models/{GEMINI_MODEL}:streamGenerateContent?alt=sse&key={GEMINI_API_KEY}"
+    if GEMINI_API_KEY
+    else None
+)
+
+# Shared pooled client: bounded concurrency, keep-alive connections, per-call deadline
+GEMINI = GeminiClient(
+    GEMINI_TEXT_URL,
+    stream_url=GEMINI_STREAM_URL,
+    max_concurrency=int(os.getenv("GEMINI_MAX_CONCURRENCY", "64")),
+    timeout=float(os.getenv("GEMINI_TIMEOUT", "40")),
+)
+
+# Retries on 429/5xx with jittered backoff, a circuit breaker that sends traffic straight to local
+# generation while Gemini is unhealthy, and per-endpoint deadlines learned from recent latencies
+RESILIENCE = Resilience(
+    CircuitBreaker(
+        failures=int(os.getenv("GEMINI_BREAKER_FAILURES", "5")),
+        cooldown=float(os.getenv("GEMINI_BREAKER_COOLDOWN", "30")),
+    ),
+    LatencyTracker(floor=float(os.getenv("GEMINI_MIN_DEADLINE", "5")), ceiling=GEMINI.timeout),
+    retries=int(os.getenv("GEMINI_RETRIES", "2")),
+)
+# Optional hedging: answer locally if Gemini misses this SLO (seconds); the call still fills the cache
+GEMINI_HEDGE_SLO = float(os.getenv("GEMINI_HEDGE_SLO", "0")) or None
+
+# Generated answers keyed by (endpoint, style/num_questions, context hash, model)
+CACHE = ResponseCache(
+    max_bytes=int(os.getenv("CACHE_MAX_MB", "64")) * 1024 * 1024,
+    ttl=float(os.getenv("CACHE_TTL", "21600")),
+    disk_dir=os.getenv("CACHE_DIR") or None,
+)
+
+# Uploaded documents live in a content-addressed store (sqlite by default, shared by workers);
+# texts are kept as compressed blocks with a page index unless DOC_COMPRESSION=0
+DATA_DIR = os.getenv("DATA_DIR", "data")
+DOCUMENTS = create_document_store(
+    os.getenv("DOC_STORE", "sqlite"), os.path.join(DATA_DIR, "documents"),
+    compress=os.getenv("DOC_COMPRESSION", "1") == "1",
+)
+
+# Gemini token buckets per client and for the whole deployment (0 = unlimited), shared by all
+# workers through SQLite; usage is settled from Gemini's usageMetadata after each call
+QUOTA = QuotaLimiter(
+    os.path.join(DATA_DIR, "quota.db"),
+    client_rpm=int(os.getenv("GEMINI_CLIENT_RPM", "0")),
+    client_tpm=int(os.getenv("GEMINI_CLIENT_TPM", "0")),
+    global_rpm=int(os.getenv("GEMINI_GLOBAL_RPM", "0")),
+    global_tpm=int(os.getenv("GEMINI_GLOBAL_TPM", "0")),
+)
+GEMINI_PRIORITIES = {"batch": "batch"}  # endpoint -> priority class; everything else is interactive
+CLIENT_ID: ContextVar[str] = ContextVar("client_id", default="anonymous")
+# Behind an ingress/load balancer every request comes from its address; name the header it sets
+# (e.g. X-Forwarded-For) to identify clients by it instead. Only the last entry, the one the proxy
+# appended, is used: earlier ones are whatever the client sent. Only set this behind such a proxy.
+CLIENT_ID_HEADER = os.getenv("CLIENT_ID_HEADER", "").lower()
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+
+def client_id(request: Request) -> str:
+    """Who a request counts against for quotas: the trusted proxy header's client, else the peer address"""
+    forwarded = request.headers.get(CLIENT_ID_HEADER, "") if CLIENT_ID_HEADER else ""
+    if forwarded.strip(", "):
+        return forwarded.rsplit(",", 1)[-1].strip()[:64] or "anonymous"
+    return request.client.host if request.client else "anonymous"
+
+
+@app.middleware("http")
+async def request_context(request: Request, call_next):
+    """Caller (for quotas), request ID (for logs), optional trace and timing for every request.
+
+    Set here, they follow the request into cache fills and hedged Gemini calls as well.
+    """
+    CLIENT_ID.set(client_id(request))
+    request_id = request.headers.get("x-request-id", "")[:64] or uuid.uuid4().hex[:16]
+    REQUEST_ID.set(request_id)
+    trace = [] if TRACE_ALL or request.headers.get("x-trace") else None
+    TRACE.set(trace)
+    start = time.perf_counter()
+    response = await call_next(request)
+    elapsed = time.perf_counter() - start
+    route = getattr(request.scope.get("route"), "path", "unmatched")
+    HTTP_SECONDS.observe(elapsed, request.method, route, str(response.status_code))
+    response.headers["X-Request-ID"] = request_id
+    if trace is not None:
+        response.headers["Server-Timing"] = server_timing(trace + [("total", elapsed)])
+    return response
+
+# Upload limits and the process pool that parses documents off the event loop
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_MB", "50")) * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+UPLOAD_DIR = os.path.join(DATA_DIR, "uploads")
+os.makedirs(UPLOAD_DIR, exist_ok=True)
+EXTRACTOR = Extractor(
+    workers=int(os.getenv("EXTRACT_WORKERS", "0")) or None,
+    max_pages=int(os.getenv("MAX_PAGES", "1000")),
+    pages_per_task=int(os.getenv("PDF_PAGES_PER_TASK", "25")),
+)
+
+# Parsers and numpy/scipy are imported on first use to keep cold starts short; WARMUP=1 loads them
+# (and starts the extraction workers) before the first request instead
+WARMUP = os.getenv("WARMUP", "0") == "1"
+WARMUP_MODULES = ("summarizer",)  # numpy + scipy.sparse
+
+
+async def warm_up():
+    """Pay first-use import and process start-up costs during startup"""
+    start = time.perf_counter()
+    await asyncio.to_thread(preload_modules, WARMUP_MODULES)
+    workers = await EXTRACTOR.warm_up((*PARSER_MODULES, *WARMUP_MODULES))
+    LOG.info("Warm-up done in %.2fs (%d extraction workers)", time.perf_counter() - start, workers)
+
+# Long-running work (background uploads, batch generation) goes through a job queue: "sqlite" shares
+# it between uvicorn workers and hosts on the same DATA_DIR, "local" keeps it in this process
+JOBS = create_job_queue(
+    os.getenv("JOB_QUEUE", "sqlite"), os.path.join(DATA_DIR, "jobs.db"),
+    concurrency=int(os.getenv("JOB_CONCURRENCY", "4")),
+)
 
-# Store documents and feedbacks in memory
-DOCUMENTS = {}
-FEEDBACKS = []
+# Metrics served at /metrics (stage timings live in observability.STAGE_SECONDS)
+EXTRACT_TYPES = {"pdf", "pptx", "ppt", "txt"}
+HTTP_SECONDS = REGISTRY.histogram(
+    "studybuddy_http_request_seconds", "Time to response headers", ["method", "route", "status"]
+)
+EXTRACTION_SECONDS = REGISTRY.histogram(
+    "studybuddy_extraction_seconds", "Text extraction time per file type", ["type"]
+)
+GEMINI_SECONDS = REGISTRY.histogram(
+    "studybuddy_gemini_seconds", "Gemini call latency, retries included", ["endpoint", "outcome"]
+)
+ANSWERS = REGISTRY.counter(
+    "studybuddy_answers_total", "Answers served, by where they came from (gemini, cache, local)",
+    ["endpoint", "style", "source"],
+)
+PROMPT_TOKENS = REGISTRY.counter(
+    "studybuddy_prompt_input_tokens_total", "Estimated prompt input tokens before and after compaction",
+    ["input", "stage"],
+)
+REGISTRY.counter(
+    "studybuddy_cache_lookups_total", "Response cache lookups", ["result"],
+    fn=lambda: {("hit",): CACHE.hits, ("miss",): CACHE.misses},
+)
+REGISTRY.counter(
+    "studybuddy_plan_cache_lookups_total", "Local study plan cache lookups", ["result"],
+    fn=lambda: {("hit",): PLANS.hits, ("miss",): PLANS.misses},
+)
+REGISTRY.gauge(
+    "studybuddy_queue_depth", "Work waiting or in progress", ["queue"],
+    fn=lambda: {
+        ("gemini",): GEMINI.in_flight,
+        ("cache_fills",): CACHE.stats()["in_flight"],
+        ("extraction",): EXTRACTOR.pending,
+        **{(f"jobs_{status}",): n for status, n in JOBS.depth().items()},
+    },
+)
+REGISTRY.gauge(
+    "studybuddy_gemini_breaker_open", "1 while the circuit breaker keeps traffic off Gemini",
+    fn=lambda: int(RESILIENCE.breaker.state == "open"),
+)
+REGISTRY.counter("studybuddy_gemini_retries_total", "Gemini calls retried", fn=lambda: RESILIENCE.retried)
+
+# Per-document artifacts: kind -> (version, pool worker, in-memory preparation)
+ARTIFACT_BUILDERS = {
+    "analysis": (ANALYSIS_VERSION, analyze_to, None),
+    "chunks": (CHUNK_INDEX_VERSION, index_chunks_to, prepare_chunk_index),
+    "quiz": (QUIZ_INDEX_VERSION, quiz_index_to, prepare_quiz_index),
+}
+# Built at upload; the rest on first use. The quiz index only serves the local batch fallback, so with
+# Gemini configured it isn't worth the (slowest) build on every upload
+UPLOAD_ARTIFACTS = ["analysis", "chunks"] if GEMINI_API_KEY else list(ARTIFACT_BUILDERS)
+# Recently used artifacts (documents are content-addressed, so entries never go stale)
+ARTIFACTS = OrderedDict()
+MAX_CACHED_ARTIFACTS = 128
+
+# Prompt context budget per summary style, filled with the best-matching chunks
+CONTEXT_TOKEN_BUDGETS = {"simple": 1500, "detailed": 3000, "concept": 2000, "qa": 2500, "takeaways": 2500}
+CONTEXT_TOKEN_BUDGET_DEFAULT = 2000
+# Map-reduce summarisation: concurrent section calls per request, and the quiz/flashcard input size
+# above which the text is condensed first instead of being sent whole
+MAPREDUCE_FAN_OUT = int(os.getenv("MAPREDUCE_FAN_OUT", "8"))
+QUIZ_CONTEXT_TOKENS = int(os.getenv("QUIZ_CONTEXT_TOKENS", "8000"))
+
+# Batch quiz/flashcards: per-document context, documents packed per prompt, concurrent packed calls
+BATCH_DOC_TOKENS = int(os.getenv("BATCH_DOC_TOKENS", "3000"))
+BATCH_PROMPT_TOKENS = int(os.getenv("BATCH_PROMPT_TOKENS", "12000"))
+BATCH_MAX_DOCS_PER_CALL = int(os.getenv("BATCH_MAX_DOCS_PER_CALL", "8"))
+BATCH_FAN_OUT = int(os.getenv("BATCH_FAN_OUT", "8"))
+MAX_BATCH_ITEMS = 200
+MAX_ITEMS_PER_DOC = 50  # questions/cards per request or batch document
+
+PSEUDO_QUERY_TERMS = 20  # top terms per document used as its query when no question is asked
+
+# Append-only feedback log; aggregates per feature/item are kept up to date as entries arrive
+FEEDBACK = FeedbackLog(
+    os.path.join(DATA_DIR, "feedback.db"), max_delay=float(os.getenv("FEEDBACK_FLUSH_MS", "20")) / 1000
+)
+MAX_FEEDBACK_PAGE = 1000
 
 # -----------------------
 # Helper Functions
 # -----------------------
-def extract_text(file: UploadFile) -> str:
-    """Extract text from PDF, PPTX, or TXT"""
-    name = file.filename.lower()
-    file.file.seek(0)
-    if name.endswith(".pdf"):
-        try:
-            reader = PdfReader(file.file)
-            return "\n".join([page.extract_text() or "" for page in reader.pages]).strip()
-        except Exception as e:
-            raise HTTPException(status_code=400, detail=f"PDF parsing error: {e}")
-    elif name.endswith(".pptx") or name.endswith(".ppt"):
-        try:
-            prs = Presentation(file.file)
-            return "\n".join(
-                [shape.text for slide in prs.slides for shape in slide.shapes if hasattr(shape, "text")]
-            ).strip()
-        except Exception as e:
-            raise HTTPException(status_code=400, detail=f"PPTX parsing error: {e}")
+async def get_artifact(doc: Document, kind: str) -> dict:
+    """Load a precomputed document artifact, recomputing it if missing or from an older version"""
+    key = (doc.id, kind)
+    artifact = ARTIFACTS.get(key)
+    if artifact is None:
+        version, build, prepare = ARTIFACT_BUILDERS[kind]
+        artifact = await asyncio.to_thread(DOCUMENTS.load_artifact, doc.id, kind)
+        if artifact is None or artifact.get("version") != version:
+            artifact = await EXTRACTOR.run(build, doc.path, DOCUMENTS.artifact_path(doc.id, kind))
+        if prepare is not None:
+            artifact = await asyncio.to_thread(prepare, artifact)
+        cache_artifact(key, artifact)
+    ARTIFACTS.move_to_end(key)
+    return artifact
+
+
+async def build_artifact(doc: Document, kind: str):
+    """Write a current artifact file for doc in the pool, without loading it here (get_artifact does, on first use)"""
+    version, build, _ = ARTIFACT_BUILDERS[kind]
+    if (doc.id, kind) in ARTIFACTS or await asyncio.to_thread(DOCUMENTS.has_artifact, doc.id, kind, version):
+        return
+    await EXTRACTOR.run(run_discarding_result, build, doc.path, DOCUMENTS.artifact_path(doc.id, kind))
+
+
+async def text_quiz_index(text: str) -> dict:
+    """Prepared quiz index of request text, built in the extraction pool.
+
+    Cached under the text's document ID, so repeated requests (and an uploaded
+    document with the same text) share one index.
+    """
+    key = (document_id(text), "quiz")
+    index = ARTIFACTS.get(key)
+    if index is None:
+        index = await asyncio.to_thread(prepare_quiz_index, await EXTRACTOR.run(build_quiz_index, text))
+        cache_artifact(key, index)
+    ARTIFACTS.move_to_end(key)
+    return index
+
+
+def cache_artifact(key: tuple, artifact: dict):
+    ARTIFACTS[key] = artifact
+    while len(ARTIFACTS) > MAX_CACHED_ARTIFACTS:
+        ARTIFACTS.popitem(last=False)
+
+
+async def get_analysis(doc: Document) -> dict:
+    return await get_artifact(doc, "analysis")
+
+
+async def build_context(budget_tokens: int, question: str, docs: List[Document], analyses: List[dict]) -> str:
+    """Retrieve the chunks that best match the question and each document's main terms, within budget_tokens"""
+    if not docs:
+        return "No context found."
+    indexes = [await get_artifact(d, "chunks") for d in docs]
+    asked = {}
+    for term in terms(question):
+        asked[term] = asked.get(term, 0.0) + 1.0
+    queries = []
+    for a in analyses:
+        # A document's top terms act as a pseudo-query with total weight 1, so a real question dominates
+        top = a["terms"][:PSEUDO_QUERY_TERMS]
+        total = sum(count for _, count in top) or 1
+        query = {term: count / total for term, count in top}
+        for term, weight in asked.items():
+            query[term] = query.get(term, 0.0) + weight
+        queries.append(query)
+    # Chunks are charged their compacted size, so what compaction saves buys more context
+    context = await asyncio.to_thread(retrieve_context, docs, indexes, queries, budget_tokens, compacted_size)
+    return compact_input(context, "context", budget_tokens)
+
+
+def compacted_size(text: str) -> int:
+    return len(compact(text).encode("utf-8", errors="ignore"))
+
+
+def compact_input(text: str, kind: str, budget_tokens: Optional[int] = None) -> str:
+    """Strip whitespace runs, page furniture and repeated lines from prompt input, then enforce the budget"""
+    text, before, after = compact_to_budget(text, budget_tokens)
+    PROMPT_TOKENS.inc(kind, "raw", amount=before)
+    PROMPT_TOKENS.inc(kind, "sent", amount=after)
+    LOG.info("Prompt %s: ~%d -> ~%d tokens (%.0f%% saved)", kind, before, after,
+             100 * (1 - after / before) if before else 0.0)
+    return text
+
+
+# How many sentences each local summary style shows
+LOCAL_SENTENCES = {"simple": 5, "detailed": 10, "concept": 8, "qa": 5, "takeaways": 10}
+LOCAL_SENTENCES_DEFAULT = 6
+# The basic engine shows the lead sentences for these styles, top-scored ones for the rest
+LEAD_STYLES = {"simple", "concept", "qa", "takeaways"}
+
+# Local summary engines: "basic" (position + length) or "textrank" (TF-IDF graph ranking)
+LOCAL_ENGINES = {"basic", "textrank"}
+LOCAL_ENGINE = os.getenv("LOCAL_SUMMARY_ENGINE", "textrank")
+
+# Study plans: "auto" asks Gemini first (template fallback), "template" always uses the local planner
+PLANNER_ENGINES = {"auto", "template"}
+PLANNER_ENGINE = os.getenv("PLANNER_ENGINE", "auto")
+PLANS = PlanCache(int(os.getenv("PLAN_CACHE_SIZE", "256")))
+
+
+def fallback_sentences(style_key: str, docs: List[Document], analyses: List[dict],
+                       ranks: Optional[List[float]] = None) -> List[str]:
+    """Read only the sentences a local summary needs, using the precomputed spans and scores"""
+    counts = [len(a["sentences"]) for a in analyses]
+    offsets = [0]
+    for c in counts:
+        offsets.append(offsets[-1] + c)
+    total = offsets[-1]
+    n = LOCAL_SENTENCES.get(style_key, LOCAL_SENTENCES_DEFAULT)
+    if ranks is not None:
+        picked = top_sentence_indices(ranks, n)
+    elif style_key in LEAD_STYLES:
+        picked = range(min(n, total))
     else:
-        try:
-            content = file.file.read()
-            return content.decode("utf-8", errors="ignore").strip()
-        except Exception as e:
-            raise HTTPException(status_code=400, detail=f"Text read error: {e}")
-
-
-def split_sentences(text: str) -> List[str]:
-    """Split text into sentences for local summarization"""
-    sents, buf = [], ""
-    for ch in text:
-        buf += ch
-        if ch in ".!?":
-            if len(buf.strip()) > 20:
-                sents.append(buf.strip())
-            buf = ""
-    if buf.strip():
-        sents.append(buf.strip())
-    return sents[:1000]
-
-
-def simple_summary(text: str, n: int = 5) -> str:
-    """Simple extractive summarizer without ML dependencies"""
-    sents = split_sentences(text)
-    if len(sents) <= n:
-        return "\n".join(sents)
-    
-    # Simple scoring based on position and length
-    scores = []
-    for i, sent in enumerate(sents):
-        # Prefer sentences at beginning and end
-        position_score = 1.0 if i < 3 or i > len(sents) - 3 else 0.5
-        # Prefer longer sentences (more information)
-        length_score = min(len(sent) / 100, 1.0)
-        scores.append(position_score + length_score)
-    
-    # Get top N sentences by score
-    top_indices = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)[:n]
-    # Return in original order
-    return "\n".join([sents[i] for i in sorted(top_indices)])
-
-
-def call_gemini(prompt: str) -> str:
-    """Call Gemini API for text generation"""
+        # Position bonus is relative to the combined selection, so it is added here
+        scores = [s + position_score(i, total) for i, s in enumerate(x for a in analyses for x in a["scores"])]
+        picked = top_sentence_indices(scores, n)
+    by_doc = {}
+    for i in picked:
+        d = bisect_right(offsets, i) - 1
+        by_doc.setdefault(d, []).append(analyses[d]["sentences"][i - offsets[d]])
+    return [s for d in sorted(by_doc) for s in docs[d].read_ranges(by_doc[d])]
+
+
+async def local_summary(style_key: str, engine: str, docs: List[Document], analyses: List[dict]) -> str:
+    """Summarise the selected documents without Gemini"""
+    if engine == "textrank":
+        # One TF-IDF graph over all selected documents, ranked in the process pool
+        key = CACHE.make_key("local", f"{engine}:{style_key}", "|".join(d.id for d in docs), engine)
+
+        async def compute() -> str:
+            from summarizer import textrank_scores  # numpy/scipy, loaded on first use
+            ranks = await EXTRACTOR.run(textrank_scores, [(d.path, a["sentences"]) for d, a in zip(docs, analyses)])
+            sents = await asyncio.to_thread(fallback_sentences, style_key, docs, analyses, ranks)
+            return generate_local_fallback(style_key, sents)
+
+        return await CACHE.get_or_compute(key, compute)
+    sents = await asyncio.to_thread(fallback_sentences, style_key, docs, analyses)
+    return generate_local_fallback(style_key, sents)
+
+
+# Quota checks are SQLite write transactions that may wait on other workers, so they run off the event loop
+async def acquire_quota(prompt: str, endpoint: str):
+    """Reserve quota for one call on behalf of the current client; returns what settle_quota needs"""
+    ticket = (CLIENT_ID.get(), GEMINI_PRIORITIES.get(endpoint, "interactive"), estimate_tokens(len(prompt.encode())))
+    await asyncio.to_thread(QUOTA.acquire, *ticket)
+    return ticket
+
+
+async def settle_quota(ticket, usage: Optional[dict], text: str):
+    client, priority, est = ticket
+    usage = usage or {}
+    output = usage.get("candidatesTokenCount", estimate_tokens(len(text.encode()))) + usage.get("thoughtsTokenCount", 0)
+    await asyncio.to_thread(QUOTA.charge, client, priority, est, usage.get("promptTokenCount", est), output)
+
+
+async def call_gemini(prompt: str, request: Optional[Request] = None, endpoint: str = "default") -> str:
+    """Call Gemini API for text generation (cancelled if the client disconnects)"""
     if not GEMINI_TEXT_URL:
         raise RuntimeError("Gemini not configured")
-    headers = {"Content-Type": "application/json"}
-    body = {"contents": [{"parts": [{"text": prompt}]}]}
-    r = requests.post(GEMINI_TEXT_URL, headers=headers, data=json.dumps(body), timeout=40)
-    r.raise_for_status()
-    data = r.json()
+    ticket = await acquire_quota(prompt, endpoint)
+    call = RESILIENCE.call(endpoint, lambda timeout: GEMINI.generate(prompt, deadline=timeout))
+    start = time.perf_counter()
     try:
-        return data["candidates"][0]["content"]["parts"][0]["text"]
+        with span("llm"):
+            data = await cancel_on_disconnect(request, call)
+    except CircuitOpen:
+        # Nothing was sent upstream, so an outage doesn't use up the client's quota
+        await asyncio.to_thread(QUOTA.refund, *ticket)
+        raise
+    except BaseException:
+        GEMINI_SECONDS.observe(time.perf_counter() - start, endpoint, "error")
+        raise
+    GEMINI_SECONDS.observe(time.perf_counter() - start, endpoint, "ok")
+    try:
+        text = data["candidates"][0]["content"]["parts"][0]["text"]
     except Exception:
-        return json.dumps(data)
+        text = json.dumps(data)
+    await settle_quota(ticket, data.get("usageMetadata"), text)
+    return text
+
+
+async def call_gemini_cached(endpoint: str, variant, context: str, prompt: str, request: Optional[Request] = None,
+                             hedge_slo: Optional[float] = None) -> str:
+    """call_gemini behind the response cache; identical in-flight requests share one upstream call.
+
+    With hedge_slo, gives up waiting (SLOExceeded) after that many seconds so the caller can answer
+    locally; the call then runs on, even past a disconnect, so the next request finds the answer cached.
+    """
+    key = CACHE.make_key(endpoint, variant, context, GEMINI_MODEL)
+    fill = CACHE.get_or_compute(key, lambda: call_gemini(prompt, endpoint=endpoint))
+    if hedge_slo:
+        return await hedge(fill, hedge_slo)
+    return await cancel_on_disconnect(request, fill)
+
+
+async def gemini_stream(prompt: str) -> AsyncIterator[str]:
+    """GEMINI.stream behind the quota and the circuit breaker"""
+    if not RESILIENCE.allow():
+        raise CircuitOpen("Gemini circuit open")
+    try:
+        ticket = await acquire_quota(prompt, "stream")
+    except BaseException:
+        RESILIENCE.breaker.release()
+        raise
+    received, usage, parts = False, {}, []
+    start = time.perf_counter()
+    try:
+        async for piece in GEMINI.stream(prompt, usage=usage):
+            received = True
+            parts.append(piece)
+            yield piece
+    except Exception as e:
+        RESILIENCE.record(not (is_retryable(e) or isinstance(e, asyncio.TimeoutError)))
+        GEMINI_SECONDS.observe(time.perf_counter() - start, "stream", "error")
+        raise
+    except BaseException:
+        # Consumer went away mid-stream: only the bytes we saw say anything about Gemini's health
+        if received:
+            RESILIENCE.record(True)
+        else:
+            RESILIENCE.breaker.release()
+        raise
+    RESILIENCE.record(True)
+    GEMINI_SECONDS.observe(time.perf_counter() - start, "stream", "ok")
+    await settle_quota(ticket, usage, "".join(parts))
+
+
+async def summarize_section(text: str) -> str:
+    """Map step: study notes for one section, cached independently of the requested style"""
+    text = compact(text)
+    return await call_gemini_cached("section", SECTION_PROMPT_VERSION, text, section_prompt(text))
+
+
+async def condense_documents(docs: List[Document], analyses: List[dict]) -> str:
+    """Map-reduce the selected documents into notes that fit one prompt"""
+    size = section_size(sum(d.size for d in docs))
+    sections = []
+    for d, a in zip(docs, analyses):
+        sections.extend(await asyncio.to_thread(d.read_ranges, group_spans(a["sentences"], size)))
+    return await condense(sections, summarize_section, MAPREDUCE_FAN_OUT)
+
+
+async def condense_text(text: str) -> str:
+    """Map-reduce raw text (quiz/flashcard input) into notes that fit one prompt"""
+    windows = group_spans(list(iter_sentence_spans(text)), section_size(len(text)))
+    return await condense([text[s:e] for s, e in windows], summarize_section, MAPREDUCE_FAN_OUT)
+
+
+async def bounded_content(text: str, request: Optional[Request] = None) -> str:
+    """text (compacted) if it fits QUIZ_CONTEXT_TOKENS, otherwise its map-reduced notes"""
+    text = await asyncio.to_thread(compact_input, text, "text")
+    if estimate_tokens(len(text.encode("utf-8", errors="ignore"))) <= QUIZ_CONTEXT_TOKENS:
+        return text
+    return await cancel_on_disconnect(request, condense_text(text))
+
+
+def sse_event(event: str, data: dict) -> str:
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def stream_answer(cache_key: str, prompt: Optional[str], local_chunks, sources: List[str],
+                        labels=("query", "-")) -> AsyncIterator[str]:
+    """Relay a Gemini (or local) answer as SSE: meta, delta..., done.
+
+    prompt=None skips Gemini; local_chunks may return an iterator of chunks or an awaitable answer.
+    labels (endpoint, style) tag the answer in ANSWERS.
+    """
+    yield sse_event("meta", {"sources": sources})
+    if GEMINI_STREAM_URL and prompt is not None:
+        cached = CACHE.get(cache_key)
+        if cached is not None:
+            yield sse_event("delta", {"text": cached})
+            ANSWERS.inc(*labels, "cache")
+            yield sse_event("done", {"source": "cache"})
+            return
+        parts = []
+        try:
+            async for piece in gemini_stream(prompt):
+                parts.append(piece)
+                yield sse_event("delta", {"text": piece})
+            CACHE.set(cache_key, "".join(parts))
+            ANSWERS.inc(*labels, "gemini")
+            yield sse_event("done", {"source": "gemini"})
+            return
+        except Exception as e:
+            LOG.warning("Gemini streaming failed: %s", e)
+            if parts:
+                # Half an answer is already on screen; don't append a different one
+                yield sse_event("error", {"detail": str(e)})
+                return
+    if local_chunks is None:
+        yield sse_event("delta", {"text": "No documents selected for summarization."})
+    else:
+        chunks = local_chunks()
+        if inspect.isawaitable(chunks):
+            chunks = [await chunks]
+        for chunk in chunks:
+            yield sse_event("delta", {"text": chunk})
+    ANSWERS.inc(*labels, "local")
+    yield sse_event("done", {"source": "local"})
+
+
+def sse_response(events: AsyncIterator[str]) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def stream_items(cache_key: Optional[str], prompt: Optional[str], model, local_items,
+                       labels=("items", "-")) -> AsyncIterator[str]:
+    """Relay quiz/flashcard items as SSE (item..., done), parsing Gemini's JSON while it streams.
+
+    cache_key/prompt None go straight to local_items, which returns the items or an awaitable of them.
+    """
+    cached = CACHE.get(cache_key) if cache_key else None
+    if cached is not None:
+        items = parse_items(cached, model)
+        if items:
+            for item in items:
+                yield sse_event("item", item)
+            ANSWERS.inc(*labels, "cache")
+            yield sse_event("done", {"source": "cache"})
+            return
+    if GEMINI_STREAM_URL and prompt is not None:
+        parser, parts, count = JSONArrayStream(), [], 0
+        try:
+            async for piece in gemini_stream(prompt):
+                parts.append(piece)
+                for item in validate_items(parser.feed(piece), model):
+                    count += 1
+                    yield sse_event("item", item)
+            if count:
+                CACHE.set(cache_key, "".join(parts))
+                ANSWERS.inc(*labels, "gemini")
+                yield sse_event("done", {"source": "gemini"})
+                return
+            LOG.warning("Gemini stream returned no valid items, using local fallback")
+        except Exception as e:
+            LOG.warning("Gemini item streaming failed: %s", e)
+            if count:
+                yield sse_event("error", {"detail": str(e)})
+                return
+    items = local_items()
+    if inspect.isawaitable(items):
+        items = await items
+    for item in items:
+        yield sse_event("item", item)
+    ANSWERS.inc(*labels, "local")
+    yield sse_event("done", {"source": "local"})
 
 
 def get_style_specific_prompt(style_key: str, context: str) -> str:
@@ -234,111 +757,91 @@ Format your response as:
 {context}"""
 
 
-def generate_local_fallback(style_key: str, text: str) -> str:
-    """Generate style-specific local fallback summaries"""
-    sents = split_sentences(text)
-    
+def iter_local_fallback(style_key: str, sents: List[str]) -> Iterator[str]:
+    """Yield a style-specific local fallback summary chunk by chunk (sents from fallback_sentences)"""
     if style_key == "simple":
-        summary_sents = sents[:5] if len(sents) >= 5 else sents
-        return "**Simple Summary:**\n\n" + "\n".join([f"• {s}" for s in summary_sents])
+        yield "**Simple Summary:**\n\n"
+        for i, s in enumerate(sents):
+            yield ("\n" if i else "") + f"• {s}"
     
     elif style_key == "detailed":
-        summary = simple_summary(text, 10)
-        return f"**Detailed Summary:**\n\n{summary}\n\n*Note: This is a local fallback. For better results, configure Gemini API.*"
+        yield "**Detailed Summary:**\n\n"
+        yield "\n".join(sents)
+        yield "\n\n*Note: This is a local fallback. For better results, configure Gemini API.*"
     
     elif style_key == "concept":
-        key_sents = sents[:8] if len(sents) >= 8 else sents
-        concept_map = "**Concept Map:**\n\n# Main Topic\n"
-        for i, s in enumerate(key_sents):
+        yield "**Concept Map:**\n\n# Main Topic\n"
+        for i, s in enumerate(sents):
             if i % 2 == 0:
-                concept_map += f"  - {s[:80]}...\n"
+                yield f"  - {s[:80]}...\n"
             else:
-                concept_map += f"    → {s[:60]}...\n"
-        return concept_map
+                yield f"    → {s[:60]}...\n"
     
     elif style_key == "qa":
-        qa_list = "**Q&A Summary:**\n\n"
-        for i, s in enumerate(sents[:5]):
-            qa_list += f"**Q{i+1}: What about {s[:40]}...?**\n"
-            qa_list += f"A: {s}\n\n"
-        return qa_list
+        yield "**Q&A Summary:**\n\n"
+        for i, s in enumerate(sents):
+            yield f"**Q{i+1}: What about {s[:40]}...?**\n"
+            yield f"A: {s}\n\n"
     
     elif style_key == "takeaways":
-        key_sents = sents[:10] if len(sents) >= 10 else sents
-        return "**Key Takeaways:**\n\n" + "\n".join([f"{i+1}. {s}" for i, s in enumerate(key_sents)])
+        yield "**Key Takeaways:**\n\n"
+        for i, s in enumerate(sents):
+            yield ("\n" if i else "") + f"{i+1}. {s}"
     
     else:
-        return simple_summary(text, 6)
+        yield "\n".join(sents)
 
 
-def generate_concise_study_plan(topic: str, days: int) -> str:
-    """Generate a clean, concise study plan"""
-    
-    plan = f"📚 {days}-Day Study Plan: {topic}\n"
-    plan += f"{'─' * 50}\n\n"
-    
-    # Divide days into phases
-    fundamentals = max(1, int(days * 0.3))
-    intermediate = max(1, int(days * 0.4))
-    advanced = days - fundamentals - intermediate
-    
-    current_day = 1
-    
-    # Phase 1: Fundamentals
-    plan += "PHASE 1: FUNDAMENTALS\n\n"
-    for i in range(fundamentals):
-        plan += f"📅 Day {current_day}: Core Concepts\n"
-        plan += f"• Learn basic terminology and definitions\n"
-        plan += f"• Understand foundational principles\n"
-        plan += f"• Study real-world applications\n"
-        plan += f"• Practice: Complete 3-5 beginner exercises\n"
-        plan += f"⏱ Time: 2-3 hours\n\n"
-        current_day += 1
-    
-    # Phase 2: Intermediate
-    plan += "PHASE 2: BUILDING SKILLS\n\n"
-    for i in range(intermediate):
-        plan += f"📅 Day {current_day}: Intermediate Topics\n"
-        plan += f"• Apply concepts to practical problems\n"
-        plan += f"• Work through guided examples\n"
-        plan += f"• Understand common patterns\n"
-        plan += f"• Practice: Build a small project\n"
-        plan += f"⏱ Time: 2-3 hours\n\n"
-        current_day += 1
-        
-        # Add quiz checkpoint every 3 days
-        if current_day % 3 == 0 and current_day <= days:
-            plan += f"🧪 Checkpoint Quiz: Test Days {current_day-2}-{current_day-1}\n\n"
-    
-    # Phase 3: Advanced
-    if advanced > 0:
-        plan += "PHASE 3: ADVANCED PRACTICE\n\n"
-        for i in range(advanced):
-            plan += f"📅 Day {current_day}: Advanced Techniques\n"
-            plan += f"• Master complex concepts\n"
-            plan += f"• Integrate multiple topics\n"
-            plan += f"• Work on real-world scenarios\n"
-            plan += f"• Practice: Complete a comprehensive project\n"
-            plan += f"⏱ Time: 3-4 hours\n\n"
-            current_day += 1
-    
-    # Study tips
-    plan += f"{'─' * 50}\n"
-    plan += "💡 QUICK STUDY TIPS\n\n"
-    plan += "1. 🍅 Use Pomodoro: 25 min focus, 5 min break\n"
-    plan += "2. 📝 Take notes in your own words\n"
-    plan += "3. 🔄 Review previous day before starting\n"
-    plan += "4. 💻 Practice > Theory - build projects\n"
-    plan += "5. 👥 Join study groups or forums\n"
-    plan += "6. 😴 Get good sleep for retention\n"
-    plan += "7. 🎯 Set daily goals and track progress\n\n"
-    
-    plan += f"{'─' * 50}\n"
-    plan += f"🎯 Goal: Build strong foundation in {topic}\n"
-    plan += f"📊 Track your progress daily!\n"
-    plan += f"🚀 You've got this!\n"
-    
-    return plan
+def generate_local_fallback(style_key: str, sents: List[str]) -> str:
+    """Generate style-specific local fallback summaries"""
+    return "".join(iter_local_fallback(style_key, sents))
+
+
+def quiz_prompt(num_questions: int, content: str) -> str:
+    return f"""
+Generate {num_questions} multiple choice questions (4 options each) based on the following content.
+Return JSON strictly in this format:
+[{{"question":"...", "options":["A","B","C","D"], "answer":"A"}}]
+
+Content:
+{content}
+"""
+
+
+def flashcards_prompt(num_cards: int, content: str) -> str:
+    return f"""
+Generate {num_cards} flashcards from this content.
+Return JSON: [{{"front":"Question/Term", "back":"Answer/Definition"}}]
+
+Content:
+{content}
+"""
+
+
+def local_quiz(sents: Iterable[str]) -> List[dict]:
+    """One placeholder MCQ per sentence (local fallback)"""
+    return [
+        {"question": s, "options": [s[:60], "Option B", "Option C", "Option D"], "answer": "A"}
+        for s in sents
+    ]
+
+
+def local_flashcards(sents: Iterable[str]) -> List[dict]:
+    """One flashcard per sentence (local fallback)"""
+    return [{"front": f"What about: {s[:50]}...?", "back": s} for s in sents]
+
+
+async def local_cloze(kind: str, text: str, n: int) -> List[dict]:
+    """Cloze questions/flashcards from a keyphrase index of the text (local fallback).
+
+    Text too short to index falls back to one placeholder item per sentence.
+    """
+    index = await text_quiz_index(text)
+    items = await asyncio.to_thread(generate, index, text_reader(text), kind, n, seed_for(text))
+    if items:
+        return items
+    sents = islice(iter_sentences(text), n)
+    return local_quiz(sents) if kind == "quiz" else local_flashcards(sents)
 
 
 # -----------------------
@@ -349,11 +852,26 @@ class QueryRequest(BaseModel):
     docs: Optional[List[str]] = []
     mode: Optional[str] = "summarize"
     style: Optional[str] = None
+    stream: Optional[bool] = False
+    engine: Optional[str] = "auto"  # auto (Gemini, local fallback), basic or textrank (local only)
+    hierarchical: Optional[bool] = False  # map-reduce the whole selection instead of retrieving chunks
 
 
 class QuizRequest(BaseModel):
     text: str
-    num_questions: Optional[int] = 5
+    num_questions: Optional[int] = 5  # null: the endpoint's default
+    stream: Optional[bool] = False  # SSE: one "item" event per question/card as soon as it is parsed
+
+
+class BatchItem(BaseModel):
+    doc: str  # document ID or file name
+    num_questions: Optional[int] = None
+
+
+class BatchRequest(BaseModel):
+    kind: Optional[str] = "quiz"  # quiz or flashcards
+    items: List[BatchItem]
+    num_questions: Optional[int] = 5  # default for items without their own count
 
 
 class FeedbackRequest(BaseModel):
@@ -367,36 +885,161 @@ class FeedbackRequest(BaseModel):
 # -----------------------
 # Routes
 # -----------------------
+@app.exception_handler(ClientDisconnected)
+async def client_disconnected_handler(request: Request, exc: ClientDisconnected):
+    # Nobody is listening any more; 499 mirrors nginx's "client closed request"
+    return JSONResponse(status_code=499, content={"detail": str(exc)})
+
+
 @app.get("/")
 def root():
     return {"status": "AI Study Buddy Backend Running ✔️", "version": "optimized"}
 
 
+@app.get("/api/gemini/health")
+def gemini_health():
+    """Circuit breaker state, retry counters and the current per-endpoint deadlines"""
+    return {"configured": bool(GEMINI_TEXT_URL), "in_flight": GEMINI.in_flight, **RESILIENCE.stats()}
+
+
+@app.get("/api/admin/usage")
+def admin_usage(request: Request, client: Optional[str] = None):
+    """Gemini requests and tokens per client and priority class, and what is left in each bucket"""
+    token = request.headers.get("x-admin-token", "")
+    if not ADMIN_TOKEN or not secrets.compare_digest(token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Admin token required")
+    return QUOTA.usage(client)
+
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus text exposition of the metrics registered above"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/api/cache/stats")
+def cache_stats():
+    """Return response cache size, hit rate and eviction counters"""
+    return CACHE.stats()
+
+
+async def spool_upload(file: UploadFile) -> str:
+    """Copy the upload to a temp file in chunks, enforcing MAX_UPLOAD_BYTES"""
+    suffix = os.path.splitext(file.filename or "")[1]
+    fd, path = tempfile.mkstemp(dir=UPLOAD_DIR, suffix=suffix)
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > MAX_UPLOAD_BYTES:
+                    raise HTTPException(status_code=413, detail=f"File exceeds {MAX_UPLOAD_BYTES // (1024 * 1024)} MB limit.")
+                out.write(chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+
+async def ingest_upload(path: str, filename: str) -> dict:
+    """Stream a spooled upload's text into the store via the process pool; removes the temp files"""
+    staged = DOCUMENTS.staging_path()
+    file_type = os.path.splitext(filename)[1].lower().lstrip(".")
+    try:
+        try:
+            with span("extract"), EXTRACTION_SECONDS.time(file_type if file_type in EXTRACT_TYPES else "other"):
+                size, digest, pages = await EXTRACTOR.extract_to(path, filename, staged)
+        except ExtractionError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if size == 0:
+            raise HTTPException(status_code=400, detail="Empty or unreadable file.")
+        doc = await asyncio.to_thread(DOCUMENTS.add_file, filename, staged, digest, size, pages)
+        # Sentence spans, scores, term stats and the chunk index are computed once here, not per query;
+        # builders stream the text and only write their files, so upload memory stays bounded
+        with span("artifacts"):
+            await asyncio.gather(*(build_artifact(doc, kind) for kind in UPLOAD_ARTIFACTS))
+        return {"id": doc.id, "name": filename}
+    finally:
+        os.remove(path)
+        if os.path.exists(staged):
+            os.remove(staged)
+
+
+@JOBS.handler("upload")
+async def upload_job(payload: dict) -> dict:
+    """Ingest an upload spooled by /api/upload?background=true (any worker process may run it)"""
+    try:
+        return await ingest_upload(payload["path"], payload["name"])
+    except HTTPException as e:
+        raise JobFailed(e.detail)
+    except Exception as e:
+        LOG.exception("Upload of %s failed", payload["name"])
+        raise JobFailed(f"Upload failed: {e}")
+
+
 @app.post("/api/upload")
-async def upload(file: UploadFile = File(...)):
-    """Upload and extract document text"""
+async def upload(file: UploadFile = File(...), background: bool = False):
+    """Upload and extract document text (background=true returns a job ID immediately)"""
     if not file:
         raise HTTPException(status_code=400, detail="No file provided")
     try:
-        text = extract_text(file)
-        if not text.strip():
-            raise HTTPException(status_code=400, detail="Empty or unreadable file.")
-        doc_id = f"doc_{len(DOCUMENTS)+1}"
-        DOCUMENTS[doc_id] = {"name": file.filename, "text": text}
-        return {"id": doc_id, "name": file.filename}
+        with span("upload"):
+            path = await spool_upload(file)
+        if background:
+            job_id = await JOBS.submit("upload", {"path": path, "name": file.filename})
+            return JSONResponse(status_code=202, content={"job_id": job_id, "status": "queued"})
+        return await ingest_upload(path, file.filename)
+    except HTTPException:
+        raise
     except Exception as e:
-        print("Upload error:", e)
+        LOG.exception("Upload failed")
         raise HTTPException(status_code=500, detail=f"Upload failed: {e}")
 
 
+@app.get("/api/upload/jobs/{job_id}")
+def upload_job_status(job_id: str):
+    """Return the status of a background upload"""
+    job = JOBS.get(job_id)
+    if job is None or job["kind"] != "upload":
+        raise HTTPException(status_code=404, detail="Unknown upload job")
+    return {"id": job["id"], "name": job["payload"]["name"], **{k: job[k] for k in ("status", "result", "error")}}
+
+
+@app.get("/api/jobs/{job_id}")
+def job_status(job_id: str):
+    """Status, result and timings of any background job"""
+    job = JOBS.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return {k: v for k, v in job.items() if k != "payload"}
+
+
 @app.get("/api/docs")
 def docs_list():
     """Return uploaded documents"""
-    return [{"id": k, "name": v["name"]} for k, v in DOCUMENTS.items()]
+    return DOCUMENTS.list()
+
+
+@app.get("/api/docs/{doc_id}/pages/{page}")
+def doc_page(doc_id: str, page: int):
+    """Text of one page (slide) of a document, numbered from 1"""
+    doc = DOCUMENTS.get(doc_id) or DOCUMENTS.get_by_name(doc_id)
+    if doc is None:
+        raise HTTPException(status_code=404, detail="Unknown document")
+    try:
+        text = doc.read_page(page - 1) if page >= 1 else None
+    except IndexError:
+        text = None
+    if text is None:
+        raise HTTPException(status_code=404, detail=f"Page {page} not found")
+    return {"id": doc.id, "name": doc.name, "page": page, "pages": doc.page_count(), "text": text}
 
 
 @app.post("/api/query")
-def query_handler(q: QueryRequest):
+async def query_handler(q: QueryRequest, request: Request):
     """Handle both summarization and study planning"""
     try:
         # Check if this is a study planner request (no documents, mode is "chat" or "planner")
@@ -407,22 +1050,18 @@ def query_handler(q: QueryRequest):
         
         if is_planner_request:
             # ===== STUDY PLANNER MODE =====
-            print(f"=== Study Planner Request ===")
-            print(f"Prompt: {q.prompt}")
-            
-            # Extract goal and duration from prompt
-            duration_match = re.search(r'(\d+)-day', q.prompt)
-            duration = int(duration_match.group(1)) if duration_match else 7
+            LOG.debug("Study planner request: %s", q.prompt)
             
-            goal_match = re.search(r'for learning: (.+?)(?:\n|$)', q.prompt, re.IGNORECASE)
-            if not goal_match:
-                goal_match = re.search(r'for: (.+?)(?:\n|$)', q.prompt, re.IGNORECASE)
-            goal = goal_match.group(1).strip() if goal_match else "Your Topic"
-            
-            if GEMINI_TEXT_URL:
-                try:
-                    # Concise prompt for Gemini - forces shorter output
-                    concise_prompt = f"""Create a concise {duration}-day study plan for: {goal}
+            goal, duration = parse_request(q.prompt)
+            engine = (q.engine or "auto").lower()
+            if engine == "auto":
+                engine = PLANNER_ENGINE
+            if engine not in PLANNER_ENGINES:
+                raise HTTPException(status_code=400, detail=f"Unknown planner engine: {q.engine}")
+            use_gemini = engine == "auto" and GEMINI_TEXT_URL
+
+            # Concise prompt for Gemini - forces shorter output
+            concise_prompt = f"""Create a concise {duration}-day study plan for: {goal}
 
 Requirements:
 - Be brief and actionable
@@ -446,141 +1085,347 @@ Day 2: [Topic Name]
 
 End with 3 quick study tips."""
 
-                    print("Attempting Gemini study plan generation...")
-                    answer = call_gemini(concise_prompt)
-                    return {"answer": answer.strip(), "sources": []}
+            if q.stream:
+                cache_key = CACHE.make_key("planner", duration, goal.lower(), GEMINI_MODEL)
+                return sse_response(stream_answer(
+                    cache_key, concise_prompt if use_gemini else None, lambda: [PLANS.get(goal, duration)[1]], [],
+                    ("planner", "plan"),
+                ))
+
+            if use_gemini:
+                try:
+                    answer = await call_gemini_cached(
+                        "planner", duration, goal.lower(), concise_prompt, request, GEMINI_HEDGE_SLO
+                    )
+                    ANSWERS.inc("planner", "plan", "gemini")
+                    answer = answer.strip()
+                    return {"answer": answer, "sources": [], "plan": parse_plan_text(answer, goal, duration)}
+                except ClientDisconnected:
+                    raise
                 except Exception as e:
-                    print(f"Gemini failed for study planner: {e}")
+                    LOG.warning("Gemini failed for study planner: %s", e)
                     # Fall through to local generation
             
             # Local fallback for study planner
-            print("Using local study plan generation")
-            plan = generate_concise_study_plan(goal, duration)
-            return {"answer": plan, "sources": []}
+            with span("local"):
+                plan, text = PLANS.get(goal, duration)
+            ANSWERS.inc("planner", "plan", "local")
+            return {"answer": text, "sources": [], "plan": plan}
         
         else:
             # ===== REGULAR SUMMARIZATION MODE =====
-            selected_docs = [d for d in DOCUMENTS.values() if d["name"] in (q.docs or [])]
-            context = "\n\n".join([d["text"][:4000] for d in selected_docs]) or "No context found."
-
             style_key = (q.style or "simple").lower()
-            
-            print(f"=== Summarization Request ===")
-            print(f"Style: {style_key}")
-            print(f"Documents: {[d['name'] for d in selected_docs]}")
+            engine = (q.engine or "auto").lower()
+            if engine != "auto" and engine not in LOCAL_ENGINES:
+                raise HTTPException(status_code=400, detail=f"Unknown engine: {q.engine}")
+            use_gemini = engine == "auto"
+            local_engine = LOCAL_ENGINE if use_gemini else engine
+            selected_docs = DOCUMENTS.find(q.docs or [])
+            analyses = [await get_analysis(d) for d in selected_docs]
+            context = None
+            if q.hierarchical and use_gemini and GEMINI_TEXT_URL and selected_docs:
+                try:
+                    with span("mapreduce"):
+                        context = await cancel_on_disconnect(request, condense_documents(selected_docs, analyses))
+                except ClientDisconnected:
+                    raise
+                except Exception as e:
+                    LOG.warning("Map-reduce failed, using retrieved context: %s", e)
+            if context is None:
+                # Summary prompts are templated; only free-form prompts (chat) steer retrieval
+                question = q.prompt if q.mode != "summarize" else ""
+                budget = CONTEXT_TOKEN_BUDGETS.get(style_key, CONTEXT_TOKEN_BUDGET_DEFAULT)
+                with span("prompt"):
+                    context = await build_context(budget, question, selected_docs, analyses)
+            sources = [d.name for d in selected_docs]
+            LOG.debug("Summarization request: style=%s engine=%s documents=%s", style_key, engine, sources)
+
+            prompt = get_style_specific_prompt(style_key, context)
+            if q.stream:
+                cache_key = CACHE.make_key("query", style_key, context, GEMINI_MODEL)
+                local_chunks = None
+                if selected_docs and local_engine == "basic":
+                    local_chunks = lambda: iter_local_fallback(
+                        style_key, fallback_sentences(style_key, selected_docs, analyses)
+                    )
+                elif selected_docs:
+                    local_chunks = lambda: local_summary(style_key, local_engine, selected_docs, analyses)
+                return sse_response(stream_answer(
+                    cache_key, prompt if use_gemini else None, local_chunks, sources, ("query", style_key)
+                ))
 
             # --- Gemini Preferred ---
-            if GEMINI_TEXT_URL:
+            if GEMINI_TEXT_URL and use_gemini:
                 try:
-                    prompt = get_style_specific_prompt(style_key, context)
-                    print(f"Using Gemini with style-specific prompt for: {style_key}")
-                    answer = call_gemini(prompt)
-                    return {"answer": answer.strip(), "sources": [d["name"] for d in selected_docs]}
+                    answer = await call_gemini_cached("query", style_key, context, prompt, request, GEMINI_HEDGE_SLO)
+                    ANSWERS.inc("query", style_key, "gemini")
+                    return {"answer": answer.strip(), "sources": sources}
+                except ClientDisconnected:
+                    raise
                 except Exception as e:
-                    print(f"Gemini summarization failed, fallback to local: {e}")
+                    LOG.warning("Gemini summarization failed, fallback to local: %s", e)
 
-            # --- Local Fallback ---
+            # --- Local Summary ---
             if selected_docs:
-                combined = "\n\n".join([d["text"] for d in selected_docs])
-                print(f"Using local fallback for style: {style_key}")
-                answer = generate_local_fallback(style_key, combined)
-                return {"answer": answer, "sources": [d["name"] for d in selected_docs]}
+                with span("local"):
+                    answer = await local_summary(style_key, local_engine, selected_docs, analyses)
+                ANSWERS.inc("query", style_key, "local")
+                return {"answer": answer, "sources": sources}
             else:
                 return {"answer": "No documents selected for summarization.", "sources": []}
 
+    except (ClientDisconnected, HTTPException):
+        raise
     except Exception as e:
-        print("Query error:", e)
+        LOG.exception("Query failed")
         raise HTTPException(status_code=500, detail=f"Request failed: {e}")
 
 
+def item_count(num_questions: Optional[int], default: int) -> int:
+    """Requested number of questions/cards, or default when it is null; 400 unless 1..MAX_ITEMS_PER_DOC"""
+    if num_questions is None:
+        return default
+    if not 1 <= num_questions <= MAX_ITEMS_PER_DOC:
+        raise HTTPException(status_code=400, detail=f"num_questions must be between 1 and {MAX_ITEMS_PER_DOC}.")
+    return num_questions
+
+
 @app.post("/api/quiz")
-def quiz(req: QuizRequest):
+async def quiz(req: QuizRequest, request: Request):
     """Generate MCQs from text"""
+    if not req.text.strip():
+        raise HTTPException(status_code=400, detail="Empty text provided for quiz generation.")
+    count = item_count(req.num_questions, 5)
     try:
-        if not req.text.strip():
-            raise HTTPException(status_code=400, detail="Empty text provided for quiz generation.")
-
         # Prefer Gemini if available
         if GEMINI_TEXT_URL:
-            prompt = f"""
-Generate {req.num_questions} multiple choice questions (4 options each) based on the following content.
-Return JSON strictly in this format:
-[{{"question":"...", "options":["A","B","C","D"], "answer":"A"}}]
-
-Content:
-{req.text}
-"""
             try:
-                result = call_gemini(prompt)
-                try:
-                    parsed = json.loads(result)
-                except Exception:
-                    m = re.search(r"(\[.*\])", result, re.S)
-                    parsed = json.loads(m.group(1)) if m else []
-                return {"quiz": parsed}
+                with span("prompt"):
+                    content = await bounded_content(req.text, request)
+                    prompt = quiz_prompt(count, content)
+                if req.stream:
+                    key = CACHE.make_key("quiz", count, content, GEMINI_MODEL)
+                    local_items = lambda: local_cloze("quiz", req.text, count)
+                    return sse_response(stream_items(key, prompt, QuizItem, local_items, ("quiz", "-")))
+                result = await call_gemini_cached(
+                    "quiz", count, content, prompt, request, GEMINI_HEDGE_SLO
+                )
+                # Tolerant parse: fences, prose, trailing commas and a truncated tail don't waste the call
+                with span("postprocess"):
+                    parsed = parse_items(result, QuizItem)
+                if parsed:
+                    ANSWERS.inc("quiz", "-", "gemini")
+                    return {"quiz": parsed}
+                LOG.warning("Gemini quiz output had no valid questions, using local fallback")
+            except ClientDisconnected:
+                raise
             except Exception as e:
-                print("Gemini quiz generation failed:", e)
+                LOG.warning("Gemini quiz generation failed: %s", e)
 
         # Local fallback quiz
-        sents = split_sentences(req.text)
-        quiz = []
-        for i, s in enumerate(sents[:req.num_questions]):
-            quiz.append({
-                "question": s,
-                "options": [s[:60], "Option B", "Option C", "Option D"],
-                "answer": "A"
-            })
+        with span("local"):
+            quiz = await local_cloze("quiz", req.text, count)
+        if req.stream:
+            return sse_response(stream_items(None, None, QuizItem, lambda: quiz, ("quiz", "-")))
+        ANSWERS.inc("quiz", "-", "local")
         return {"quiz": quiz}
+    except ClientDisconnected:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Quiz generation failed: {e}")
 
 
 @app.post("/api/feedback")
-def feedback(req: FeedbackRequest):
-    """Store user feedback"""
+async def feedback(req: FeedbackRequest):
+    """Store user feedback (acknowledged once it is on disk)"""
     try:
-        FEEDBACKS.append(req.dict())
-        return {"message": "Feedback saved successfully", "count": len(FEEDBACKS)}
+        entry_id = await FEEDBACK.append(req.model_dump())
+        return {"message": "Feedback saved successfully", "id": entry_id, "count": FEEDBACK.count()}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Feedback save failed: {e}")
 
 
 @app.get("/api/feedback")
-def feedback_list():
-    """Return all feedback"""
-    return {"feedbacks": FEEDBACKS}
+def feedback_list(cursor: int = 0, limit: int = 100):
+    """Return feedback in the order it arrived, one page at a time (pass next_cursor back for more)"""
+    if not 1 <= limit <= MAX_FEEDBACK_PAGE:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_FEEDBACK_PAGE}")
+    items, next_cursor = FEEDBACK.page(cursor, limit)
+    return {"feedbacks": items, "next_cursor": next_cursor}
+
+
+@app.get("/api/feedback/summary")
+def feedback_summary(feature: Optional[str] = None):
+    """Count, mean rating and thumbs-up ratio per feature and item"""
+    return {"features": FEEDBACK.summary(feature)}
 
 
 @app.post("/api/flashcards")
-def flashcards(req: QuizRequest):
+async def flashcards(req: QuizRequest, request: Request):
     """Generate flashcards from text"""
+    if not req.text.strip():
+        raise HTTPException(status_code=400, detail="Empty text")
+    count = item_count(req.num_questions, 10)
     try:
-        if not req.text.strip():
-            raise HTTPException(status_code=400, detail="Empty text")
-
         if GEMINI_TEXT_URL:
-            prompt = f"""
-Generate {req.num_questions or 10} flashcards from this content.
-Return JSON: [{{"front":"Question/Term", "back":"Answer/Definition"}}]
-
-Content:
-{req.text}
-"""
             try:
-                result = call_gemini(prompt)
-                parsed = json.loads(result)
-                return {"flashcards": parsed}
+                with span("prompt"):
+                    content = await bounded_content(req.text, request)
+                    prompt = flashcards_prompt(count, content)
+                if req.stream:
+                    key = CACHE.make_key("flashcards", count, content, GEMINI_MODEL)
+                    local_items = lambda: local_cloze("flashcards", req.text, count)
+                    return sse_response(stream_items(key, prompt, Flashcard, local_items, ("flashcards", "-")))
+                result = await call_gemini_cached(
+                    "flashcards", count, content, prompt, request, GEMINI_HEDGE_SLO
+                )
+                with span("postprocess"):
+                    parsed = parse_items(result, Flashcard)
+                if parsed:
+                    ANSWERS.inc("flashcards", "-", "gemini")
+                    return {"flashcards": parsed}
+                LOG.warning("Gemini flashcard output had no valid cards, using local fallback")
+            except ClientDisconnected:
+                raise
             except Exception as e:
-                print("Gemini flashcard generation failed:", e)
+                LOG.warning("Gemini flashcard generation failed: %s", e)
 
         # Local fallback
-        sents = split_sentences(req.text)
-        cards = []
-        for i, s in enumerate(sents[:10]):
-            cards.append({
-                "front": f"What about: {s[:50]}...?",
-                "back": s
-            })
+        with span("local"):
+            cards = await local_cloze("flashcards", req.text, count)
+        if req.stream:
+            return sse_response(stream_items(None, None, Flashcard, lambda: cards, ("flashcards", "-")))
+        ANSWERS.inc("flashcards", "-", "local")
         return {"flashcards": cards}
+    except ClientDisconnected:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Flashcard generation failed: {e}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Flashcard generation failed: {e}")
+
+
+async def batch_entry(kind: str, item: BatchItem, default_count: int) -> dict:
+    """Resolve one batch item to its document, bounded context, and cache key"""
+    doc = DOCUMENTS.get(item.doc) or DOCUMENTS.get_by_name(item.doc)
+    if doc is None:
+        return {"doc": item.doc, "error": "Unknown document"}
+    analysis = await get_analysis(doc)
+    count = item_count(item.num_questions, default_count)
+    content = await build_context(BATCH_DOC_TOKENS, "", [doc], [analysis])
+    return {
+        "doc": doc.id,
+        "name": doc.name,
+        "count": count,
+        "content": content,
+        "tokens": estimate_tokens(len(content.encode("utf-8", errors="ignore"))),
+        # Same key as /api/quiz and /api/flashcards for this content, so results are shared
+        "key": CACHE.make_key(kind, count, content, GEMINI_MODEL),
+        "document": doc,
+        "analysis": analysis,
+    }
+
+
+def batch_line(kind: str, entry: dict, items: list, source: str) -> str:
+    ANSWERS.inc("batch", kind, source)
+    return ndjson({"doc": entry["doc"], "name": entry["name"], kind: items, "source": source})
+
+
+async def batch_local_line(kind: str, entry: dict) -> str:
+    """Local fallback items from the document's quiz index (placeholders from its first sentences if it has none)"""
+    doc = entry["document"]
+    index = await get_artifact(doc, "quiz")
+    items = await asyncio.to_thread(generate, index, doc.read_ranges, kind, entry["count"], seed_for(doc.id))
+    if not items:
+        sents = await asyncio.to_thread(doc.read_ranges, entry["analysis"]["sentences"][:entry["count"]])
+        items = local_quiz(sents) if kind == "quiz" else local_flashcards(sents)
+    return batch_line(kind, entry, items, "local")
+
+
+async def run_pack(kind: str, pack: List[dict], semaphore: asyncio.Semaphore):
+    """One Gemini call for a pack of documents; returns (pack, per-document items or None)"""
+    async with semaphore:
+        try:
+            result = await call_gemini(batch_prompt(kind, pack), endpoint="batch")
+            return pack, parse_batch(kind, result, len(pack))
+        except Exception as e:
+            LOG.warning("Batch %s call failed for %d documents: %s", kind, len(pack), e)
+            return pack, [None] * len(pack)
+
+
+async def iter_batch(kind: str, req: BatchRequest) -> AsyncIterator[str]:
+    """Yield one NDJSON line per document as soon as its items are ready"""
+    entries = await asyncio.gather(*(batch_entry(kind, item, item_count(req.num_questions, 5)) for item in req.items))
+    todo = []
+    for entry in entries:
+        if "error" in entry:
+            yield ndjson(entry)
+            continue
+        cached = CACHE.get(entry["key"]) if GEMINI_TEXT_URL else None
+        items = parse_items(cached, ITEM_MODELS[kind]) if cached is not None else []
+        if items:
+            yield batch_line(kind, entry, items, "cache")
+            continue
+        todo.append(entry)
+
+    semaphore = asyncio.Semaphore(BATCH_FAN_OUT)
+    pending = set()
+    if GEMINI_TEXT_URL:
+        pending = {
+            asyncio.ensure_future(run_pack(kind, pack, semaphore))
+            for pack in pack_entries(todo, BATCH_PROMPT_TOKENS, BATCH_MAX_DOCS_PER_CALL)
+        }
+    else:
+        for entry in todo:
+            yield await batch_local_line(kind, entry)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                pack, results = task.result()
+                for entry, items in zip(pack, results):
+                    if items is not None:
+                        CACHE.set(entry["key"], json.dumps(items, ensure_ascii=False))
+                        yield batch_line(kind, entry, items, "gemini")
+                    elif len(pack) > 1:
+                        # Missing from a shared answer: retry this document on its own
+                        pending.add(asyncio.ensure_future(run_pack(kind, [entry], semaphore)))
+                    else:
+                        yield await batch_local_line(kind, entry)
+    finally:
+        # Client went away: don't keep paying for calls nobody will read
+        for task in pending:
+            task.cancel()
+
+
+@JOBS.handler("batch")
+async def batch_job(payload: dict) -> dict:
+    """/api/batch?background=true: every document's line, collected; quota is charged to the submitter"""
+    CLIENT_ID.set(payload["client"])
+    req = BatchRequest(**payload["request"])
+    kind = (req.kind or "quiz").lower()
+    return {"kind": kind, "documents": [json.loads(line) async for line in iter_batch(kind, req)]}
+
+
+@app.post("/api/batch")
+async def batch_generate(req: BatchRequest, background: bool = False):
+    """Generate quizzes or flashcards for many documents, streamed as NDJSON (one line per document).
+
+    background=true queues the batch as a job instead; poll /api/jobs/{id} for the per-document results.
+    """
+    kind = (req.kind or "quiz").lower()
+    if kind not in BATCH_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown batch kind: {req.kind}")
+    if not req.items:
+        raise HTTPException(status_code=400, detail="No documents provided")
+    if len(req.items) > MAX_BATCH_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_ITEMS} documents per batch")
+    default_count = item_count(req.num_questions, 5)
+    for item in req.items:
+        item_count(item.num_questions, default_count)
+    if background:
+        job_id = await JOBS.submit("batch", {"client": CLIENT_ID.get(), "request": req.model_dump()})
+        return JSONResponse(status_code=202, content={"job_id": job_id, "status": "queued"})
+    return StreamingResponse(
+        iter_batch(kind, req),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,87 @@
+import asyncio
+from typing import Awaitable, Callable, List, Sequence, Tuple
+
+from retrieval import BYTES_PER_TOKEN, estimate_tokens
+
+# Bump when SECTION_PROMPT changes, so cached section notes are not reused
+SECTION_PROMPT_VERSION = 1
+
+SECTION_TOKENS = 3000  # target size of one map-step section
+MAX_SECTIONS = 64  # sections grow beyond SECTION_TOKENS rather than exceed this many calls
+NOTES_TOKENS = 6000  # merged notes are reduced again until they fit this
+MAX_LEVELS = 3
+
+
+def section_prompt(text: str) -> str:
+    # Style-independent on purpose: every summary style, quiz and flashcards reuse the same notes
+    return f"""You are a study assistant condensing one section of a longer document into study notes.
+
+STRICT REQUIREMENTS:
+- 5-10 short bullet points, under 200 words in total
+- Keep key concepts, definitions, formulas, names, dates and numbers
+- No introduction or conclusion, notes only
+
+Section:
+{text}"""
+
+
+def section_size(total_len: int) -> int:
+    """Section length (bytes or chars) so that a text of total_len needs at most MAX_SECTIONS calls"""
+    return max(SECTION_TOKENS * BYTES_PER_TOKEN, -(-total_len // MAX_SECTIONS))
+
+
+def group_spans(spans: Sequence[Sequence[int]], max_len: int) -> List[Tuple[int, int]]:
+    """Merge consecutive sentence spans into contiguous windows of at most max_len.
+
+    A single sentence longer than max_len becomes its own window.
+    """
+    windows = []
+    start = end = None
+    for s, e in spans:
+        if start is None:
+            start, end = s, e
+        elif e - start > max_len:
+            windows.append((start, end))
+            start, end = s, e
+        else:
+            end = e
+    if start is not None:
+        windows.append((start, end))
+    return windows
+
+
+def pack(texts: Sequence[str], max_len: int) -> List[str]:
+    """Concatenate consecutive texts into groups of at most max_len characters"""
+    groups, current, size = [], [], 0
+    for text in texts:
+        if current and size + len(text) > max_len:
+            groups.append("\n\n".join(current))
+            current, size = [], 0
+        current.append(text)
+        size += len(text) + 2
+    if current:
+        groups.append("\n\n".join(current))
+    return groups
+
+
+async def condense(sections: Sequence[str], summarize: Callable[[str], Awaitable[str]], fan_out: int,
+                   budget_tokens: int = NOTES_TOKENS) -> str:
+    """Map: summarise sections concurrently, at most fan_out at a time.
+
+    Reduce: the notes are merged, and re-summarised level by level until
+    they fit budget_tokens.
+    """
+    semaphore = asyncio.Semaphore(fan_out)
+
+    async def one(text: str) -> str:
+        async with semaphore:
+            return (await summarize(text)).strip()
+
+    level = list(sections)
+    for _ in range(MAX_LEVELS):
+        notes = await asyncio.gather(*(one(text) for text in level))
+        merged = "\n\n".join(notes)
+        if len(notes) == 1 or estimate_tokens(len(merged.encode("utf-8", errors="ignore"))) <= budget_tokens:
+            return merged
+        level = pack(notes, SECTION_TOKENS * BYTES_PER_TOKEN)
+    return merged
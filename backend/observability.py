@@ -0,0 +1,223 @@
+import json
+import logging
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+REQUEST_ID: ContextVar[str] = ContextVar("request_id", default="-")
+# (stage, seconds) spans of the current request, or None when it is not being traced
+TRACE: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("trace", default=None)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# -----------------------
+# Metrics (Prometheus text exposition format)
+# -----------------------
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names: Sequence[str], values: Sequence) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Metric:
+    """Set/incremented directly, or read at scrape time from fn() (a number, or {label values: number})"""
+
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), fn: Optional[Callable] = None):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.fn = fn
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def samples(self):
+        values = self._values
+        if self.fn is not None:
+            result = self.fn()
+            values = result if isinstance(result, dict) else {(): result}
+        return [("", self.labels, key, value) for key, value in sorted(values.items())]
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        for suffix, names, values, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_label_text(names, values)} {_number(value)}")
+        return lines
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, *labels, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def set(self, value: float, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._counts: Dict[tuple, List[int]] = {}
+        self._sums: Dict[tuple, float] = {}
+
+    def observe(self, value: float, *labels):
+        with self._lock:
+            counts = self._counts.get(labels)
+            if counts is None:
+                counts = self._counts[labels] = [0] * len(self.buckets)
+                self._sums[labels] = 0.0
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._sums[labels] += value
+
+    @contextmanager
+    def time(self, *labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def samples(self):
+        out = []
+        names = self.labels + ("le",)
+        for key in sorted(self._counts):
+            running = 0
+            for bound, count in zip(self.buckets, self._counts[key]):
+                running += count
+                out.append(("_bucket", names, key + (_number(bound),), running))
+            out.append(("_sum", self.labels, key, self._sums[key]))
+            out.append(("_count", self.labels, key, running))
+        return out
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = (), fn: Optional[Callable] = None) -> Counter:
+        return self.register(Counter(name, help, labels, fn))
+
+    def gauge(self, name: str, help: str, labels: Sequence[str] = (), fn: Optional[Callable] = None) -> Gauge:
+        return self.register(Gauge(name, help, labels, fn))
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labels, buckets=buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+STAGE_SECONDS = REGISTRY.histogram(
+    "studybuddy_stage_seconds", "Time spent per pipeline stage (upload, extract, prompt, llm, postprocess...)", ["stage"]
+)
+
+# -----------------------
+# Tracing
+# -----------------------
+
+
+@contextmanager
+def span(stage: str):
+    """Time a pipeline stage into STAGE_SECONDS, and into the request's trace when it is traced"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage)
+        trace = TRACE.get()
+        if trace is not None:
+            trace.append((stage, elapsed))
+
+
+def server_timing(trace: Sequence[Tuple[str, float]]) -> str:
+    """Server-Timing header value for a trace (durations in ms)"""
+    return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in trace)
+
+
+# -----------------------
+# Logging
+# -----------------------
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = REQUEST_ID.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; extra={"fields": {...}} adds keys"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "msg": record.getMessage(),
+        }
+        data.update(getattr(record, "fields", {}))
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+def configure_logging(name: str, level: str = "INFO", fmt: str = "text") -> QueueListener:
+    """Route the `name` logger through a queue so request handlers never block on stdout.
+
+    The request ID is captured when the record is created; a background thread does the writing.
+    Returns the listener; stop() it at shutdown to flush.
+    """
+    handler = logging.StreamHandler()
+    if fmt == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s"))
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = QueueHandler(records)
+    queue_handler.addFilter(RequestIdFilter())
+    logger = logging.getLogger(name)
+    logger.handlers = [queue_handler]
+    logger.setLevel(level.upper())
+    logger.propagate = False
+    listener = QueueListener(records, handler)
+    listener.start()
+    return listener
@@ -0,0 +1,179 @@
+import re
+from collections import OrderedDict
+from typing import Iterator, List, Optional, Tuple
+
+DEFAULT_DAYS = 7
+MAX_DAYS = 365
+DEFAULT_GOAL = "Your Topic"
+RULE = "─" * 50
+
+_DURATION = re.compile(r"(\d+)-day")
+_GOALS = (
+    re.compile(r"for learning: (.+?)(?:\n|$)", re.IGNORECASE),
+    re.compile(r"for: (.+?)(?:\n|$)", re.IGNORECASE),
+)
+_SPACES = re.compile(r"\s+")
+
+# Gemini plan text: "Day 3: Topic" headers followed by "• Learn: ..." / "• Practice: ..." bullets
+_DAY_LINE = re.compile(r"^\W*Day\s+(\d+)\s*[:\-–]\s*(.*)$", re.IGNORECASE)
+_BULLET_LINE = re.compile(r"^\s*[•*\-]\s*(?:(Learn|Practice)\s*:\s*)?(.+)$", re.IGNORECASE)
+
+
+# -----------------------
+# Templates
+# -----------------------
+class Phase:
+    """One phase of the local plan: a day template shared by all its days"""
+
+    def __init__(self, name: str, heading: str, title: str, points: List[str], practice: str, hours: str):
+        self.name = name
+        self.title = title
+        self.points = points
+        self.practice = practice
+        self.hours = hours
+        self.heading = f"{heading}\n\n"
+        # Everything after the day number, rendered once
+        self.body = (
+            f": {title}\n"
+            + "".join(f"• {p}\n" for p in points)
+            + f"• Practice: {practice}\n⏱ Time: {hours}\n\n"
+        )
+
+
+PHASES = (
+    Phase("fundamentals", "PHASE 1: FUNDAMENTALS", "Core Concepts",
+          ["Learn basic terminology and definitions", "Understand foundational principles",
+           "Study real-world applications"],
+          "Complete 3-5 beginner exercises", "2-3 hours"),
+    Phase("intermediate", "PHASE 2: BUILDING SKILLS", "Intermediate Topics",
+          ["Apply concepts to practical problems", "Work through guided examples", "Understand common patterns"],
+          "Build a small project", "2-3 hours"),
+    Phase("advanced", "PHASE 3: ADVANCED PRACTICE", "Advanced Techniques",
+          ["Master complex concepts", "Integrate multiple topics", "Work on real-world scenarios"],
+          "Complete a comprehensive project", "3-4 hours"),
+)
+
+TIPS = [
+    "🍅 Use Pomodoro: 25 min focus, 5 min break",
+    "📝 Take notes in your own words",
+    "🔄 Review previous day before starting",
+    "💻 Practice > Theory - build projects",
+    "👥 Join study groups or forums",
+    "😴 Get good sleep for retention",
+    "🎯 Set daily goals and track progress",
+]
+TIPS_BLOCK = f"{RULE}\n💡 QUICK STUDY TIPS\n\n" + "".join(f"{i}. {t}\n" for i, t in enumerate(TIPS, 1)) + "\n"
+FOOTER = f"{RULE}\n🎯 Goal: Build strong foundation in {{topic}}\n📊 Track your progress daily!\n🚀 You've got this!\n"
+
+
+# -----------------------
+# Request parsing
+# -----------------------
+def parse_request(prompt: str) -> Tuple[str, int]:
+    """Goal and number of days from a planner prompt ("... 14-day ... for learning: X")"""
+    match = _DURATION.search(prompt)
+    days = min(max(int(match.group(1)), 1), MAX_DAYS) if match else DEFAULT_DAYS
+    for pattern in _GOALS:
+        match = pattern.search(prompt)
+        if match:
+            return normalize_goal(match.group(1)) or DEFAULT_GOAL, days
+    return DEFAULT_GOAL, days
+
+
+def normalize_goal(goal: str) -> str:
+    return _SPACES.sub(" ", goal).strip().rstrip(".")
+
+
+# -----------------------
+# Local plans
+# -----------------------
+def phase_lengths(days: int) -> Tuple[int, int, int]:
+    """Days spent on fundamentals, intermediate topics and advanced practice"""
+    fundamentals = max(1, int(days * 0.3))
+    intermediate = max(1, int(days * 0.4))
+    return fundamentals, intermediate, days - fundamentals - intermediate
+
+
+def build_plan(topic: str, days: int) -> dict:
+    """Structured plan: days (phase, title, points, practice, hours), phases, checkpoints and tips"""
+    plan = {"goal": topic, "total_days": days, "phases": [], "days": [], "checkpoints": [], "tips": TIPS}
+    day = 1
+    for phase, length in zip(PHASES, phase_lengths(days)):
+        if length <= 0:
+            continue
+        plan["phases"].append({"name": phase.name, "title": phase.heading.strip(), "start_day": day,
+                               "end_day": day + length - 1})
+        for _ in range(length):
+            plan["days"].append({"day": day, "phase": phase.name, "title": phase.title, "points": phase.points,
+                                 "practice": phase.practice, "hours": phase.hours})
+            day += 1
+            # A quiz on the two previous days every third day of the intermediate phase
+            if phase.name == "intermediate" and day % 3 == 0 and day <= days:
+                plan["checkpoints"].append({"after_day": day - 1, "covers": [day - 2, day - 1]})
+    return plan
+
+
+def iter_plan_text(plan: dict) -> Iterator[str]:
+    """Render a structured local plan as text, one block per line group"""
+    phases = {p.name: p for p in PHASES}
+    checkpoints = {c["after_day"]: c for c in plan["checkpoints"]}
+    yield f"📚 {plan['total_days']}-Day Study Plan: {plan['goal']}\n{RULE}\n\n"
+    for entry in plan["phases"]:
+        phase = phases[entry["name"]]
+        yield phase.heading
+        for day in range(entry["start_day"], entry["end_day"] + 1):
+            yield f"📅 Day {day}{phase.body}"
+            checkpoint = checkpoints.get(day)
+            if checkpoint:
+                yield f"🧪 Checkpoint Quiz: Test Days {checkpoint['covers'][0]}-{checkpoint['covers'][1]}\n\n"
+    yield TIPS_BLOCK
+    yield FOOTER.format(topic=plan["goal"])
+
+
+class PlanCache:
+    """LRU of rendered local plans keyed by normalized (goal, days)"""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, int], Tuple[dict, str]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, goal: str, days: int) -> Tuple[dict, str]:
+        """Structured plan and its text (the first spelling of a goal is the one shown)"""
+        key = (normalize_goal(goal).casefold(), days)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+        self.misses += 1
+        plan = build_plan(normalize_goal(goal), days)
+        entry = self._entries[key] = (plan, "".join(iter_plan_text(plan)))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return entry
+
+
+# -----------------------
+# Gemini plans
+# -----------------------
+def parse_plan_text(text: str, topic: str, days: int) -> Optional[dict]:
+    """Best-effort structure of a Gemini plan ("Day N: Title" + bullets); None if no days are found"""
+    plan = {"goal": topic, "total_days": days, "phases": [], "days": [], "checkpoints": [], "tips": []}
+    current = None
+    for line in text.splitlines():
+        match = _DAY_LINE.match(line)
+        if match:
+            current = {"day": int(match.group(1)), "phase": None, "title": match.group(2).strip(), "points": [],
+                       "practice": None, "hours": None}
+            plan["days"].append(current)
+            continue
+        match = _BULLET_LINE.match(line)
+        if match and current is not None:
+            kind, item = (match.group(1) or "").lower(), match.group(2).strip()
+            if kind == "practice" and current["practice"] is None:
+                current["practice"] = item
+            else:
+                current["points"].append(item)
+    return plan if plan["days"] else None
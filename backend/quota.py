@@ -0,0 +1,188 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+# Share of the global buckets a priority class may not dip into, kept back for higher classes
+PRIORITY_RESERVE = {"interactive": 0.0, "batch": 0.3}
+
+
+class QuotaExceeded(Exception):
+    """Raised instead of calling Gemini when a client or the whole deployment is over its limit"""
+
+    def __init__(self, scope: str, retry_after: float):
+        super().__init__(f"Gemini quota exceeded ({scope}), retry in {retry_after:.1f}s")
+        self.scope = scope
+        self.retry_after = retry_after
+
+
+class QuotaLimiter:
+    """Per-client and global token buckets (requests and LLM tokens per minute) in a shared SQLite file.
+
+    Buckets refill continuously up to one minute's allowance; a limit of 0 disables that bucket.
+    acquire() reserves one request and the estimated prompt tokens before a call, charge() trues the
+    token buckets up with Gemini's usageMetadata afterwards (a bucket may go into debt) and refund()
+    returns the reservation of a call that was never sent. Every check is
+    one IMMEDIATE transaction, so uvicorn workers sharing the file see one set of buckets.
+    """
+
+    def __init__(self, path: str, client_rpm: int = 0, client_tpm: int = 0, global_rpm: int = 0,
+                 global_tpm: int = 0):
+        self.path = path
+        self.limits = {
+            "client:req": client_rpm,
+            "client:tok": client_tpm,
+            "global:req": global_rpm,
+            "global:tok": global_tpm,
+        }
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._conn() as conn:
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS buckets (
+                    key TEXT PRIMARY KEY,
+                    level REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS usage (
+                    client TEXT NOT NULL,
+                    priority TEXT NOT NULL,
+                    requests INTEGER NOT NULL DEFAULT 0,
+                    rejected INTEGER NOT NULL DEFAULT 0,
+                    prompt_tokens INTEGER NOT NULL DEFAULT 0,
+                    output_tokens INTEGER NOT NULL DEFAULT 0,
+                    last_seen REAL NOT NULL,
+                    PRIMARY KEY (client, priority)
+                );
+                """
+            )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _buckets(self, client: str) -> Dict[str, Tuple[str, int]]:
+        """Limited buckets touched by a call from client: name -> (row key, per-minute limit)"""
+        keys = {"client:req": f"req:{client}", "client:tok": f"tok:{client}", "global:req": "req:*", "global:tok": "tok:*"}
+        return {name: (keys[name], limit) for name, limit in self.limits.items() if limit > 0}
+
+    def _levels(self, conn: sqlite3.Connection, buckets: Dict[str, Tuple[str, int]], now: float) -> Dict[str, float]:
+        levels = {}
+        for name, (key, limit) in buckets.items():
+            row = conn.execute("SELECT level, updated_at FROM buckets WHERE key = ?", (key,)).fetchone()
+            level = limit if row is None else min(limit, row[0] + (now - row[1]) * limit / 60)
+            levels[name] = level
+        return levels
+
+    def _store(self, conn: sqlite3.Connection, key: str, level: float, now: float):
+        conn.execute(
+            "INSERT INTO buckets (key, level, updated_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET level = excluded.level, updated_at = excluded.updated_at",
+            (key, level, now),
+        )
+
+    def _count(self, conn: sqlite3.Connection, client: str, priority: str, now: float, **deltas: int):
+        conn.execute(
+            "INSERT INTO usage (client, priority, last_seen) VALUES (?, ?, ?) "
+            "ON CONFLICT(client, priority) DO UPDATE SET last_seen = excluded.last_seen",
+            (client, priority, now),
+        )
+        conn.execute(
+            "UPDATE usage SET " + ", ".join(f"{col} = {col} + ?" for col in deltas)
+            + " WHERE client = ? AND priority = ?",
+            (*deltas.values(), client, priority),
+        )
+
+    def acquire(self, client: str, priority: str, est_tokens: int):
+        """Reserve one request and est_tokens, or raise QuotaExceeded (nothing is reserved then)"""
+        reserve = PRIORITY_RESERVE.get(priority, 0.0)
+        buckets = self._buckets(client)
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            levels = self._levels(conn, buckets, now)
+            for name, (key, limit) in buckets.items():
+                # A prompt bigger than a whole bucket only has to wait for a full one
+                need = 1 if name.endswith(":req") else min(est_tokens, limit)
+                floor = limit * reserve if name.startswith("global") else 0.0
+                if levels[name] - need < floor:
+                    self._count(conn, client, priority, now, rejected=1)
+                    conn.execute("COMMIT")
+                    raise QuotaExceeded(name, (floor + need - levels[name]) * 60 / limit)
+            for name, (key, limit) in buckets.items():
+                self._store(conn, key, levels[name] - (1 if name.endswith(":req") else est_tokens), now)
+            self._count(conn, client, priority, now, requests=1)
+            conn.execute("COMMIT")
+        except QuotaExceeded:
+            raise
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def refund(self, client: str, priority: str, est_tokens: int):
+        """Give back what acquire() reserved for a call that never reached Gemini (e.g. circuit open)"""
+        buckets = self._buckets(client)
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            levels = self._levels(conn, buckets, now)
+            for name, (key, limit) in buckets.items():
+                self._store(conn, key, min(limit, levels[name] + (1 if name.endswith(":req") else est_tokens)), now)
+            self._count(conn, client, priority, now, requests=-1)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def charge(self, client: str, priority: str, est_tokens: int, prompt_tokens: int, output_tokens: int):
+        """Settle a call's actual token usage against what acquire() reserved"""
+        buckets = {k: v for k, v in self._buckets(client).items() if k.endswith(":tok")}
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            levels = self._levels(conn, buckets, now)
+            for name, (key, _) in buckets.items():
+                self._store(conn, key, levels[name] - (prompt_tokens + output_tokens - est_tokens), now)
+            self._count(conn, client, priority, now, prompt_tokens=prompt_tokens, output_tokens=output_tokens)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def usage(self, client: Optional[str] = None) -> dict:
+        """Totals per client and priority, plus what is left in the global buckets right now"""
+        conn = self._conn()
+        query = "SELECT client, priority, requests, rejected, prompt_tokens, output_tokens, last_seen FROM usage"
+        rows = conn.execute(query + (" WHERE client = ?" if client else "") + " ORDER BY client, priority",
+                            (client,) if client else ()).fetchall()
+        now = time.time()
+        clients: Dict[str, dict] = {}
+        for name, priority, requests, rejected, prompt_tokens, output_tokens, last_seen in rows:
+            entry = clients.setdefault(name, {"remaining": self._remaining(conn, name, now), "priorities": {}})
+            entry["priorities"][priority] = {
+                "requests": requests,
+                "rejected": rejected,
+                "prompt_tokens": prompt_tokens,
+                "output_tokens": output_tokens,
+                "last_seen": last_seen,
+            }
+        return {
+            "limits_per_minute": self.limits,
+            "global_remaining": self._remaining(conn, "*", now),
+            "clients": clients,
+        }
+
+    def _remaining(self, conn: sqlite3.Connection, client: str, now: float) -> Dict[str, int]:
+        prefix = "global" if client == "*" else "client"
+        buckets = {k: v for k, v in self._buckets(client).items() if k.startswith(prefix)}
+        return {name.split(":")[1]: int(level) for name, level in self._levels(conn, buckets, now).items()}
@@ -0,0 +1,196 @@
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Optional, TypeVar
+
+import httpx
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling an upstream that is currently failing"""
+
+
+class SLOExceeded(Exception):
+    """Raised by hedge() when the upstream misses its latency target"""
+
+
+class CircuitBreaker:
+    """Closed -> open after `failures` consecutive failures -> half-open after `cooldown` s (one probe)"""
+
+    def __init__(self, failures: int = 5, cooldown: float = 30.0):
+        self.failures = failures
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.consecutive = 0
+        self.opened_at = 0.0
+        self.trips = 0
+        self._probing = False
+
+    def allow(self) -> bool:
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.cooldown:
+            self.state = "half_open"
+            self._probing = False
+        if self.state == "closed":
+            return True
+        if self.state == "half_open" and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def record_success(self):
+        self.state = "closed"
+        self.consecutive = 0
+        self._probing = False
+
+    def release(self):
+        """Give back a half-open probe whose outcome is unknown (e.g. the caller went away)"""
+        self._probing = False
+
+    def record_failure(self):
+        self.consecutive += 1
+        if self.state == "half_open" or self.consecutive >= self.failures:
+            if self.state != "open":
+                self.trips += 1
+            self.state = "open"
+            self.opened_at = time.monotonic()
+            self._probing = False
+
+
+class LatencyTracker:
+    """Per-endpoint deadline from recent successful latencies: p95 * factor, clamped to [floor, ceiling]"""
+
+    def __init__(self, floor: float, ceiling: float, factor: float = 2.0, window: int = 200, min_samples: int = 20):
+        self.floor = floor
+        self.ceiling = ceiling
+        self.factor = factor
+        self.window = window
+        self.min_samples = min_samples
+        self._samples: Dict[str, Deque[float]] = {}
+
+    def observe(self, endpoint: str, seconds: float):
+        self._samples.setdefault(endpoint, deque(maxlen=self.window)).append(seconds)
+
+    def p95(self, endpoint: str) -> Optional[float]:
+        samples = self._samples.get(endpoint)
+        if not samples or len(samples) < self.min_samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+    def endpoints(self):
+        return list(self._samples)
+
+    def deadline(self, endpoint: str) -> float:
+        p95 = self.p95(endpoint)
+        if p95 is None:
+            return self.ceiling
+        return min(self.ceiling, max(self.floor, p95 * self.factor))
+
+
+def is_retryable(exc: BaseException) -> bool:
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code in RETRYABLE_STATUS
+    return isinstance(exc, httpx.TransportError)
+
+
+def retry_after(exc: BaseException) -> Optional[float]:
+    if isinstance(exc, httpx.HTTPStatusError):
+        try:
+            return float(exc.response.headers.get("retry-after", ""))
+        except ValueError:
+            return None
+    return None
+
+
+class Resilience:
+    """Deadline, retries with full-jitter backoff and a circuit breaker around one upstream"""
+
+    def __init__(self, breaker: CircuitBreaker, latency: LatencyTracker, retries: int = 2,
+                 backoff: float = 0.25, max_backoff: float = 4.0):
+        self.breaker = breaker
+        self.latency = latency
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.retried = 0
+        self.rejected = 0
+
+    def allow(self) -> bool:
+        """For callers that talk to the upstream themselves (streams); pair with record()"""
+        if self.breaker.allow():
+            return True
+        self.rejected += 1
+        return False
+
+    def record(self, ok: bool):
+        if ok:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+
+    async def call(self, endpoint: str, fn: Callable[[float], Awaitable[T]]) -> T:
+        """Run fn(timeout) within the endpoint's deadline, retrying 429/5xx/transport errors"""
+        if not self.allow():
+            raise CircuitOpen("Gemini circuit open")
+        expires = time.monotonic() + self.latency.deadline(endpoint)
+        attempt = 0
+        while True:
+            start = time.monotonic()
+            try:
+                result = await fn(max(expires - start, 0.001))
+            except asyncio.CancelledError:
+                # The caller went away (client disconnect, last cache waiter gone): the outcome is
+                # unknown, so a half-open probe must be handed back or the breaker never closes
+                self.breaker.release()
+                raise
+            except Exception as e:
+                # Upstream trouble (timeouts, 429/5xx, connection errors) counts against the breaker;
+                # a 4xx for a bad request does not
+                if is_retryable(e) or isinstance(e, asyncio.TimeoutError):
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
+                delay = min(self.max_backoff, self.backoff * 2 ** attempt) * random.random()
+                delay = max(delay, retry_after(e) or 0.0)
+                if (attempt >= self.retries or not is_retryable(e)
+                        or time.monotonic() + delay >= expires or not self.breaker.allow()):
+                    raise
+                attempt += 1
+                self.retried += 1
+                await asyncio.sleep(delay)
+                continue
+            self.breaker.record_success()
+            self.latency.observe(endpoint, time.monotonic() - start)
+            return result
+
+    def stats(self) -> dict:
+        return {
+            "breaker": self.breaker.state,
+            "cooldown": self.breaker.cooldown,
+            "consecutive_failures": self.breaker.consecutive,
+            "trips": self.breaker.trips,
+            "retried": self.retried,
+            "rejected": self.rejected,
+            "deadlines": {e: round(self.latency.deadline(e), 2) for e in self.latency.endpoints()},
+        }
+
+
+_background = set()
+
+
+async def hedge(coro: Awaitable[T], slo: Optional[float]) -> T:
+    """Await coro, raising SLOExceeded after slo seconds; the call keeps running (e.g. to fill a cache)"""
+    if not slo:
+        return await coro
+    task = asyncio.ensure_future(coro)
+    done, _ = await asyncio.wait({task}, timeout=slo)
+    if done:
+        return task.result()
+    _background.add(task)
+    task.add_done_callback(lambda t: (_background.discard(t), t.cancelled() or t.exception()))
+    raise SLOExceeded(f"No answer within {slo:.1f}s")
@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+import re
+from collections import Counter
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from analysis import terms
+from doc_store import Document, iter_bytes, write_json_atomic
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# Bump whenever chunking or the index layout changes; stale indexes are rebuilt on next use
+CHUNK_INDEX_VERSION = 1
+
+CHUNK_BYTES = 2048
+CHUNK_OVERLAP = 256
+BYTES_PER_TOKEN = 4  # rough estimate for English text
+
+# Re-selections that spend the bytes compaction frees (retrieve_context with compacted_size)
+REFILL_ROUNDS = 3
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_SPACE = re.compile(rb"\s")
+
+
+def estimate_tokens(n_bytes: int) -> int:
+    return -(-n_bytes // BYTES_PER_TOKEN)
+
+
+def iter_chunks(pieces: Iterable[bytes], size: int = CHUNK_BYTES,
+                overlap: int = CHUNK_OVERLAP) -> Iterator[Tuple[int, int, bytes]]:
+    """Fixed-size overlapping [start, end) byte windows, cut at whitespace so words (and UTF-8) stay whole.
+
+    The data arrives in pieces and only about one window (plus a piece) is held; yields (start, end, bytes).
+    """
+    pieces = iter(pieces)
+    buf, base, start, eof = b"", 0, 0, False
+    while True:
+        # Offsets are absolute; buf holds the data from base on
+        while not eof and base + len(buf) <= start + size:
+            piece = next(pieces, None)
+            if piece is None:
+                eof = True
+            else:
+                buf += piece
+        n = base + len(buf)
+        if start >= n:
+            break
+        end = min(start + size, n)
+        if end < n:
+            lo, hi = start + size // 2 - base, end - base
+            cut = max(buf.rfind(b" ", lo, hi), buf.rfind(b"\n", lo, hi))
+            if cut > 0:
+                end = base + cut
+        yield start, end, buf[start - base:end - base]
+        if end >= n:
+            break
+        m = _SPACE.search(buf, end - overlap - base, end - base)
+        start = base + m.end() if m else end
+        if start - base > len(buf) // 2:
+            buf, base = buf[start - base:], start
+
+
+def build_chunk_index(data: bytes) -> dict:
+    return build_chunk_index_stream([data])
+
+
+def build_chunk_index_stream(pieces: Iterable[bytes]) -> dict:
+    """Chunk spans plus a per-document term/count matrix (CSR arrays) for BM25, from text read in pieces"""
+    spans = []
+    vocab: Dict[str, int] = {}
+    indptr, indices, counts, lengths = [0], [], [], []
+    for start, end, chunk in iter_chunks(pieces):
+        spans.append((start, end))
+        tf = Counter(terms(chunk.decode("utf-8", errors="ignore")))
+        for term, count in tf.items():
+            indices.append(vocab.setdefault(term, len(vocab)))
+            counts.append(count)
+        indptr.append(len(indices))
+        lengths.append(sum(tf.values()))
+    return {
+        "version": CHUNK_INDEX_VERSION,
+        "chunks": [list(s) for s in spans],
+        "vocab": list(vocab),
+        "indptr": indptr,
+        "indices": indices,
+        "counts": counts,
+        "lengths": lengths,
+    }
+
+
+def prepare_chunk_index(index: dict) -> dict:
+    """Turn a loaded index into arrays: a CSC matrix so query-term columns are cheap to slice"""
+    # numpy/scipy load on the first query that needs an index, not at startup
+    import numpy as np
+    from scipy import sparse
+    n_chunks, n_terms = len(index["chunks"]), len(index["vocab"])
+    matrix = sparse.csr_matrix(
+        (np.asarray(index["counts"], dtype=np.float64), np.asarray(index["indices"], dtype=np.int64),
+         np.asarray(index["indptr"], dtype=np.int64)),
+        shape=(n_chunks, n_terms),
+    ).tocsc()
+    return {
+        "version": index["version"],
+        "chunks": index["chunks"],
+        "term_ids": {t: i for i, t in enumerate(index["vocab"])},
+        "matrix": matrix,
+        "lengths": np.asarray(index["lengths"], dtype=np.float64),
+    }
+
+
+# -----------------------
+# Query time
+# -----------------------
+def bm25_scores(indexes: Sequence[dict], queries: Sequence[Dict[str, float]]) -> List[np.ndarray]:
+    """BM25 score of every chunk of every document against that document's weighted query.
+
+    IDF and average chunk length are taken over the whole selection, so
+    scores are comparable across documents.
+    """
+    import numpy as np
+    query_terms = list({t: None for q in queries for t in q})
+    n_chunks = sum(ix["lengths"].size for ix in indexes)
+    if not n_chunks or not query_terms:
+        return [np.zeros(ix["lengths"].size) for ix in indexes]
+    avgdl = max(sum(ix["lengths"].sum() for ix in indexes) / n_chunks, 1.0)
+    tfs, df = [], np.zeros(len(query_terms))
+    for ix in indexes:
+        tf = np.zeros((ix["lengths"].size, len(query_terms)))
+        cols = [(q, ix["term_ids"][t]) for q, t in enumerate(query_terms) if t in ix["term_ids"]]
+        if cols:
+            tf[:, [q for q, _ in cols]] = ix["matrix"][:, [c for _, c in cols]].toarray()
+        df += (tf > 0).sum(axis=0)
+        tfs.append(tf)
+    idf = np.log(1.0 + (n_chunks - df + 0.5) / (df + 0.5))
+    scores = []
+    for ix, tf, query in zip(indexes, tfs, queries):
+        weights = np.asarray([query.get(t, 0.0) for t in query_terms]) * idf
+        norm = BM25_K1 * (1.0 - BM25_B + BM25_B * ix["lengths"] / avgdl)
+        scores.append((tf * (BM25_K1 + 1.0) / (tf + norm[:, None])) @ weights)
+    return scores
+
+
+def rank_chunks(scores: Sequence[np.ndarray]) -> List[Tuple[int, int]]:
+    """(document, chunk) pairs, best score first"""
+    # Ties (e.g. chunks matching no query term) go in document order, like plain truncation
+    order = sorted((-s, d, i) for d, doc_scores in enumerate(scores) for i, s in enumerate(doc_scores.tolist()))
+    return [(d, i) for _, d, i in order]
+
+
+def select_chunks(indexes: Sequence[dict], ranked: Sequence[Tuple[int, int]],
+                  budget_bytes: int) -> List[List[List[int]]]:
+    """Greedily take the best-ranked chunks that fit the budget; returns merged byte spans per document.
+
+    Overlap with an already-taken neighbour isn't charged twice, and the
+    budget is filled with whatever chunks still fit.
+    """
+    taken = [set() for _ in indexes]
+    used = 0
+    for d, i in ranked:
+        chunks = indexes[d]["chunks"]
+        start, end = chunks[i]
+        if i - 1 in taken[d]:
+            start = max(start, chunks[i - 1][1])
+        if i + 1 in taken[d]:
+            end = min(end, chunks[i + 1][0])
+        cost = max(end - start, 0)
+        if used + cost > budget_bytes:
+            continue
+        taken[d].add(i)
+        used += cost
+    merged = []
+    for d, picked in enumerate(taken):
+        spans: List[List[int]] = []
+        for i in sorted(picked):
+            start, end = indexes[d]["chunks"][i]
+            if spans and start <= spans[-1][1]:
+                spans[-1][1] = max(spans[-1][1], end)
+            else:
+                spans.append([start, end])
+        merged.append(spans)
+    return merged
+
+
+def read_passages(docs: Sequence[Document], spans: Sequence[List[List[int]]]) -> str:
+    parts = []
+    for doc, doc_spans in zip(docs, spans):
+        if doc_spans:
+            parts.append("\n[...]\n".join(p.strip() for p in doc.read_ranges(doc_spans)))
+    return "\n\n".join(parts)
+
+
+def retrieve_context(docs: Sequence[Document], indexes: Sequence[dict], queries: Sequence[Dict[str, float]],
+                     budget_tokens: int, compacted_size: Optional[Callable[[str], int]] = None) -> str:
+    """Best-matching passages of the selected documents within budget_tokens, in document order.
+
+    With compacted_size (bytes the text will take once compacted), the
+    budget is charged for compacted text: the bytes compaction frees are
+    spent on more chunks, over a few rounds of re-selection.
+    """
+    budget_bytes = budget_tokens * BYTES_PER_TOKEN
+    if sum(d.size for d in docs) <= budget_bytes:
+        return "\n\n".join(d.text for d in docs)
+    ranked = rank_chunks(bm25_scores(indexes, queries))
+    limit = budget_bytes
+    context = read_passages(docs, select_chunks(indexes, ranked, limit))
+    if compacted_size is None:
+        return context
+    size = compacted_size(context)
+    for _ in range(REFILL_ROUNDS):
+        if budget_bytes - size < CHUNK_OVERLAP:  # too little freed to take another chunk
+            break
+        limit += budget_bytes - size
+        wider = read_passages(docs, select_chunks(indexes, ranked, limit))
+        wider_size = compacted_size(wider)
+        if wider_size > budget_bytes or wider_size <= size:
+            break
+        context, size = wider, wider_size
+    return context
+
+
+# -----------------------
+# Worker function (runs in the extraction pool)
+# -----------------------
+def index_chunks_to(text_path: str, dest: str) -> dict:
+    index = build_chunk_index_stream(iter_bytes(text_path))
+    write_json_atomic(dest, index)
+    return index
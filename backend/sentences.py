@@ -0,0 +1,112 @@
+import re
+from typing import Iterable, Iterator, List, Tuple
+
+# Terminator run, plus closing quotes/brackets, followed by whitespace or end of text.
+# Requiring whitespace after it keeps "3.14", "e.g.," and "file.txt" in one piece.
+# Matches only start at the beginning of a run, so a long run with no whitespace after
+# it ("....x") is tried once rather than from every position (which is quadratic).
+_BOUNDARY = re.compile(r"(?<![.!?])[.!?]+[\"'”’)\]]*(?=\s|$)")
+
+# Words that end in a period without ending the sentence
+_TITLES = {"mr", "mrs", "ms", "dr", "prof", "sr", "jr", "st", "rev", "gen", "capt", "lt", "sgt"}
+_ABBREVIATIONS = _TITLES | {
+    "e.g", "i.e", "etc", "vs", "cf", "al", "fig", "figs", "eq", "eqs", "no", "nos", "vol", "ch",
+    "sec", "pp", "p", "approx", "inc", "ltd", "co", "corp", "dept", "univ", "jan", "feb", "mar",
+    "apr", "jun", "jul", "aug", "sep", "sept", "oct", "nov", "dec",
+}
+
+_MAX_ABBREVIATION = max(len(a) for a in _ABBREVIATIONS)
+
+MIN_SENTENCE_CHARS = 20
+# iter_sentence_blocks cuts a run this long without a sentence boundary at whitespace
+MAX_SENTENCE_CHARS = 1024 * 1024
+
+
+def _is_abbreviation(text: str, seg_start: int, dot: int) -> bool:
+    """True when the period at text[dot] belongs to an abbreviation or an initial"""
+    # Only the last few characters matter: longer words can't be abbreviations
+    lo = max(seg_start, dot - _MAX_ABBREVIATION - 2)
+    window = text[lo:dot]
+    parts = window.rsplit(None, 1)
+    if not parts or (len(parts[-1]) == len(window) and lo > seg_start):
+        return False
+    word = parts[-1].lstrip("(\"'").lower()
+    if word in _ABBREVIATIONS:
+        if word in _TITLES:
+            return True
+        # "etc." / "approx." can still end a sentence; only keep going if the next word is lowercase
+        nxt = text[dot + 1:dot + 3].lstrip()
+        return bool(nxt) and not nxt[0].isupper()
+    # initials: "J. Smith", "U.S."
+    return len(word) == 1 and word.isalpha() or (
+        "." in word and word.replace(".", "").isalpha() and all(len(p) == 1 for p in word.split("."))
+    )
+
+
+def iter_sentence_spans(text: str, min_chars: int = MIN_SENTENCE_CHARS) -> Iterator[Tuple[int, int]]:
+    """Lazily yield (start, end) offsets of whitespace-trimmed sentences in one regex pass.
+
+    Sentences of min_chars or fewer are dropped (headings, page numbers);
+    a trailing fragment without a terminator is always kept.
+    """
+    seg_start = 0
+    for m in _BOUNDARY.finditer(text):
+        dot = m.start()
+        if text[dot] == "." and m.end() - dot == 1 and _is_abbreviation(text, seg_start, dot):
+            continue
+        raw = text[seg_start:m.end()]
+        body = raw.lstrip()
+        start = seg_start + len(raw) - len(body)
+        seg_start = m.end()
+        if len(body) > min_chars:
+            yield start, seg_start
+    tail = text[seg_start:]
+    body = tail.strip()
+    if body:
+        start = seg_start + len(tail) - len(tail.lstrip())
+        yield start, start + len(body)
+
+
+def _last_boundary(text: str) -> int:
+    """End of the last sentence boundary that more text could not change (0 if none)"""
+    seg_start = 0
+    for m in _BOUNDARY.finditer(text):
+        # Abbreviation checks look two characters past the period
+        if m.end() + 2 > len(text):
+            break
+        dot = m.start()
+        if text[dot] == "." and m.end() - dot == 1 and _is_abbreviation(text, seg_start, dot):
+            continue
+        seg_start = m.end()
+    return seg_start
+
+
+def iter_sentence_blocks(pieces: Iterable[str], min_chars: int = MIN_SENTENCE_CHARS) -> Iterator[Tuple[str, List[Tuple[int, int]]]]:
+    """iter_sentence_spans over text arriving in pieces, holding only the unfinished sentence.
+
+    Yields consecutive blocks of the text, each ending on a sentence boundary, with the
+    spans of their sentences relative to the block; joined, the spans are those of the whole text.
+    A run of more than MAX_SENTENCE_CHARS without a boundary is cut at whitespace.
+    """
+    buf = ""
+    for piece in pieces:
+        buf += piece
+        cut = _last_boundary(buf)
+        if not cut and len(buf) > MAX_SENTENCE_CHARS:
+            cut = max(buf.rfind(" "), buf.rfind("\n")) + 1 or len(buf)
+        if cut:
+            block, buf = buf[:cut], buf[cut:]
+            yield block, list(iter_sentence_spans(block, min_chars))
+    if buf:
+        yield buf, list(iter_sentence_spans(buf, min_chars))
+
+
+def iter_sentences(text: str, min_chars: int = MIN_SENTENCE_CHARS) -> Iterator[str]:
+    """Lazily split text into sentences"""
+    for start, end in iter_sentence_spans(text, min_chars):
+        yield text[start:end]
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split text into sentences for local summarization"""
+    return list(iter_sentences(text))
@@ -0,0 +1,80 @@
+from typing import List, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from analysis import terms
+from doc_store import read_ranges
+
+DAMPING = 0.85
+TOLERANCE = 1e-6
+MAX_ITERATIONS = 100
+
+
+def tfidf_matrix(sentences: Sequence[str]) -> sparse.csr_matrix:
+    """Row-normalised TF-IDF matrix (sentences x terms) with sublinear term frequency"""
+    vocab = {}
+    indices: List[int] = []
+    indptr = [0]
+    for sent in sentences:
+        indices.extend(vocab.setdefault(w, len(vocab)) for w in terms(sent))
+        indptr.append(len(indices))
+    n = len(sentences)
+    X = sparse.csr_matrix(
+        (np.ones(len(indices)), np.asarray(indices, dtype=np.int64), np.asarray(indptr, dtype=np.int64)),
+        shape=(n, len(vocab)),
+    )
+    X.sum_duplicates()
+    X.data = 1.0 + np.log(X.data)
+    df = np.bincount(X.indices, minlength=len(vocab))
+    X = X.multiply(np.log((1.0 + n) / (1.0 + df)) + 1.0).tocsr()
+    norms = np.sqrt(np.asarray(X.multiply(X).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return sparse.diags(1.0 / norms) @ X
+
+
+def textrank(X: sparse.csr_matrix, damping: float = DAMPING, tol: float = TOLERANCE,
+             max_iter: int = MAX_ITERATIONS) -> np.ndarray:
+    """PageRank over the cosine-similarity graph of X's rows, by power iteration.
+
+    The n x n similarity matrix is never built: S @ v is computed as
+    X @ (X.T @ v) minus the self-similarity term, so each step costs two
+    sparse mat-vecs over X's non-zeros.
+    """
+    n = X.shape[0]
+    if n == 0:
+        return np.zeros(0)
+    Xt = X.T.tocsr()
+    self_sim = np.asarray(X.multiply(X).sum(axis=1)).ravel()
+    degree = X @ (Xt @ np.ones(n)) - self_sim
+    dangling = degree <= 1e-12
+    inv_degree = np.where(dangling, 0.0, 1.0 / np.where(dangling, 1.0, degree))
+    p = np.full(n, 1.0 / n)
+    for _ in range(max_iter):
+        y = p * inv_degree
+        # Sentences sharing no terms with any other spread their rank uniformly
+        nxt = (1.0 - damping) / n + damping * (X @ (Xt @ y) - self_sim * y + p[dangling].sum() / n)
+        if np.abs(nxt - p).sum() < tol:
+            return nxt
+        p = nxt
+    return p
+
+
+def rank_sentences(sentences: Sequence[str]) -> np.ndarray:
+    return textrank(tfidf_matrix(sentences))
+
+
+# -----------------------
+# Worker function (runs in the extraction pool)
+# -----------------------
+def textrank_scores(sources: Sequence[Tuple[str, Sequence[Sequence[int]]]]) -> List[float]:
+    """Score every sentence of several documents in one graph.
+
+    sources is [(text path, sentence byte spans)]; all documents share one
+    vocabulary, IDF and similarity graph, so sentences are ranked against
+    the whole selection rather than per document.
+    """
+    sentences: List[str] = []
+    for path, spans in sources:
+        sentences.extend(read_ranges(path, spans))
+    return rank_sentences(sentences).tolist()
@@ -0,0 +1,56 @@
+import json
+import os
+import tempfile
+
+import pytest
+
+# Local engines only, and a throwaway data directory, before main reads its configuration
+os.environ["GEMINI_API_KEY"] = ""
+os.environ.setdefault("DATA_DIR", tempfile.mkdtemp(prefix="studybuddy-test-"))
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import main  # noqa: E402
+
+NOTES = " ".join(
+    f"Enzyme {i} lowers the activation energy of reaction {i} inside the cell membrane." for i in range(300)
+)
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(main.app) as c:
+        yield c
+
+
+@pytest.fixture(scope="module")
+def doc_id(client):
+    return client.post("/api/upload", files={"file": ("notes.txt", NOTES.encode(), "text/plain")}).json()["id"]
+
+
+@pytest.mark.parametrize("endpoint", ["quiz", "flashcards"])
+@pytest.mark.parametrize("count", [0, -3, main.MAX_ITEMS_PER_DOC + 1, 100000])
+def test_item_counts_out_of_range_are_rejected(client, endpoint, count):
+    r = client.post(f"/api/{endpoint}", json={"text": NOTES, "num_questions": count})
+    assert r.status_code == 400
+
+
+@pytest.mark.parametrize("endpoint", ["quiz", "flashcards"])
+def test_empty_text_is_a_400(client, endpoint):
+    r = client.post(f"/api/{endpoint}", json={"text": "   ", "num_questions": 3})
+    assert r.status_code == 400
+    assert r.json()["detail"].startswith("Empty text")
+
+
+@pytest.mark.parametrize("request_count, item_count", [(0, None), (-3, None), (100000, None), (5, -1), (5, 0),
+                                                       (5, 100000)])
+def test_batch_counts_out_of_range_are_rejected(client, doc_id, request_count, item_count):
+    body = {"kind": "flashcards", "num_questions": request_count, "items": [{"doc": doc_id, "num_questions": item_count}]}
+    assert client.post("/api/batch", json=body).status_code == 400
+    assert client.post("/api/batch?background=true", json=body).status_code == 400
+
+
+def test_batch_honours_counts(client, doc_id):
+    body = {"kind": "flashcards", "num_questions": 3, "items": [{"doc": doc_id}, {"doc": doc_id, "num_questions": 2}]}
+    lines = [json.loads(line) for line in client.post("/api/batch", json=body).text.splitlines()]
+    assert [len(line["flashcards"]) for line in lines] == [3, 2]
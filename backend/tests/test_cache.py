@@ -0,0 +1,19 @@
+from cache import ResponseCache
+
+
+def test_size_is_counted_in_utf8_bytes():
+    cache = ResponseCache(max_bytes=100)
+    cache.set("a", "é" * 30)  # 60 bytes
+    assert cache.stats()["bytes"] == 60
+    cache.set("b", "日" * 20)  # 60 bytes: evicts "a"
+    assert cache.get("a") is None
+    assert cache.get("b") == "日" * 20
+    assert cache.stats()["bytes"] == 60
+    assert cache.stats()["evictions"] == 1
+
+
+def test_values_over_the_limit_are_not_kept():
+    cache = ResponseCache(max_bytes=100)
+    cache.set("a", "📘" * 26)  # 104 bytes, 26 characters
+    assert cache.get("a") is None
+    assert cache.stats()["bytes"] == 0
@@ -0,0 +1,37 @@
+from cloze import build_quiz_index, generate, is_heading, prepare_quiz_index, text_reader
+
+TITLE = "Photosynthesis And Cellular Respiration"
+BODY = [
+    "Chloroplasts capture light energy and store it as chemical energy in glucose molecules.",
+    "Mitochondria release the chemical energy stored in glucose during cellular respiration.",
+    "Chlorophyll absorbs red and blue light while reflecting green light back to the observer.",
+    "The Calvin cycle fixes carbon dioxide into glucose inside the stroma of chloroplasts.",
+    "Glycolysis splits glucose into pyruvate in the cytoplasm before mitochondria take over.",
+    "The electron transport chain in mitochondria pumps protons to drive ATP synthase.",
+]
+
+
+def sentences(text: str):
+    data, index = text.encode("utf-8"), build_quiz_index(text)
+    return [data[s:e].decode("utf-8") for s, e in index["sentences"]]
+
+
+def test_title_is_not_merged_into_the_first_sentence():
+    text = TITLE + "\n" + " ".join(BODY)
+    assert sentences(text) == BODY
+    items = generate(prepare_quiz_index(build_quiz_index(text)), text_reader(text), "flashcards", 6)
+    assert items
+    assert not any(TITLE.lower() in (card["front"] + card["back"]).lower() for card in items)
+
+
+def test_heading_before_a_blank_line_is_dropped():
+    text = "Light reactions\n\n" + " ".join(BODY[:3]) + "\nDark reactions\n\n" + " ".join(BODY[3:])
+    assert sentences(text) == BODY
+
+
+def test_wrapped_sentence_lines_are_kept():
+    wrapped = "In 1953 Watson and\nCrick described the double helix structure of DNA from diffraction data."
+    assert sentences(wrapped + " " + BODY[0]) == [wrapped, BODY[0]]
+    assert not is_heading("The enzyme binds its", "substrate at the active site.")
+    assert not is_heading("Cell Biology.", "The cell is the unit of life.")
+    assert is_heading("Cell Biology 101", "The cell is the unit of life.")
@@ -0,0 +1,49 @@
+import asyncio
+import os
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from extraction import Extractor, TextSink, join_parts_to
+
+
+def test_pool_is_rebuilt_after_a_worker_dies():
+    extractor = Extractor(workers=1)
+
+    async def scenario():
+        first = await extractor.run(os.getpid)
+        with pytest.raises(BrokenProcessPool):
+            await extractor.run(os._exit, 1)
+        return first, await extractor.run(os.getpid)
+
+    try:
+        first, second = asyncio.run(scenario())
+    finally:
+        extractor.shutdown()
+    assert first != second
+    assert extractor.pending == 0
+
+
+def test_sink_strips_document_and_records_page_starts(tmp_path):
+    sink = TextSink(str(tmp_path / "out.txt"))
+    sink.write_all(["  \n first page", None, "second page  ", "third\n\n"], sep="\n", pages=True)
+    size, _, pages = sink.close()
+    text = (tmp_path / "out.txt").read_bytes()
+    assert text == b"first page\nsecond page  \nthird"
+    assert size == len(text)
+    assert [text[p:p + 5] for p in pages] == [b"first", b"\nseco", b"secon", b"third"]
+
+
+def test_joined_parts_keep_page_offsets(tmp_path):
+    parts, part_pages = [], []
+    for i, pages in enumerate((["\n  a1", "a2"], ["b1", "b2 "])):
+        path = str(tmp_path / f"part{i}")
+        sink = TextSink(path, strip=False)
+        sink.write_all(pages, sep="\n", pages=True)
+        part_pages.append(sink.close()[2])
+        parts.append(path)
+    dest = str(tmp_path / "joined")
+    _, _, pages = join_parts_to(parts, dest, part_pages)
+    text = open(dest, "rb").read()
+    assert text == b"a1\na2\nb1\nb2"
+    assert [text[p:p + 2] for p in pages] == [b"a1", b"a2", b"b1", b"b2"]
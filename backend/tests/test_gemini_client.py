@@ -0,0 +1,48 @@
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+
+from gemini_client import GeminiClient
+
+
+def client_for(chunks) -> GeminiClient:
+    """GeminiClient whose stream endpoint replies with the given SSE chunks (None = stall)"""
+    async def body():
+        for chunk in chunks:
+            if chunk is None:
+                await asyncio.sleep(60)
+            yield chunk.encode()
+
+    gemini = GeminiClient("http://gemini/generate", "http://gemini/stream")
+    gemini._client = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(200, content=body())))
+    return gemini
+
+
+async def collect(gemini: GeminiClient, **kwargs) -> list:
+    return [delta async for delta in gemini.stream("prompt", **kwargs)]
+
+
+def sse(data: dict) -> str:
+    return f"data: {json.dumps(data)}\n\n"
+
+
+def test_stream_skips_events_without_candidates():
+    gemini = client_for([
+        sse({"candidates": [], "usageMetadata": {"promptTokenCount": 3}}),
+        sse({"candidates": [{"content": {"parts": [{"text": "hello"}]}}]}),
+    ])
+    usage = {}
+    assert asyncio.run(collect(gemini, usage=usage)) == ["hello"]
+    assert usage == {"promptTokenCount": 3}
+
+
+def test_stalled_stream_times_out_at_the_deadline():
+    gemini = client_for([sse({"candidates": [{"content": {"parts": [{"text": "partial"}]}}]}), None])
+    started = time.monotonic()
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(collect(gemini, deadline=0.3))
+    assert time.monotonic() - started < 5
+    assert gemini.in_flight == 0
@@ -0,0 +1,75 @@
+import asyncio
+import os
+
+from jobs import SQLiteJobQueue
+
+
+def make_queue(tmp_path, **kwargs) -> SQLiteJobQueue:
+    queue = SQLiteJobQueue(os.path.join(tmp_path, "jobs.db"), **kwargs)
+    running = {"now": 0, "max": 0}
+
+    @queue.handler("echo")
+    async def echo(payload: dict):
+        running["now"] += 1
+        running["max"] = max(running["max"], running["now"])
+        await asyncio.sleep(0.02)
+        running["now"] -= 1
+        return payload
+
+    queue.running = running
+    return queue
+
+
+async def wait_done(queue: SQLiteJobQueue, job_ids, timeout: float = 5.0):
+    for _ in range(int(timeout / 0.01)):
+        if all(queue.get(j)["status"] == "done" for j in job_ids):
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError([queue.get(j)["status"] for j in job_ids])
+
+
+def test_runs_every_job_within_concurrency(tmp_path):
+    async def scenario():
+        queue = make_queue(tmp_path, concurrency=2)
+        await queue.start()
+        try:
+            ids = [await queue.submit("echo", {"n": i}) for i in range(6)]
+            await wait_done(queue, ids)
+            assert [queue.get(j)["result"] for j in ids] == [{"n": i} for i in range(6)]
+            assert queue.running["max"] == 2
+        finally:
+            await queue.stop()
+
+    asyncio.run(scenario())
+
+
+def test_idle_polls_do_not_take_the_write_lock(tmp_path):
+    async def scenario():
+        queue = make_queue(tmp_path, concurrency=4, poll_interval=0.01, max_poll_interval=0.05)
+        claims = []
+        claim_one = queue._claim_one
+        queue._claim_one = lambda: claims.append(1) or claim_one()
+        await queue.start()
+        try:
+            await asyncio.sleep(0.3)
+            assert claims == []
+        finally:
+            await queue.stop()
+
+    asyncio.run(scenario())
+
+
+def test_picks_up_jobs_submitted_by_another_process(tmp_path):
+    async def scenario():
+        queue = make_queue(tmp_path, concurrency=1, poll_interval=0.01, max_poll_interval=0.05)
+        other = SQLiteJobQueue(queue.path)
+        await queue.start()
+        try:
+            await asyncio.sleep(0.1)
+            # No wake-up reaches this process; the poller has to find the job
+            job_id = await other.submit("echo", {"n": 1})
+            await wait_done(queue, [job_id], timeout=1.0)
+        finally:
+            await queue.stop()
+
+    asyncio.run(scenario())
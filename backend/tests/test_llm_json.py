@@ -0,0 +1,47 @@
+from llm_json import Flashcard, JSONArrayStream, QuizItem, loads_lenient, parse_items, remove_trailing_commas
+
+CARDS = '[{"front": "ATP", "back": "Energy currency"}, {"front": "DNA", "back": "Genetic code"}]'
+
+
+def test_fenced_array_with_prose():
+    text = "Here are your flashcards:\n```json\n" + CARDS + "\n```\nGood luck!"
+    assert [c["front"] for c in parse_items(text, Flashcard)] == ["ATP", "DNA"]
+
+
+def test_truncated_array_keeps_closed_objects():
+    text = CARDS[:-1] + ', {"front": "RNA", "back": "Messen'
+    assert [c["front"] for c in parse_items(text, Flashcard)] == ["ATP", "DNA"]
+
+
+def test_trailing_commas():
+    text = '[{"front": "ATP", "back": "Energy",}, {"front": "DNA", "back": "Code"},]'
+    assert [c["front"] for c in parse_items(text, Flashcard)] == ["ATP", "DNA"]
+    assert loads_lenient('```json\n{"a": [1, 2,],}\n```') == {"a": [1, 2]}
+
+
+def test_trailing_commas_inside_strings_are_kept():
+    assert remove_trailing_commas('{"a": "x,}", "b": [1,]}') == '{"a": "x,}", "b": [1]}'
+
+
+def test_array_nested_in_wrapper_object():
+    text = '{"quiz": [{"question": "2+2?", "options": ["3", "4"], "answer": "B"}]}'
+    assert parse_items(text, QuizItem) == [{"question": "2+2?", "options": ["3", "4"], "answer": "B"}]
+
+
+def test_brackets_in_prose_do_not_start_the_array():
+    text = "See notes [1] first. " + CARDS
+    assert len(parse_items(text, Flashcard)) == 2
+
+
+def test_invalid_items_are_dropped():
+    text = '[{"front": "ATP", "back": ""}, {"question": "?"}, {"front": 42, "back": "answer"}]'
+    assert parse_items(text, Flashcard) == [{"front": "42", "back": "answer"}]
+
+
+def test_stream_emits_objects_as_they_close():
+    stream = JSONArrayStream()
+    pieces = [CARDS[i:i + 7] for i in range(0, len(CARDS), 7)]
+    emitted = [len(stream.feed(p)) for p in pieces]
+    assert sum(emitted) == 2
+    # The first card comes out before the second one has been received
+    assert emitted.index(1) < len(pieces) - 1
@@ -0,0 +1,72 @@
+import pytest
+
+from quota import QuotaExceeded, QuotaLimiter
+
+
+@pytest.fixture
+def limiter(tmp_path):
+    def make(**limits):
+        return QuotaLimiter(str(tmp_path / "quota.db"), **limits)
+    return make
+
+
+def remaining(q: QuotaLimiter, client: str) -> dict:
+    return q.usage(client)["clients"][client]["remaining"]
+
+
+def test_acquire_reserves_a_request_and_the_estimate(limiter):
+    q = limiter(client_rpm=5, client_tpm=1000)
+    q.acquire("alice", "interactive", 300)
+    left = remaining(q, "alice")
+    assert left["req"] == 4
+    assert 700 <= left["tok"] < 702  # refills a little while we look
+
+
+def test_requests_over_the_limit_are_rejected_without_reserving(limiter):
+    q = limiter(client_rpm=2)
+    q.acquire("alice", "interactive", 10)
+    q.acquire("alice", "interactive", 10)
+    with pytest.raises(QuotaExceeded) as exc:
+        q.acquire("alice", "interactive", 10)
+    assert exc.value.scope == "client:req"
+    assert 0 < exc.value.retry_after <= 30
+    # Other clients have their own buckets
+    q.acquire("bob", "interactive", 10)
+    usage = q.usage()["clients"]["alice"]["priorities"]["interactive"]
+    assert (usage["requests"], usage["rejected"]) == (2, 1)
+
+
+def test_charge_settles_actual_usage_against_the_estimate(limiter):
+    q = limiter(client_tpm=1000)
+    q.acquire("alice", "interactive", 100)
+    q.charge("alice", "interactive", 100, prompt_tokens=150, output_tokens=250)
+    assert 600 <= remaining(q, "alice")["tok"] < 602
+    usage = q.usage("alice")["clients"]["alice"]["priorities"]["interactive"]
+    assert (usage["prompt_tokens"], usage["output_tokens"]) == (150, 250)
+
+
+def test_charge_can_put_a_bucket_into_debt(limiter):
+    q = limiter(client_tpm=1000)
+    q.acquire("alice", "interactive", 100)
+    q.charge("alice", "interactive", 100, prompt_tokens=900, output_tokens=900)
+    assert remaining(q, "alice")["tok"] < 0
+    with pytest.raises(QuotaExceeded):
+        q.acquire("alice", "interactive", 10)
+
+
+def test_refund_returns_the_reservation(limiter):
+    q = limiter(client_rpm=1, client_tpm=1000)
+    q.acquire("alice", "interactive", 400)
+    q.refund("alice", "interactive", 400)
+    assert remaining(q, "alice")["req"] == 1
+    q.acquire("alice", "interactive", 400)
+    assert q.usage("alice")["clients"]["alice"]["priorities"]["interactive"]["requests"] == 1
+
+
+def test_batch_cannot_drain_the_global_reserve(limiter):
+    q = limiter(global_rpm=10)
+    for _ in range(7):
+        q.acquire("batcher", "batch", 1)
+    with pytest.raises(QuotaExceeded):
+        q.acquire("batcher", "batch", 1)
+    q.acquire("alice", "interactive", 1)
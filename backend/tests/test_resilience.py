@@ -0,0 +1,99 @@
+import asyncio
+
+import httpx
+import pytest
+
+from resilience import CircuitBreaker, CircuitOpen, LatencyTracker, Resilience
+
+
+def make_resilience(failures=1, cooldown=0.0, retries=0) -> Resilience:
+    return Resilience(CircuitBreaker(failures=failures, cooldown=cooldown),
+                      LatencyTracker(floor=0.1, ceiling=5.0), retries=retries, backoff=0.0)
+
+
+def http_error(status: int) -> httpx.HTTPStatusError:
+    request = httpx.Request("POST", "http://upstream")
+    return httpx.HTTPStatusError("upstream", request=request, response=httpx.Response(status, request=request))
+
+
+async def fail_503(timeout: float):
+    raise http_error(503)
+
+
+async def ok(timeout: float):
+    return "ok"
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failures=3, cooldown=60)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+
+def test_half_open_allows_a_single_probe():
+    breaker = CircuitBreaker(failures=1, cooldown=0)
+    breaker.record_failure()
+    assert breaker.allow()
+    assert breaker.state == "half_open"
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow()
+
+
+def test_failed_probe_reopens():
+    breaker = CircuitBreaker(failures=5, cooldown=0)
+    for _ in range(5):
+        breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert breaker.trips == 2
+
+
+def test_call_rejects_while_open():
+    res = make_resilience(cooldown=60)
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(res.call("text", fail_503))
+    with pytest.raises(CircuitOpen):
+        asyncio.run(res.call("text", ok))
+    assert res.rejected == 1
+
+
+def test_client_errors_do_not_trip_the_breaker():
+    res = make_resilience()
+
+    async def bad_request(timeout: float):
+        raise http_error(400)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(res.call("text", bad_request))
+    assert res.breaker.state == "closed"
+
+
+def test_cancelled_probe_is_released():
+    res = make_resilience(cooldown=0)
+    res.breaker.record_failure()
+
+    async def scenario():
+        started = asyncio.Event()
+
+        async def hang(timeout: float):
+            started.set()
+            await asyncio.sleep(60)
+
+        probe = asyncio.create_task(res.call("text", hang))
+        await started.wait()
+        assert res.breaker.state == "half_open"
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+        # The next caller gets to probe, and a success closes the breaker
+        return await res.call("text", ok)
+
+    assert asyncio.run(scenario()) == "ok"
+    assert res.breaker.state == "closed"
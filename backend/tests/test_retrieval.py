@@ -0,0 +1,32 @@
+from compaction import compact
+from retrieval import BYTES_PER_TOKEN, build_chunk_index, prepare_chunk_index, retrieve_context
+
+
+class Doc:
+    """Stands in for a stored Document: the few attributes retrieval reads"""
+
+    def __init__(self, text: str):
+        self.text, self.data = text, text.encode("utf-8")
+        self.size = len(self.data)
+
+    def read_ranges(self, spans):
+        return [self.data[s:e].decode("utf-8", errors="ignore") for s, e in spans]
+
+
+# Indented, space-padded lines (longer than running headers): compaction drops about a third of every chunk
+LINE = " " * 8 + "    ".join("Enzyme {0} lowers the activation energy of reaction {0} in cells of tissue {0} in organ {0}.".split())
+DOC = Doc("\n".join(LINE.format(i) for i in range(400)))
+
+
+def compacted_size(text: str) -> int:
+    return len(compact(text).encode("utf-8"))
+
+
+def test_compaction_savings_buy_more_context():
+    index = prepare_chunk_index(build_chunk_index(DOC.data))
+    budget_tokens = 2048
+    budget_bytes = budget_tokens * BYTES_PER_TOKEN
+    plain = retrieve_context([DOC], [index], [{"enzyme": 1.0}], budget_tokens)
+    wider = retrieve_context([DOC], [index], [{"enzyme": 1.0}], budget_tokens, compacted_size)
+    assert len(plain.encode("utf-8")) <= budget_bytes
+    assert compacted_size(plain) < 0.8 * budget_bytes < compacted_size(wider) <= budget_bytes
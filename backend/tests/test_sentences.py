@@ -0,0 +1,81 @@
+import time
+
+import pytest
+
+from sentences import iter_sentence_blocks, iter_sentence_spans, split_sentences
+
+
+def test_splits_on_terminators_followed_by_whitespace():
+    text = "Cells divide by mitosis in the body. Is that always the case here? Not quite, it turns out!"
+    assert split_sentences(text) == [
+        "Cells divide by mitosis in the body.", "Is that always the case here?", "Not quite, it turns out!",
+    ]
+
+
+def test_short_sentences_are_dropped_but_a_trailing_fragment_is_kept():
+    assert split_sentences("Intro. The membrane controls what enters the cell. tail") == [
+        "The membrane controls what enters the cell.", "tail",
+    ]
+
+
+@pytest.mark.parametrize("text", [
+    "Dr. Smith measured the rate of diffusion across the membrane.",
+    "Use a buffer, e.g. phosphate buffer at pH 7.4, for the enzyme assay.",
+    "Proteins, lipids, sugars etc. are transported by vesicles here.",
+    "The samples were shipped by J. R. Watson from the U.S. lab today.",
+    "The value of pi is about 3.14 and the file is notes.txt in the folder.",
+])
+def test_abbreviations_initials_and_decimals_do_not_split(text):
+    assert split_sentences(text) == [text]
+
+
+def test_abbreviation_can_still_end_a_sentence():
+    text = "They measured proteins, lipids, sugars etc. The next step was sequencing the genome."
+    assert split_sentences(text) == [
+        "They measured proteins, lipids, sugars etc.", "The next step was sequencing the genome.",
+    ]
+
+
+def test_closing_quotes_and_brackets_stay_with_the_sentence():
+    text = 'He said "the cell is the unit of life." (See chapter two for more details.) That is all for today.'
+    assert split_sentences(text) == [
+        'He said "the cell is the unit of life."', "(See chapter two for more details.)", "That is all for today.",
+    ]
+
+
+def test_spans_index_the_original_text():
+    text = "  First sentence is right here.\n\n  Second sentence follows it here.  "
+    assert [text[s:e] for s, e in iter_sentence_spans(text)] == [
+        "First sentence is right here.", "Second sentence follows it here.",
+    ]
+
+
+@pytest.mark.parametrize("text", [
+    "." * 100_000 + "x",
+    "?!" * 100_000 + "x",
+    ("word" + "." * 50) * 5_000,
+    ".)" * 100_000 + "x",
+])
+def test_terminator_runs_without_whitespace_are_linear(text):
+    start = time.perf_counter()
+    sentences = split_sentences(text)
+    # A backtracking boundary takes tens of seconds on these
+    assert time.perf_counter() - start < 1.0
+    assert "".join(sentences) == text
+
+
+@pytest.mark.parametrize("piece", [1, 5, 64, 10_000])
+def test_blocks_give_the_whole_text_spans(piece):
+    text = " ".join([
+        "Dr. Smith measured the enzyme activity at 3.14 units per gram.",
+        "The results, e.g. the Km values, matched etc. and more were found.",
+        '"Is that all?!" asked the reviewer... Then nothing happened at all.',
+        "Title Without Punctuation\n\nThe U.S. lab repeated the experiment twice",
+    ] * 20)
+    pieces = [text[i:i + piece] for i in range(0, len(text), piece)]
+    spans, base = [], 0
+    for block, block_spans in iter_sentence_blocks(pieces):
+        spans += [(base + start, base + end) for start, end in block_spans]
+        base += len(block)
+    assert base == len(text)
+    assert spans == list(iter_sentence_spans(text))
@@ -0,0 +1,80 @@
+import hashlib
+
+import pytest
+
+import textblocks
+from doc_store import create_document_store
+from textblocks import BlockText, write_blocks
+
+# Multi-byte characters land on block boundaries with tiny blocks
+TEXT = "Café résumé — naïve Zürich 📘 page one.\nΣύνοψη 📗 page two.\n日本語のテキスト 📙 page three."
+DATA = TEXT.encode("utf-8")
+PAGES = [0, DATA.index("Σύνοψη".encode("utf-8")), DATA.index("日本語".encode("utf-8"))]
+
+
+def block_file(tmp_path, name: str = "doc", block_size: int = 7) -> str:
+    src, dest = tmp_path / f"{name}.txt", str(tmp_path / f"{name}.blk")
+    src.write_bytes(DATA)
+    write_blocks(str(src), dest, PAGES, block_size=block_size)
+    return dest
+
+
+def test_every_byte_range_matches_the_source(tmp_path):
+    with BlockText(block_file(tmp_path)) as blocks:
+        assert blocks.size == len(DATA)
+        assert blocks.read() == DATA
+        for start in range(0, len(DATA) + 1, 3):
+            for end in range(start, len(DATA) + 2, 5):
+                assert blocks.read(start, end) == DATA[start:end]
+
+
+def test_ranges_split_inside_a_character_decode_like_the_plain_file(tmp_path):
+    emoji = DATA.index("📘".encode("utf-8"))
+    ranges = [(emoji + 1, emoji + 10), (emoji - 3, emoji + 2), (0, len(DATA)), (5, 5)]
+    with BlockText(block_file(tmp_path)) as blocks:
+        assert blocks.read_ranges(ranges) == [DATA[s:e].decode("utf-8", errors="ignore") for s, e in ranges]
+
+
+def test_page_spans(tmp_path):
+    with BlockText(block_file(tmp_path)) as blocks:
+        assert [blocks.read(*blocks.page_span(p)).decode("utf-8") for p in range(3)] == [
+            "Café résumé — naïve Zürich 📘 page one.\n",
+            "Σύνοψη 📗 page two.\n",
+            "日本語のテキスト 📙 page three.",
+        ]
+        with pytest.raises(IndexError):
+            blocks.page_span(3)
+
+
+def test_long_reads_bypass_the_block_cache(tmp_path):
+    path = block_file(tmp_path, block_size=4)
+    with BlockText(path) as blocks:
+        blocks.read(0, 4 * (textblocks.UNCACHED_READ_BLOCKS + 1))
+        assert not any(key[0] == path for key in textblocks._BLOCKS)
+        blocks.read(0, 8)
+        assert {key for key in textblocks._BLOCKS if key[0] == path} == {(path, 0), (path, 1)}
+
+
+def test_rejects_plain_files(tmp_path):
+    path = tmp_path / "plain.blk"
+    path.write_bytes(DATA)
+    with pytest.raises(ValueError):
+        BlockText(str(path))
+
+
+@pytest.mark.parametrize("compress", [True, False])
+def test_store_reads_the_same_text_either_way(tmp_path, compress):
+    store = create_document_store("sqlite", str(tmp_path), compress=compress)
+    staged = store.staging_path()
+    with open(staged, "wb") as f:
+        f.write(DATA)
+    doc = store.add_file("notes.txt", staged, hashlib.sha256(DATA).hexdigest(), len(DATA), PAGES)
+    assert doc.path.endswith(textblocks.BLOCK_SUFFIX) == compress
+    assert doc.text == TEXT
+    assert doc.read_ranges([(PAGES[1], PAGES[2])]) == ["Σύνοψη 📗 page two.\n"]
+    if compress:
+        assert doc.page_count() == 3
+        assert doc.read_page(2) == "日本語のテキスト 📙 page three."
+    else:
+        assert doc.page_count() == 1
+        assert doc.read_page(0) == TEXT
@@ -0,0 +1,162 @@
+import json
+import mmap
+import os
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+# Layout: MAGIC, zlib blocks of BLOCK_SIZE text bytes each (the last may be shorter),
+# a JSON footer (compressed block ends, page starts) and the trailer (footer length, MAGIC).
+# Byte offsets everywhere are into the uncompressed UTF-8 text, as in the analysis artifacts.
+BLOCK_FORMAT_VERSION = 1
+BLOCK_SUFFIX = ".blk"
+MAGIC = b"SBTB"
+BLOCK_SIZE = 16 * 1024
+COMPRESS_LEVEL = 6
+_TRAILER = struct.Struct("<Q4s")
+
+# Block files never change once written, so decompressed blocks and parsed footers are
+# shared by every view in the process; reads spanning more blocks than this bypass the cache
+BLOCK_CACHE_BYTES = 16 * 1024 * 1024
+MAX_CACHED_FOOTERS = 512
+UNCACHED_READ_BLOCKS = 8
+_BLOCKS: "OrderedDict[Tuple[str, int], bytes]" = OrderedDict()
+_FOOTERS: "OrderedDict[str, dict]" = OrderedDict()
+_cached_bytes = 0
+_lock = threading.Lock()
+
+
+def _cache_block(key: Tuple[str, int], data: bytes):
+    global _cached_bytes
+    with _lock:
+        if key not in _BLOCKS:
+            _BLOCKS[key] = data
+            _cached_bytes += len(data)
+        while _cached_bytes > BLOCK_CACHE_BYTES:
+            _cached_bytes -= len(_BLOCKS.popitem(last=False)[1])
+
+
+def write_blocks(src_path: str, dest: str, pages: Optional[Sequence[int]] = None,
+                 block_size: int = BLOCK_SIZE) -> int:
+    """Compress a UTF-8 text file into a block file at dest (written beside it, then renamed); returns its size"""
+    tmp = f"{dest}.{os.getpid()}.{threading.get_ident()}.tmp"
+    ends: List[int] = []
+    size = 0
+    try:
+        with open(src_path, "rb") as src, open(tmp, "wb") as out:
+            out.write(MAGIC)
+            pos = len(MAGIC)
+            while True:
+                data = src.read(block_size)
+                if not data:
+                    break
+                packed = zlib.compress(data, COMPRESS_LEVEL)
+                out.write(packed)
+                size += len(data)
+                pos += len(packed)
+                ends.append(pos)
+            footer = json.dumps({
+                "version": BLOCK_FORMAT_VERSION,
+                "size": size,
+                "block_size": block_size,
+                "blocks": ends,
+                "pages": sorted(min(max(int(p), 0), size) for p in pages or [0]),
+            }, separators=(",", ":")).encode("utf-8")
+            out.write(footer)
+            out.write(_TRAILER.pack(len(footer), MAGIC))
+            total = out.tell()
+        os.replace(tmp, dest)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return total
+
+
+class BlockText:
+    """Read-only view of a block file through one mmap; only the blocks a read touches are decompressed"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._f = open(path, "rb")
+        try:
+            self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+            meta = self._footer()
+        except BaseException:
+            self.close()
+            raise
+        self.size: int = meta["size"]
+        self.block_size: int = meta["block_size"]
+        self.pages: List[int] = meta["pages"]
+        self._ends: List[int] = meta["blocks"]
+
+    def _footer(self) -> dict:
+        with _lock:
+            meta = _FOOTERS.get(self.path)
+            if meta is not None:
+                _FOOTERS.move_to_end(self.path)
+                return meta
+        end = len(self._mm) - _TRAILER.size
+        footer_len, magic = _TRAILER.unpack_from(self._mm, end) if end >= len(MAGIC) else (0, b"")
+        if magic != MAGIC or self._mm[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"Not a block text file: {self.path}")
+        meta = json.loads(self._mm[end - footer_len:end])
+        with _lock:
+            _FOOTERS[self.path] = meta
+            while len(_FOOTERS) > MAX_CACHED_FOOTERS:
+                _FOOTERS.popitem(last=False)
+        return meta
+
+    def close(self):
+        mm = getattr(self, "_mm", None)
+        if mm is not None:
+            mm.close()
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _block(self, i: int, cache: bool = True) -> bytes:
+        key = (self.path, i)
+        with _lock:
+            data = _BLOCKS.get(key)
+            if data is not None:
+                _BLOCKS.move_to_end(key)
+                return data
+        start = self._ends[i - 1] if i else len(MAGIC)
+        data = zlib.decompress(self._mm[start:self._ends[i]])
+        if cache:
+            _cache_block(key, data)
+        return data
+
+    def read(self, start: int = 0, end: Optional[int] = None) -> bytes:
+        """Bytes [start, end) of the text"""
+        end = self.size if end is None else min(end, self.size)
+        start = max(start, 0)
+        if end <= start:
+            return b""
+        first, last = start // self.block_size, (end - 1) // self.block_size
+        offset = first * self.block_size
+        if first == last:
+            return self._block(first)[start - offset:end - offset]
+        cache = last - first < UNCACHED_READ_BLOCKS
+        return b"".join(self._block(i, cache) for i in range(first, last + 1))[start - offset:end - offset]
+
+    def iter_blocks(self) -> Iterator[bytes]:
+        """Every block in order, decompressed one at a time without filling the block cache"""
+        for i in range(len(self._ends)):
+            yield self._block(i, cache=False)
+
+    def read_ranges(self, ranges: Sequence[Sequence[int]]) -> List[str]:
+        return [self.read(start, end).decode("utf-8", errors="ignore") for start, end in ranges]
+
+    def page_span(self, page: int) -> Tuple[int, int]:
+        """[start, end) byte range of a page (slide); IndexError past the last one"""
+        if not 0 <= page < len(self.pages):
+            raise IndexError(page)
+        return self.pages[page], self.pages[page + 1] if page + 1 < len(self.pages) else self.size